@@ -29,19 +29,31 @@ setInterval(async function() {
 		await dbabs.clearPastEvents();
 
 		const events = await dbabs.getAllEvents();
+		if (events.length === 0)
+			return;
+
+		// Check every event in one request, so alerts are fetched once per zone
+		const batch = [];
 		for (const ev of events) {
-			const response = JSON.parse(wrapper.runScript("get weather", JSON.stringify({
-				request_type: "check_event",
+			batch.push({
 				time: ev.event_time.getTime() / 1000,
 				beach_id: ev.beach_id,
 				event_name: ev.event_message,
 				email_address: await dbabs.getEmail(ev.username)
-			})).toString());
-
-			if (response.action === "notify")
-				dbabs.addNotification(ev.username, response.title,
-						response.message);
+			});
 		}
+
+		const response = await wrapper.runWorker("get weather", {
+			request_type: "check_events_batch",
+			events: batch
+		});
+
+		events.forEach((ev, i) => {
+			const result = response.results[i];
+			if (result.action === "notify")
+				dbabs.addNotification(ev.username, result.title,
+						result.message);
+		});
 	} catch (e) {
 		console.log("Error notifying the user of event.");
 	}
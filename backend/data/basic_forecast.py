@@ -3,16 +3,28 @@
 import json
 from datetime import datetime
 
-# Interface to NOAA weather forecasting
-from noaa_sdk import NOAA
+# Access NOAA forecast data. The client and the HTTP libraries behind it take a while to import, so they are
+# only loaded the first time a forecast is needed, see get_client
+N = None
 
-# Access NOAA forecast data
-N = NOAA()
+
+def get_client():
+    """
+    Get the NOAA client, which goes through the configured upstream URLs, creating it on first use
+
+    :returns: the upstream.Client shared by this process
+    """
+
+    global N
+    if N is None:
+        import upstream
+        N = upstream.Client()
+    return N
 
 
 # Get the weather forecast
 def get_forecast(lat, lon):
-    res = N.points_forecast(lat, lon, type="forecast")
+    res = get_client().points_forecast(lat, lon, type="forecast")
 
     periods = res["properties"]["periods"]
 
@@ -98,7 +110,7 @@ def get_basic_weather_latlon(lat, lon):
         print(json.dumps(result, indent=4))
         return result  # Return the error response instead of making a request
     
-    res = N.points_forecast(lat, lon, type="forecast")
+    res = get_client().points_forecast(lat, lon, type="forecast")
     now = res['properties']['periods'][0]
 
     startTime = now.get("startTime", "")
@@ -1,15 +1,54 @@
 
 
 import json
-import requests
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 
 import sys, os
 
-# Interface to NOAA weather forecasting
-from noaa_sdk import NOAA
+import disk_cache
+import timings
 
-# Access NOAA forecast data
-N = NOAA()
+# Access NOAA forecast data. The client and the HTTP libraries behind it take a while to import, so they are
+# only loaded the first time a forecast is needed, see get_client
+N = None
+
+
+def get_client():
+    """
+    Get the NOAA client, which goes through the configured upstream URLs, creating it on first use
+
+    :returns: the upstream.Client shared by this process
+    """
+
+    global N
+    if N is None:
+        import upstream
+        N = upstream.Client()
+    return N
+
+
+# Locations are matched to gridpoints after rounding to this many decimal places (about 1 km at 2)
+FORECAST_CACHE_PRECISION = int(os.environ.get("BEACH_DAY_FORECAST_CACHE_PRECISION", "2"))
+
+# Gridpoints for a location are cached this many seconds. The NWS grid only changes when an office redraws it
+GRIDPOINT_CACHE_TTL = float(os.environ.get("BEACH_DAY_GRIDPOINT_CACHE_TTL", "604800"))
+
+# Forecasts are cached until their first period ends, but never longer than this many seconds
+FORECAST_CACHE_TTL = float(os.environ.get("BEACH_DAY_FORECAST_CACHE_TTL", "3600"))
+
+# When the UV index bulletin can't be fetched, weather is reported without a UV index for this many seconds
+# before the bulletin is tried again
+UV_BULLETIN_RETRY = float(os.environ.get("BEACH_DAY_UV_BULLETIN_RETRY", "300"))
+
+# Most weather lookups a single response runs at once
+WEATHER_MAX_IN_FLIGHT = int(os.environ.get("BEACH_DAY_WEATHER_MAX_IN_FLIGHT", "8"))
+
+# Seconds a single weather lookup may run before its beach is answered with empty weather
+WEATHER_TIMEOUT = float(os.environ.get("BEACH_DAY_WEATHER_TIMEOUT", "15"))
 
 
 def get_basic_weather_zip(zip_code, country_code):
@@ -20,7 +59,7 @@ def get_basic_weather_zip(zip_code, country_code):
     :param country_code: (default="us") the country to search in
     :results: JSON-compatible map with weather information at the provided location.
     """
-    res = N.get_forecasts(zip_code, country_code)
+    res = get_client().get_forecasts(zip_code, country_code)
     now = res[0]
 
     startTime = now.get("startTime", "")
@@ -78,12 +117,14 @@ def get_basic_weather_zip(zip_code, country_code):
 
 
 
-def get_basic_weather_latlon(lat, lon):
+def get_basic_weather_latlon(lat, lon, uv_city=None, gridpoint=None):
     """
     Fulfill a basic request for weather data at a given latitude and longitude
 
     :param lat: latitude to search at
     :param lon: longitude to search at
+    :param uv_city: optional bulletin city to take the UV index from, see get_uv_index
+    :param gridpoint: optional NWS gridpoint to take the forecast from, see get_points_forecast
     :results: JSON-compatible map with weather information at the provided location.
     """
 
@@ -97,34 +138,12 @@ def get_basic_weather_latlon(lat, lon):
         print(json.dumps(result, indent=4))
         return result  # Return the error response instead of making a request
     
-    temp_stdout = sys.stdout
-    sys.stdout = open(os.devnull, "w")
     try:
 
-        res = N.points_forecast(lat, lon, type="forecast")
+        res = get_points_forecast(lat, lon, gridpoint)
 
     except Exception:
-        sys.stdout = temp_stdout
-        return {
-            "startTime": "",
-            "endTime": "",
-
-            "isDaytime": "",
-
-            "temperature": "",
-
-            "probPrecip": "",
-            "relHumidity": "",
-
-            "windSpeed": "",
-            "windDirection": "",
-
-            "forecastSummary": "",
-
-            "uvIndex": ""
-        }
-    
-    sys.stdout = temp_stdout
+        return empty_weather()
 
     now = res['properties']['periods'][0]
 
@@ -175,22 +194,324 @@ def get_basic_weather_latlon(lat, lon):
 
         "forecastSummary": forecastSummary,
 
-        "uvIndex": get_uv_index(lat, lon)
+        "uvIndex": get_uv_index(lat, lon, uv_city)
     }
 
     return result
 
 
 
-def get_uv_index(lat, lon):
+def empty_weather():
     """
-    Helper function for finding the UV index at a latitude and longitude
+    :returns: the weather response used when no forecast could be found, with every field empty
+    """
+
+    return {
+        "startTime": "",
+        "endTime": "",
+
+        "isDaytime": "",
+
+        "temperature": "",
+
+        "probPrecip": "",
+        "relHumidity": "",
+
+        "windSpeed": "",
+        "windDirection": "",
+
+        "forecastSummary": "",
+
+        "uvIndex": ""
+    }
+
+
+def get_basic_weather_latlon_batch(locations, labels=None):
+    """
+    Fulfill basic weather requests for many locations at once, see iter_basic_weather_latlon_batch
+
+    :param locations: list of (lat, lon, uv_city, gridpoint) tuples, see get_basic_weather_latlon
+    :param labels: optional name for each location, see iter_basic_weather_latlon_batch
+    :returns: list of weather responses in the same order as locations
+    """
+
+    results = [None] * len(locations)
+    for i, weather in iter_basic_weather_latlon_batch(locations, labels):
+        results[i] = weather
+    return results
+
+
+def iter_basic_weather_latlon_batch(locations, labels=None):
+    """
+    Fulfill basic weather requests for many locations at once, producing each one as soon as it is ready.
+    Locations with the same gridpoint and UV city share one lookup, and up to WEATHER_MAX_IN_FLIGHT lookups
+    run in parallel. A location whose lookup fails, or runs longer than WEATHER_TIMEOUT seconds, gets empty
+    weather instead of failing the rest
+
+    :param locations: list of (lat, lon, uv_city, gridpoint) tuples, see get_basic_weather_latlon
+    :param labels: optional name for each location, such as its beach id. Each lookup's timing span is named
+        after the locations that share it
+    :returns: generator of (index into locations, weather response) pairs, in the order they finish
+    """
+
+    if len(locations) == 0:
+        return
+
+    # Neighbouring beaches often fall in the same forecast cell, so only look each one up once. Locations
+    # without a known gridpoint are only shared if they are exactly the same
+    lookups = []
+    lookup_of = {}
+    sharing = []
+    for i, (lat, lon, uv_city, gridpoint) in enumerate(locations):
+        key = (tuple(gridpoint), uv_city) if gridpoint is not None else (lat, lon, uv_city)
+        if not key in lookup_of:
+            lookup_of[key] = len(lookups)
+            lookups.append((lat, lon, uv_city, gridpoint))
+            sharing.append([])
+        sharing[lookup_of[key]].append(i)
+
+    # When each lookup started, and which have finished
+    started = {}
+    finished = set()
+
+    # Lookups run in other threads, so their timings are recorded under the request and span that are
+    # current here, even if they are still running when the next request starts
+    context = timings.current()
+
+    # Set once the caller has stopped waiting, so lookups that haven't started yet never do
+    abandoned = threading.Event()
+
+    def fetch(i, lat, lon, uv_city, gridpoint):
+        started[i] = time.monotonic()
+
+        if labels is None:
+            name = f"weather {lat},{lon}"
+        else:
+            name = f"weather {', '.join(str(labels[j]) for j in sharing[i])}"
+
+        # Errors are reported by printing them and calling exit(), which would only end this thread. The
+        # beach gets empty weather instead, and the printed error is kept out of the response
+        with timings.handed_off(context), timings.span(name), quiet_stdout():
+            try:
+                return get_basic_weather_latlon(lat, lon, uv_city, gridpoint)
+            except SystemExit:
+                return empty_weather()
+
+    to_fetch = queue.Queue()
+    for item in enumerate(lookups):
+        to_fetch.put(item)
+    fetched = queue.Queue()
+
+    def fetch_until_abandoned():
+        while not abandoned.is_set():
+            try:
+                i, lookup = to_fetch.get_nowait()
+            except queue.Empty:
+                return
+
+            try:
+                weather = fetch(i, *lookup)
+            except Exception:
+                weather = empty_weather()
+            finished.add(i)
+            fetched.put((i, weather))
+
+    in_flight = max(1, min(WEATHER_MAX_IN_FLIGHT, len(lookups)))
+
+    # Lookups stuck past their timeout still hold a thread, so lookups that never got one are given up on
+    # once every wave of lookups could have timed out
+    batch_deadline = time.monotonic() + WEATHER_TIMEOUT * -(-len(lookups) // in_flight)
+
+    # Daemon threads, so a lookup that hangs can't keep the process from exiting once the response is written
+    for _ in range(in_flight):
+        threading.Thread(target=fetch_until_abandoned, daemon=True).start()
+
+    pending = set(range(len(lookups)))
+    try:
+        while len(pending) > 0:
+            # Give up on lookups that have run too long, and wait until the next one would
+            now = time.monotonic()
+            wait_for = WEATHER_TIMEOUT
+            for i in list(pending):
+                if i in finished:
+                    wait_for = 0
+                    continue
+
+                start = started.get(i)
+                if start is None:
+                    remaining = batch_deadline - now
+                else:
+                    remaining = start + WEATHER_TIMEOUT - now
+                if remaining <= 0:
+                    pending.remove(i)
+                    for j in sharing[i]:
+                        yield (j, empty_weather())
+                else:
+                    wait_for = min(wait_for, remaining)
+
+            if len(pending) == 0:
+                break
+
+            try:
+                i, weather = fetched.get(timeout=wait_for)
+            except queue.Empty:
+                continue
+
+            # Lookups that were given up on still report back when they finish
+            if not i in pending:
+                continue
+            pending.remove(i)
+
+            # Each location gets its own copy, so changing one beach's weather doesn't change its neighbours'
+            for j in sharing[i]:
+                yield (j, dict(weather))
+    finally:
+        # Lookups that timed out are left to finish on their own, and nothing waits for them
+        abandoned.set()
+
+
+# Threads that are currently discarding their output, see quiet_stdout
+quiet_threads = threading.local()
+quiet_lock = threading.Lock()
+
+
+class QuietStdout:
+    """
+    Stand-in for sys.stdout that drops anything written by a thread inside quiet_stdout, and passes
+    everything else through to the stream it wraps
+    """
+
+    def __init__(self, stream):
+        """
+        :param stream: the stream to pass output through to
+        """
+
+        self.stream = stream
+
+    def write(self, text):
+        if getattr(quiet_threads, "depth", 0) > 0:
+            return len(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextmanager
+def quiet_stdout():
+    """
+    Discard everything the current thread prints. Unlike swapping sys.stdout for os.devnull, this is safe
+    while other threads are printing, or running quiet_stdout themselves
+    """
+
+    with quiet_lock:
+        if not isinstance(sys.stdout, QuietStdout):
+            sys.stdout = QuietStdout(sys.stdout)
+
+    # Counted, so a quiet section inside another one doesn't end the outer one
+    quiet_threads.depth = getattr(quiet_threads, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        quiet_threads.depth -= 1
+
+
+def get_gridpoint(lat, lon):
+    """
+    Find the NWS forecast gridpoint a latitude and longitude falls in. Gridpoints are kept in the shared disk
+    cache, keyed by the location rounded to FORECAST_CACHE_PRECISION decimal places, for GRIDPOINT_CACHE_TTL seconds
 
     :param lat: latitude to search at
     :param lon: longitude to search at
-    :returns: UV index at the provided location
+    :returns: (office, grid x, grid y)
+    """
+
+    # Locations that aren't numbers can't be cached, and NOAA will reject them anyway
+    try:
+        key = f"{round(float(lat), FORECAST_CACHE_PRECISION)},{round(float(lon), FORECAST_CACHE_PRECISION)}"
+    except ValueError:
+        key = None
+
+    if key is not None:
+        gridpoint = disk_cache.get("gridpoint", key)
+        if gridpoint is not None:
+            return tuple(gridpoint)
+
+    # The NOAA SDK prints as it goes, which would end up in the response
+    with quiet_stdout():
+        res = get_client().points(f"{lat},{lon}")
+
+    properties = res['properties']
+    gridpoint = (properties['gridId'], properties['gridX'], properties['gridY'])
+
+    if key is not None:
+        disk_cache.put("gridpoint", key, gridpoint, time.time() + GRIDPOINT_CACHE_TTL)
+
+    return gridpoint
+
+
+def get_gridpoint_forecast(office, grid_x, grid_y):
+    """
+    Get the NOAA forecast for an NWS gridpoint. Forecasts are kept in the shared disk cache, keyed by the
+    gridpoint, until the first forecast period ends or FORECAST_CACHE_TTL seconds pass, whichever is sooner
+
+    :param office: the forecast office, such as "PBZ"
+    :param grid_x: x coordinate of the cell in the office's grid
+    :param grid_y: y coordinate of the cell in the office's grid
+    :returns: the forecast response from NOAA
+    """
+
+    key = f"{office}/{grid_x},{grid_y}"
+
+    res = disk_cache.get("gridpoint_forecast", key)
+    if res is not None:
+        return res
+
+    with quiet_stdout():
+        res = get_client().make_get_request(f"/gridpoints/{key}/forecast", end_point=get_client().DEFAULT_END_POINT)
+
+    expires = time.time() + FORECAST_CACHE_TTL
+    try:
+        end = datetime.strptime(res['properties']['periods'][0]["endTime"], "%Y-%m-%dT%H:%M:%S%z")
+        expires = min(expires, end.timestamp())
+    except (KeyError, IndexError, TypeError, ValueError):
+        # Without a period to go by, don't cache it at all
+        expires = 0
+    disk_cache.put("gridpoint_forecast", key, res, expires)
+
+    return res
+
+
+def get_points_forecast(lat, lon, gridpoint=None):
+    """
+    Get the NOAA forecast for a latitude and longitude
+
+    :param lat: latitude to search at
+    :param lon: longitude to search at
+    :param gridpoint: optional (office, grid x, grid y) already known for the location, such as the one
+        stored for a beach. Looked up from the latitude and longitude if not given
+    :returns: the forecast response from NOAA
     """
-    lines = requests.get("https://www.cpc.ncep.noaa.gov/products/stratosphere/uv_index/bulletin.txt").text.split("\n")
+
+    if gridpoint is None:
+        gridpoint = get_gridpoint(lat, lon)
+
+    return get_gridpoint_forecast(*gridpoint)
+
+
+def parse_uv_bulletin(text):
+    """
+    Parse the CPC UV index bulletin. Everything after the first line mentioning CITY is a run of city,
+    state and UV index fields separated by two or more spaces
+
+    :param text: the text of bulletin.txt
+    :returns: dictionary of "CITY ST" to UV index
+    """
+
+    lines = text.split("\n")
 
     i = 0
     while i < len(lines):
@@ -199,41 +520,108 @@ def get_uv_index(lat, lon):
             break
         else:
             i += 1
-    
+
     collected = []
     for line in lines[i:]:
-        parts = filter(lambda x: x != "", map(lambda x: x.strip(), line.split("  ")))
-        for part in parts:
-            collected.append(part)
-    
+        for part in line.split("  "):
+            part = part.strip()
+            if part != "":
+                collected.append(part)
+
+    # Walk the fields three at a time, any partial triple at the end is dropped
     uvmap = {}
+    for j in range(0, len(collected) - 2, 3):
+        uvmap[f"{collected[j]} {collected[j + 1]}"] = int(collected[j + 2])
 
-    while len(collected) >= 3:
-        city = collected.pop(0)
-        state = collected.pop(0)
-        uv = collected.pop(0)
+    return uvmap
 
-        key = f"{city} {state}"
-        uv = int(uv)
 
-        uvmap[key] = uv
-    
-    closest_city = get_closest_uv_city(lat, lon)
+# The parsed bulletin for the current publication day, shared by every request this process handles. If it
+# couldn't be fetched, uvmap is empty and retry is the time.monotonic() after which it is tried again
+uv_bulletin = {"day": None, "uvmap": None, "retry": None}
 
-    return uvmap.get(closest_city, "")
+# Held while the bulletin is being fetched, so parallel weather lookups only download it once
+uv_bulletin_lock = threading.Lock()
+
+
+def fetch_uv_bulletin():
+    """
+    Download and parse the UV index bulletin
 
-def distance(a_lat, a_lon, b_lat, b_lon):
+    :returns: dictionary of "CITY ST" to UV index, or None if the bulletin couldn't be fetched or had no cities
     """
-    Distance between to points (simplified to Cartesian distance)
 
-    :param a_lat: latitude of point a
-    :param a_lon: longitude of point a
-    :param b_lat: latitude of point b
-    :param b_lon: longitude of point b
-    :returns: Cartesian distance between points a and b
+    import requests
+    import upstream
+
+    try:
+        response = upstream.get(upstream.cpc_url("/products/stratosphere/uv_index/bulletin.txt"))
+    except requests.RequestException:
+        return None
+
+    if response.status_code != 200:
+        return None
+
+    uvmap = parse_uv_bulletin(response.text)
+    if len(uvmap) == 0:
+        return None
+    return uvmap
+
+
+def get_uv_bulletin():
     """
-    return ((float(b_lat) - float(a_lat)) ** 2 + (float(b_lon) - float(a_lon)) ** 2) ** 0.5
+    Get today's UV index bulletin. The bulletin is published once a day, so it is downloaded at most once
+    per UTC day and kept both in this process and in the shared disk cache until the day is over. A failed
+    download is never cached on disk, and is only remembered in this process for UV_BULLETIN_RETRY seconds
 
+    :returns: dictionary of "CITY ST" to UV index, empty if the bulletin isn't available
+    """
+
+    now = datetime.now(timezone.utc)
+    day = now.date().isoformat()
+    if uv_bulletin["day"] == day and (uv_bulletin["retry"] is None or time.monotonic() < uv_bulletin["retry"]):
+        return uv_bulletin["uvmap"]
+
+    with uv_bulletin_lock:
+        # Another thread may have fetched it while this one waited
+        if uv_bulletin["day"] == day and (uv_bulletin["retry"] is None or time.monotonic() < uv_bulletin["retry"]):
+            return uv_bulletin["uvmap"]
+
+        retry = None
+        uvmap = disk_cache.get("uv_bulletin", day)
+        if not uvmap:
+            uvmap = fetch_uv_bulletin()
+            if uvmap is None:
+                uvmap = {}
+                retry = time.monotonic() + UV_BULLETIN_RETRY
+            else:
+                end_of_day = datetime(now.year, now.month, now.day, tzinfo=timezone.utc) + timedelta(days=1)
+                disk_cache.put("uv_bulletin", day, uvmap, end_of_day.timestamp())
+
+        uv_bulletin["uvmap"] = uvmap
+        uv_bulletin["retry"] = retry
+        uv_bulletin["day"] = day
+        return uvmap
+
+
+def get_uv_index(lat, lon, uv_city=None):
+    """
+    Helper function for finding the UV index at a latitude and longitude
+
+    :param lat: latitude to search at
+    :param lon: longitude to search at
+    :param uv_city: optional bulletin city already known to be closest, such as the one stored for a beach.
+        Looked up from the latitude and longitude if not given
+    :returns: UV index at the provided location
+    """
+
+    uvmap = get_uv_bulletin()
+
+    closest_city = uv_city
+    if not closest_city:
+        closest_city = get_closest_uv_city(lat, lon)
+
+    return uvmap.get(closest_city, "")
 
 def get_closest_uv_city(lat, lon):
     """
@@ -243,67 +631,5 @@ def get_closest_uv_city(lat, lon):
     :param lon: the longitude to search at
     """
 
-    city_map = {
-        "ALBUQUERQUE NM": (35.093779, -106.645375),
-        "LITTLE ROCK AR": (34.731196, -92.358115),
-        "ANCHORAGE AK": (61.201635, -149.855982),
-        "LOS ANGELES CA": (34.175477, -118.480221),
-        "ATLANTIC CITY NJ": (39.383432, -74.467481),
-        "LOUISVILLE KY": (38.176383, -85.681930),
-        "ATLANTA GA": (33.748492, -84.446447),
-        "MEMPHIS TN": (35.119206, -89.958910),
-        "BALTIMORE MD": (39.307919, -76.605990),
-        "MIAMI FL": (25.784873, -80.221712),
-        "BILLINGS MT": (45.766990, -108.561719),
-        "MILWAUKEE WI": (43.050674, -87.946621),
-        "BISMARCK ND": (46.821625, -100.777803),
-        "MINNEAPOLIS MN": (44.961500, -93.263933),
-        "BOISE ID": (43.607974, -116.230958),
-        "MOBILE AL": (30.670142, -88.140929),
-        "BOSTON MA": (42.318214, -71.084370),
-        "NEW ORLEANS LA": (30.045320, -89.914739),
-        "BUFFALO NY": (42.903220, -78.862017),
-        "NEW YORK NY": (40.69108, -73.895797),
-        "BURLINGTON VT": (44.488524, -73.21630),
-        "NORFOLK VA": (36.869636, -76.214791),
-        "CHARLESTON WV": (38.35474, -81.62188),
-        "OKLAHOMA CITY OK": (35.455118, -97.533206),
-        "CHARLESTON SC": (32.79207, -80.02049),
-        "OMAHA NE": (41.25647, -96.055015),
-        "CHEYENNE WY": (41.12875, -104.794204),
-        "PHILADELPHIA PA": (40.00337, -75.14129),
-        "CHICAGO IL": (41.85063, -87.657758),
-        "PHOENIX AZ": (33.542101, -112.072650),
-        "CLEVELAND OH": (41.48085, -81.683585),
-        "PITTSBURGH PA": (40.44107, -79.97734),
-        "CONCORD NH": (43.23019, -71.553355),
-        "PORTLAND ME": (43.67674, -70.29406),
-        "DALLAS TX": (32.78672, -96.790003),
-        "PORTLAND OR": (45.527900, -122.61450),
-        "DENVER CO": (39.73803, -104.965895),
-        "PROVIDENCE RI": (41.820911, -71.418851),
-        "DES MOINES IA": (41.57119, -93.615420),
-        "RALEIGH NC": (35.83632, -78.656937),
-        "DETROIT MI": (42.37558, -83.08541),
-        "SALT LAKE CITY UT": (40.77559, -111.918841),
-        "DOVER DE": (39.163030, -75.531701),
-        "SAN FRANCISCO CA": (37.754556, -122.436961),
-        "HARTFORD CT": (41.764823, -72.682681),
-        "SAN JUAN PR": (18.39493, -66.053650),
-        "HONOLULU HI": (21.315436, -157.81777),
-        "SEATTLE WA": (47.58616, -122.317932),
-        "HOUSTON TX": (29.78182, -95.38429),
-        "SIOUX FALLS SD": (43.538270, -96.718315),
-        "INDIANAPOLIS IN": (39.760920, -86.138986),
-        "ST. LOUIS MO": (38.62574, -90.2445),
-        "JACKSON MS": (32.31934, -90.218509),
-        "TAMPA FL": (27.978445, -82.45967),
-        "JACKSONVILLE FL": (30.353784, -81.634107),
-        "WASHINGTON DC": (38.905395, -77.010399),
-        "LAS VEGAS NV": (36.19356, -115.26293),
-        "WICHITA KS": (37.68678, -97.33421)
-    }
-
-    city_map_sorted = {key: val for key, val in sorted(city_map.items(), key=lambda item: distance(lat, lon, item[1][0], item[1][1]))}
-
-    return list(city_map_sorted.items())[0][0]
+    import uv_cities
+    return uv_cities.closest_uv_city(lat, lon)
@@ -0,0 +1,37 @@
+import sys
+
+import beach_store
+import beach_tables
+
+# Build step: python beach_gridpoints.py [--output PATH] [--beach-ids ID,ID,...]
+#
+# Looks up the NWS forecast gridpoint for every beach centroid and saves them to
+# beach_data/beach_gridpoints.json, which beach_store.py compiles into the store. The
+# table is saved as it goes, so an interrupted run picks up where it left off. Requests
+# go to BEACH_DAY_NWS_URL, so the table can also be built against standin.py.
+
+
+def lookup_gridpoint(N, lat, lon):
+    """
+    Ask the NWS which forecast gridpoint a point falls in
+
+    :param N: the NOAA client to use
+    :param lat: latitude of the point
+    :param lon: longitude of the point
+    :returns: [office, grid x, grid y], or None if the NWS doesn't forecast there
+    """
+
+    # The points endpoint only takes four decimal places
+    res = N.points(f"{round(lat, 4)},{round(lon, 4)}")
+
+    properties = res.get("properties", {})
+    if properties.get("gridId") is None or properties.get("gridX") is None or properties.get("gridY") is None:
+        return None
+    return [properties["gridId"], properties["gridX"], properties["gridY"]]
+
+
+if __name__ == "__main__":
+    import upstream
+    N = upstream.Client()
+
+    beach_tables.build_from_arguments(sys.argv[1:], beach_store.gridpoints_path, lambda lat, lon: lookup_gridpoint(N, lat, lon))
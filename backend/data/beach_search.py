@@ -1,19 +1,24 @@
+import base64
+import heapq
 import json
 import os
+from collections import OrderedDict
 
-from Levenshtein import distance as edit_distance
+import timings
 
 MAX_SEARCH_CACHE = 20
 MAX_SEARCH_RESULTS = 500
 
-# Construct the correct absolute path
-base_dir = os.path.dirname(__file__)  # Get the directory of the current script
-json_path = os.path.join(base_dir, "beach_data", "beach_attributes.json")
+# Latitude and longitude searches that round to the same point at this many decimal places share a ranking
+# in the search cache. Set BEACH_DAY_SEARCH_CACHE_PRECISION to "none" to only share it between identical points
+SEARCH_CACHE_PRECISION = os.environ.get("BEACH_DAY_SEARCH_CACHE_PRECISION", "3")
+SEARCH_CACHE_PRECISION = None if SEARCH_CACHE_PRECISION.lower() == "none" else int(SEARCH_CACHE_PRECISION)
 
-states_prefix = os.path.join(base_dir, "beach_data", "by_state", "states")
+# Pages that reach deeper than this are ranked with a vectorized scan over every beach instead of the spatial index
+MAX_INDEXED_RESULTS = 50
 
 # Search for beach by county and state
-def search_beach_by_county_state(county, state, start, stop):
+def search_beach_by_county_state(county, state, start, stop, cursor=None, emit=None):
     """
     Search for a beach by county and state. State must be one of the options documented in docs/data_interface.md. Results will be
     sorted by edit distance from the inputted county. Respond with results `start`-`stop-1` from the full set
@@ -22,6 +27,8 @@ def search_beach_by_county_state(county, state, start, stop):
     :param state: the enumerated state
     :param start: the result to start at
     :param stop: the result to stop before
+    :param cursor: optional cursor from a previous page. If given, respond with the `stop-start` results after it instead
+    :param emit: optional function to stream results to, see page_with_weather
     :returns: JSON-compatible map that includes the order of the search results, as well as additional information about them
     """
 
@@ -34,225 +41,510 @@ def search_beach_by_county_state(county, state, start, stop):
         print(json.dumps(result, indent=4))
         exit()
 
-    import beaches as beaches_info
-    import basic_weather
+    with timings.span("rank"):
+        results, next_cursor = rank_beach_by_county_state(county, state, start, stop, cursor)
 
-    path = os.path.join(states_prefix, f"{state}.json")
-    beaches = {}
-    with open(path, 'r') as beaches_file:
-        beaches = json.loads(beaches_file.read())
+    return finish_response(results, next_cursor, page_with_weather(results, emit))
 
-    results = {key: val for key, val in sorted(beaches.items(), key=lambda item: edit_distance(county, item[1]["BEACH_COUNTY"]))}
 
-    results = list(results.keys())[start:stop]
+# Search for beach by latitude and longitude
+def search_beach_by_lat_lon(lat, lon, start, stop, cursor=None, emit=None):
+    """
+    Search for a beach by latitude and longitude. Respond with results `start`-`stop-1` from the full set
 
-    beach_elements = {}
+    :param lat: the latitude to search from
+    :param lon: the longitude to search from
+    :param start: the result to start at
+    :param stop: the result to stop before
+    :param cursor: optional cursor from a previous page. If given, respond with the `stop-start` results after it instead
+    :param emit: optional function to stream results to, see page_with_weather
+    :returns: JSON-compatible map that includes the order of the search results, as well as additional information about them
+    """
 
-    for key in results:
-        beach_info = beaches_info.get_beach_info_by_id(key)
+    with timings.span("rank"):
+        results, next_cursor = rank_beach_by_lat_lon(float(lat), float(lon), start, stop, cursor)
 
-        lat = beach_info["latitude"]
-        lon = beach_info["longitude"]
+    return finish_response(results, next_cursor, page_with_weather(results, emit))
 
-        beach_weather = basic_weather.get_basic_weather_latlon(lat, lon)
+# Search for beach by county and state WITHOUT weather
+def search_beach_by_county_state_no_weather(county, state, start, stop, cursor=None, emit=None):
+    """
+    Search for a beach by county and state without weather info. State must be one of the options documented
+    in docs/data_interface.md. Results will be sorted by edit distance from the inputted county. Respond
+    with results `start`-`stop-1` from the full set
 
-        beach_info["weather"] = beach_weather
-        beach_elements[key] = beach_info
+    :param county: the county to search for
+    :param state: the enumerated state
+    :param start: the result to start at
+    :param stop: the result to stop before
+    :param cursor: optional cursor from a previous page. If given, respond with the `stop-start` results after it instead
+    :param emit: optional function to stream results to, see page_with_weather
+    :returns: JSON-compatible map that includes the order of the search results, as well as additional information about them
+    """
 
-    result = {
-        "order": results,
-        "result": beach_elements
-    }
+    if not state in ["AK", "AL", "AS", "CA", "CT", "DE", "FL", "GA", "GU", "HI", "IL", "IN", "LA", "MA", "MD", "ME", "MI", "MN", "MP", "MS", "NC", "NH", "NJ", "NY", "OH", "OR", "PA", "PR", "RI", "SC", "ST", "TX", "VA", "VI", "WA", "WI"]:
+        result = {
+            "code": "ERROR",
+            "error_type": "invalid_state_in_search",
+            "message": "The provided state is not valid"
+        }
+        print(json.dumps(result, indent=4))
+        exit()
 
-    return result
+    with timings.span("rank"):
+        results, next_cursor = rank_beach_by_county_state(county, state, start, stop, cursor)
 
+    return finish_response(results, next_cursor, page_without_weather(results, emit))
 
-# Search for beach by latitude and longitude
-def search_beach_by_lat_lon(lat, lon, start, stop):
+
+# Search for beach by latitude and longitude WITHOUT weather
+def search_beach_by_lat_lon_no_weather(lat, lon, start, stop, cursor=None, emit=None):
     """
-    Search for a beach by latitude and longitude. Respond with results `start`-`stop-1` from the full set
+    Search for a beach by latitude and longitude without weather info. Respond with results `start`-`stop-1` from the full set
 
     :param lat: the latitude to search from
     :param lon: the longitude to search from
     :param start: the result to start at
     :param stop: the result to stop before
+    :param cursor: optional cursor from a previous page. If given, respond with the `stop-start` results after it instead
+    :param emit: optional function to stream results to, see page_with_weather
     :returns: JSON-compatible map that includes the order of the search results, as well as additional information about them
     """
 
-    beaches = {}
-    with open(json_path, 'r') as beaches_file:
-        beaches = json.loads(beaches_file.read())
+    with timings.span("rank"):
+        results, next_cursor = rank_beach_by_lat_lon(float(lat), float(lon), start, stop, cursor)
+
+    return finish_response(results, next_cursor, page_without_weather(results, emit))
+
+def page_with_weather(results, emit=None):
+    """
+    Look up the info and weather for a page of beaches. Weather for the whole page is fetched at once
+
+    :param results: beach ids on the page
+    :param emit: optional function to stream results to. Each beach is passed to it as soon as its weather
+        arrives, as {"beach_id": ..., "result": ...}, instead of being kept
+    :returns: map of beach id to info with weather, or None if they were streamed to emit
+    """
 
     import beaches as beaches_info
     import basic_weather
 
-    results = {key: val for key, val in sorted(beaches.items(), key=lambda item: distance(float(lat), float(lon), item[1]))}
-    
-    results = list(results.keys())[start:stop]
+    beach_elements = {}
+    locations = []
+
+    with timings.span("beach info"):
+        for key in results:
+            beach_info = beaches_info.get_beach_info_by_id(key)
+
+            lat = beach_info["latitude"]
+            lon = beach_info["longitude"]
+            locations.append((lat, lon, beaches_info.get_uv_city(key), beaches_info.get_gridpoint(key)))
+
+            beach_elements[key] = beach_info
+
+    with timings.span("weather"):
+        for i, beach_weather in basic_weather.iter_basic_weather_latlon_batch(locations, results):
+            key = results[i]
+            beach_elements[key]["weather"] = beach_weather
+
+            if emit is not None:
+                emit({"beach_id": key, "result": beach_elements.pop(key)})
+
+    if emit is not None:
+        return None
+    return beach_elements
+
+
+def page_without_weather(results, emit=None):
+    """
+    Look up the info for a page of beaches
+
+    :param results: beach ids on the page
+    :param emit: optional function to stream results to, see page_with_weather
+    :returns: map of beach id to info, or None if they were streamed to emit
+    """
+
+    import beaches as beaches_info
 
     beach_elements = {}
 
-    for key in results:
-        beach_info = beaches_info.get_beach_info_by_id(key)
+    with timings.span("beach info"):
+        for key in results:
+            beach_info = beaches_info.get_beach_info_by_id(key)
+
+            if emit is not None:
+                emit({"beach_id": key, "result": beach_info})
+            else:
+                beach_elements[key] = beach_info
 
-        lat = beach_info["latitude"]
-        lon = beach_info["longitude"]
+    if emit is not None:
+        return None
+    return beach_elements
 
-        beach_weather = basic_weather.get_basic_weather_latlon(lat, lon)
 
-        beach_info["weather"] = beach_weather
-        beach_elements[key] = beach_info
+def finish_response(results, next_cursor, beach_elements):
+    """
+    Build a search response. When results are streamed, the response is the trailer that follows them, so it
+    holds the order and cursor but no results
+
+    :param results: beach ids on the page, in order
+    :param next_cursor: cursor for the next page, or None
+    :param beach_elements: map of beach id to info, or None if the results were streamed
+    :returns: JSON-compatible map with the order, the results if they weren't streamed, and the cursor
+    """
 
     result = {
-        "order": results,
-        "result": beach_elements
+        "order": results
     }
+    if beach_elements is not None:
+        result["result"] = beach_elements
+    result["cursor"] = next_cursor
 
     return result
 
-# Search for beach by county and state WITHOUT weather
-def search_beach_by_county_state_no_weather(county, state, start, stop):
+
+def encode_cursor(kind, origin, score, beach_id):
     """
-    Search for a beach by county and state without weather info. State must be one of the options documented
-    in docs/data_interface.md. Results will be sorted by edit distance from the inputted county. Respond
-    with results `start`-`stop-1` from the full set
+    Build the opaque cursor for the next page of a search
 
-    :param county: the county to search for
-    :param state: the enumerated state
-    :param start: the result to start at
-    :param stop: the result to stop before
-    :returns: JSON-compatible map that includes the order of the search results, as well as additional information about them
+    :param kind: which search the cursor belongs to
+    :param origin: the search parameters the page was ranked from
+    :param score: the score of the last result on the page, or None if it had no score
+    :param beach_id: the beach id of the last result on the page
+    :returns: the cursor string
     """
 
-    if not state in ["AK", "AL", "AS", "CA", "CT", "DE", "FL", "GA", "GU", "HI", "IL", "IN", "LA", "MA", "MD", "ME", "MI", "MN", "MP", "MS", "NC", "NH", "NJ", "NY", "OH", "OR", "PA", "PR", "RI", "SC", "ST", "TX", "VA", "VI", "WA", "WI"]:
+    return base64.urlsafe_b64encode(json.dumps([kind, score, beach_id, list(origin)]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(kind, cursor, beaches, key_of, key):
+    """
+    Read a cursor from a previous page of a search. Exits with an error response if the cursor is malformed,
+    belongs to a different kind of search, or was ranked from parameters that aren't the same search as this one
+
+    :param kind: which search is being continued
+    :param cursor: the cursor string
+    :param beaches: the beach store
+    :param key_of: function that normalizes search parameters into a search cache key
+    :param key: the search cache key of the search being continued
+    :returns: (search parameters the previous page was ranked from, (score, row) of its last result)
+    """
+
+    try:
+        cursor_kind, score, beach_id, origin = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        row = beaches.row_of(beach_id)
+        if cursor_kind != kind or row == -1 or not (score is None or isinstance(score, (int, float))):
+            raise ValueError(cursor)
+        if not isinstance(origin, list) or not all(isinstance(value, (str, int, float)) for value in origin):
+            raise ValueError(cursor)
+        origin = tuple(origin)
+        if key_of(origin) != key:
+            raise ValueError(cursor)
+    except (ValueError, TypeError, AttributeError):
         result = {
             "code": "ERROR",
-            "error_type": "invalid_state_in_search",
-            "message": "The provided state is not valid"
+            "error_type": "malformed_request: cursor is not valid for this search",
+            "message": "The provided cursor could not be read, or it came from a different search"
         }
         print(json.dumps(result, indent=4))
         exit()
 
-    import beaches as beaches_info
+    return (origin, (score, row))
 
-    path = os.path.join(states_prefix, f"{state}.json")
-    beaches = {}
-    with open(path, 'r') as beaches_file:
-        beaches = json.loads(beaches_file.read())
 
-    results = {key: val for key, val in sorted(beaches.items(), key=lambda item: edit_distance(county, item[1]["BEACH_COUNTY"]))}
+def page_bounds(start, stop, cursor):
+    """
+    Work out how many ranked results a page needs, capping the page at MAX_SEARCH_RESULTS
 
-    results = list(results.keys())[start:stop]
+    :param start: the result to start at
+    :param stop: the result to stop before
+    :param cursor: the cursor from the previous page, or None
+    :returns: (start, stop, count), where count is how many results to rank, or None if the full ranking is needed
+    """
 
-    beach_elements = {}
+    # A cursor replaces start, so the page is just the next stop - start results
+    if cursor is not None:
+        stop = max(0, stop - start)
+        start = 0
 
-    for key in results:
-        beach_info = beaches_info.get_beach_info_by_id(key)
+    # Negative bounds count from the end, so they need the full ranking
+    if start < 0 or stop < 0:
+        return (start, stop, None)
 
-        beach_elements[key] = beach_info
+    stop = min(stop, start + MAX_SEARCH_RESULTS)
+    return (start, stop, stop)
 
-    result = {
-        "order": results,
-        "result": beach_elements
-    }
 
-    return result
+def finish_page(kind, origin, beaches, page, size):
+    """
+    Turn a page of ranked results into beach ids and build the cursor for the page after it
+
+    :param kind: which search the results came from
+    :param origin: the search parameters the results were ranked from
+    :param beaches: the beach store
+    :param page: list of (score, row) pairs for the page, best first
+    :param size: how many results the page asked for, or None if it used negative bounds
+    :returns: (list of beach ids, cursor for the next page or "" if there are no more results)
+    """
 
+    page = page[:MAX_SEARCH_RESULTS]
+    order = [beaches.beach_id(row) for score, row in page]
 
-# Search for beach by latitude and longitude WITHOUT weather
-def search_beach_by_lat_lon_no_weather(lat, lon, start, stop):
+    cursor = ""
+    if len(page) > 0 and len(page) == size:
+        cursor = encode_cursor(kind, origin, page[-1][0], order[-1])
+
+    return (order, cursor)
+
+
+class RankedSearch:
+    """
+    The ranked results of one search, kept in the search cache. Holds the best results found so far, which
+    may only be a prefix of the full ranking
     """
-    Search for a beach by latitude and longitude without weather info. Respond with results `start`-`stop-1` from the full set
 
-    :param lat: the latitude to search from
-    :param lon: the longitude to search from
+    def __init__(self, origin, ranked, complete):
+        """
+        :param origin: the search parameters the results were ranked from
+        :param ranked: list of (score, row) pairs, best first
+        :param complete: True if ranked holds every result of the search
+        """
+
+        self.origin = origin
+        self.ranked = ranked
+        self.complete = complete
+        self.positions = None
+
+    def position(self, row):
+        """
+        :param row: a row in the ranking
+        :returns: where the row is in the ranking, or None if it isn't there
+        """
+
+        if self.positions is None:
+            self.positions = {r: i for i, (score, r) in enumerate(self.ranked)}
+        return self.positions.get(row)
+
+    def extend(self, more, count):
+        """
+        Add results that come after the ones already ranked
+
+        :param more: list of (score, row) pairs ranked after the last one held
+        :param count: how many results were asked for when finding them
+        """
+
+        self.ranked = self.ranked + more
+        self.complete = len(more) < count
+        self.positions = None
+
+
+# Least recently used search results, keyed by search kind and normalized parameters. This lives as long as
+# the process, so in worker mode it carries over between requests
+search_cache = OrderedDict()
+search_cache_hits = 0
+search_cache_misses = 0
+
+
+def search_cache_stats():
+    """
+    Report how the search cache is doing
+
+    :returns: JSON-compatible map with the hit and miss counts, and the current and maximum number of entries
+    """
+
+    return {
+        "hits": search_cache_hits,
+        "misses": search_cache_misses,
+        "size": len(search_cache),
+        "max_size": MAX_SEARCH_CACHE
+    }
+
+
+def clear_search_cache():
+    """
+    Empty the search cache and reset its counters
+    """
+
+    global search_cache_hits, search_cache_misses
+
+    search_cache.clear()
+    search_cache_hits = 0
+    search_cache_misses = 0
+
+
+def cached_page(kind, origin, key_of, rank, start, stop, cursor):
+    """
+    Get a page of a search, using the search cache where it already holds enough of the ranking. When it
+    doesn't, only the missing part of the ranking is computed, and the cache entry grows to hold it. Searches
+    with the same cache key share the ranking of whichever of them filled the entry, and pages continued from
+    a cursor keep to the ranking the cursor came from
+
+    :param kind: which search this is
+    :param origin: tuple of the search parameters
+    :param key_of: function that normalizes search parameters into the key for the cache entry
+    :param rank: function (origin, count, after) that returns up to `count` (score, row) pairs for the search
+        parameters `origin`, best first, ranked after the (score, row) pair `after` if it isn't None. A count
+        of None means every result
     :param start: the result to start at
     :param stop: the result to stop before
-    :returns: JSON-compatible map that includes the order of the search results, as well as additional information about them
+    :param cursor: the cursor from the previous page, or None
+    :returns: (list of the beach ids for the page, cursor for the next page)
     """
 
-    beaches = {}
-    with open(json_path, 'r') as beaches_file:
-        beaches = json.loads(beaches_file.read())
+    global search_cache_hits, search_cache_misses
 
     import beaches as beaches_info
-    import basic_weather
 
-    results = {key: val for key, val in sorted(beaches.items(), key=lambda item: distance(float(lat), float(lon), item[1]))}
-    
-    results = list(results.keys())[start:stop]
+    beaches = beaches_info.get_store()
 
-    beach_elements = {}
+    key = key_of(origin)
 
-    for key in results:
-        beach_info = beaches_info.get_beach_info_by_id(key)
+    after = None
+    if cursor is not None:
+        origin, after = decode_cursor(kind, cursor, beaches, key_of, key)
+    start, stop, count = page_bounds(start, stop, cursor)
+    size = None if count is None else stop - start
 
-        beach_elements[key] = beach_info
+    entry = search_cache.get((kind, key))
+    if entry is not None:
+        search_cache.move_to_end((kind, key))
 
-    result = {
-        "order": results,
-        "result": beach_elements
-    }
+    # Find where the page starts in the full ranking. A cursor from a different ranking than the cached one,
+    # or that isn't in it, can't be placed
+    offset = 0
+    if after is not None:
+        offset = None if entry is None or entry.origin != origin else entry.position(after[1])
+        if offset is not None:
+            offset += 1
 
-    return result
+    if entry is not None and offset is not None and (entry.complete or (count is not None and len(entry.ranked) >= offset + stop)):
+        search_cache_hits += 1
+        return finish_page(kind, entry.origin, beaches, entry.ranked[offset:][start:stop], size)
+
+    search_cache_misses += 1
+
+    if offset is None:
+        # Continue straight from the cursor without caching, since where it falls in the ranking is unknown
+        return finish_page(kind, origin, beaches, rank(origin, count, after), size)
+
+    if entry is None or count is None:
+        entry = RankedSearch(origin, rank(origin, None if count is None else offset + stop, None), count is None)
+        if count is not None:
+            entry.complete = len(entry.ranked) < offset + stop
+    else:
+        # Only rank what comes after the cached prefix
+        needed = offset + stop - len(entry.ranked)
+        after_cached = entry.ranked[-1] if len(entry.ranked) > 0 else None
+        entry.extend(rank(entry.origin, needed, after_cached), needed)
 
-def distance(a_lat, a_lon, other):
+    if MAX_SEARCH_CACHE > 0:
+        search_cache[(kind, key)] = entry
+        search_cache.move_to_end((kind, key))
+        while len(search_cache) > MAX_SEARCH_CACHE:
+            search_cache.popitem(last=False)
+
+    return finish_page(kind, entry.origin, beaches, entry.ranked[offset:][start:stop], size)
+
+
+def rank_beach_by_county_state(county, state, start, stop, cursor=None):
     """
-    Get the distance between a latitude, longitude pair and a beach object
+    Rank the beaches in a state by edit distance between their county and the inputted county. Each distinct
+    county in the state is only scored once, then its beaches are fanned out lazily until the page is full.
+    Beaches with the same distance stay in the order they appear in the beach data. Rankings are kept in the
+    search cache
 
-    :param a_lat: the latitude to measure from
-    :param a_lon: the longitude to measure from
-    :param other: the beach object to measure to
-    :returns: the distance
+    :param county: the county to search for
+    :param state: the enumerated state
+    :param start: the result to start at
+    :param stop: the result to stop before
+    :param cursor: optional cursor from the previous page. If given, the page holds the `stop-start` results after it
+    :returns: (list of the beach ids for the page, cursor for the next page)
     """
 
-    start_lat = other.get("START_LATITUDE_MEASURE", "")
-    end_lat = other.get("END_LATITUDE_MEASURE", "")
-    start_lon = other.get("START_LONGITUDE_MEASURE", "")
-    end_lon = other.get("END_LONGITUDE_MEASURE", "")
+    import beaches as beaches_info
+    from Levenshtein import distance as edit_distance
 
-    try:
-        start_lat = float(start_lat)
-    except ValueError:
-        start_lat = ""
-    
-    try:
-        end_lat = float(end_lat)
-    except ValueError:
-        end_lat = ""
-    
-    try:
-        start_lon = float(start_lon)
-    except ValueError:
-        start_lon = ""
-    
-    try:
-        end_lon = float(end_lon)
-    except ValueError:
-        end_lon = ""
-    
-    # Compute latitude as the average of start and end if they both exist, or
-    # select whichever exists. This is because sometimes one end is left out if
-    # it would be similar to the other
-    if start_lat != "" and end_lat != "":
-        latitude = (start_lat + end_lat) / 2.0
-    elif start_lat != "":
-        latitude = start_lat
-    elif end_lat != "":
-        latitude = end_lat
-    else:
-        return float('inf')
-    
-    # Same as above, for longitude
-    if start_lon != "" and end_lon != "":
-        longitude = (start_lon + end_lon) / 2.0
-    elif start_lon != "":
-        longitude = start_lon
-    elif end_lat != "":
-        longitude = end_lon
-    else:
-        return float('inf')
+    beaches = beaches_info.get_store()
+
+    def rank(origin, count, after):
+        # Group the counties by how far they are from the search
+        groups = {}
+        for beach_county, rows in beaches.county_index(state):
+            groups.setdefault(edit_distance(county, beach_county), []).append(rows)
+
+        ranked = []
+        for d in sorted(groups.keys()):
+            if count is not None and len(ranked) >= count:
+                break
+            if after is not None and d < after[0]:
+                continue
+
+            for row in heapq.merge(*groups[d]):
+                if after is not None and d == after[0] and row <= after[1]:
+                    continue
+                ranked.append((d, row))
+                if count is not None and len(ranked) >= count:
+                    break
+
+        return ranked
+
+    return cached_page("county_state", (county, state), tuple, rank, start, stop, cursor)
+
+
+def rank_beach_by_lat_lon(lat, lon, start, stop, cursor=None):
+    """
+    Rank beaches by great-circle distance from a latitude and longitude, closest first. Beaches without
+    coordinates come last, in the order they appear in the beach data. Shallow pages only look at the
+    nearest `stop` beaches through the spatial index in the beach store, and deeper ones score every
+    beach at once with the distance kernel. Searches that round to the same point at SEARCH_CACHE_PRECISION
+    decimal places share a ranking in the search cache
+
+    :param lat: the latitude to search from
+    :param lon: the longitude to search from
+    :param start: the result to start at
+    :param stop: the result to stop before
+    :param cursor: optional cursor from the previous page. If given, the page holds the `stop-start` results after it
+    :returns: (list of the beach ids for the page, cursor for the next page)
+    """
+
+    import beaches as beaches_info
 
-    b_lat = latitude
-    b_lon = longitude
-    return ((b_lat - a_lat) ** 2 + (b_lon - a_lon) ** 2) ** 0.5
+    beaches = beaches_info.get_store()
+
+    def key_of(origin):
+        lat, lon = origin
+        if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+            raise TypeError(origin)
+        if SEARCH_CACHE_PRECISION is None:
+            return (lat, lon)
+        return (round(lat, SEARCH_CACHE_PRECISION), round(lon, SEARCH_CACHE_PRECISION))
+
+    def rank(origin, count, after):
+        lat, lon = origin
+        if count is None:
+            count = len(beaches)
+
+        # Beaches without a centroid have no score. Ranking after one of them skips every beach that has one
+        ranked = []
+        if after is None or after[0] is not None:
+            if count <= MAX_INDEXED_RESULTS:
+                ranked = beaches.nearest(lat, lon, count, after)
+            else:
+                import distance_kernel
+                ranked = distance_kernel.nearest(beaches.centroids(), lat, lon, count, after=after)
+
+        # Fill the rest with the beaches that have no centroid
+        if len(ranked) < count:
+            lats = beaches.column("centroid_lat")
+            lons = beaches.column("centroid_lon")
+            for row in range(len(beaches)):
+                if len(ranked) == count:
+                    break
+                if after is not None and after[0] is None and row <= after[1]:
+                    continue
+                if lats[row] != lats[row] or lons[row] != lons[row]:
+                    ranked.append((None, row))
+
+        return ranked
+
+    return cached_page("lat_lon", (lat, lon), key_of, rank, start, stop, cursor)
@@ -0,0 +1,562 @@
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import spatial_index
+
+# Construct the correct absolute path
+base_dir = os.path.dirname(__file__)  # Get the directory of the current script
+json_path = os.path.join(base_dir, "beach_data", "beach_attributes.json")
+store_path = os.path.join(base_dir, "beach_data", "beach_store.bin")
+gridpoints_path = os.path.join(base_dir, "beach_data", "beach_gridpoints.json")
+zones_path = os.path.join(base_dir, "beach_data", "beach_zones.json")
+
+# Bump the version whenever the layout changes so old stores get rebuilt
+MAGIC = b"BEACHST"
+VERSION = 7
+
+# Header is the magic, version, byte order, row count and section count.
+# Each section directory entry is a name, an offset and a length
+HEADER = struct.Struct("<7sBBxxxII")
+SECTION = struct.Struct("<16sQQ")
+
+# Fields that are also stored as fixed-width float columns. Values that are
+# missing or can't be parsed are stored as NaN
+NUMERIC_FIELDS = {
+    "length": "BEACH_LEN_IN_MI",
+    "start_lat": "START_LATITUDE_MEASURE",
+    "start_lon": "START_LONGITUDE_MEASURE",
+    "end_lat": "END_LATITUDE_MEASURE",
+    "end_lon": "END_LONGITUDE_MEASURE"
+}
+
+# Stored in place of a forecast office for beaches without a known NWS gridpoint
+NO_GRIDPOINT = 0xFFFF
+
+# Stored in place of a zone for beaches that aren't in the zone table
+NO_ZONE = 0xFFFFFFFF
+
+# Stored in place of a UV city for beaches without a centroid, the same as uv_cities.NO_CITY
+NO_UV_CITY = 255
+
+
+def parse_number(value):
+    """
+    Parse a numeric field from the beach data
+
+    :param value: the field as a string
+    :returns: the value as a float, or NaN if it is missing or invalid
+    """
+
+    try:
+        return float(value)
+    except ValueError:
+        return math.nan
+
+
+def centroid(start_lat, start_lon, end_lat, end_lon):
+    """
+    Compute the point used to represent a beach. This matches how beaches.get_beach_info_by_id
+    computes latitude and longitude
+
+    :param start_lat: start latitude, NaN if missing
+    :param start_lon: start longitude, NaN if missing
+    :param end_lat: end latitude, NaN if missing
+    :param end_lon: end longitude, NaN if missing
+    :returns: (latitude, longitude), either of which is NaN if it can't be computed
+    """
+
+    # Average the ends if both exist, or use whichever one exists
+    if not math.isnan(start_lat) and not math.isnan(end_lat):
+        latitude = (start_lat + end_lat) / 2.0
+    elif not math.isnan(start_lat):
+        latitude = start_lat
+    else:
+        latitude = end_lat
+
+    if not math.isnan(start_lon) and not math.isnan(end_lon):
+        longitude = (start_lon + end_lon) / 2.0
+    elif not math.isnan(start_lon):
+        longitude = start_lon
+    elif not math.isnan(end_lat):
+        longitude = end_lon
+    else:
+        longitude = math.nan
+
+    return (latitude, longitude)
+
+
+def compile_store(beaches, path=store_path, gridpoints=None, zones=None):
+    """
+    Compile beach records into a binary store. The store holds a table of every distinct string, one
+    row of string ids per beach, fixed-width float columns for the numeric fields, an index of rows
+    sorted by beach id, each beach's centroid with a spatial index over them and the UV bulletin city
+    closest to it, the NWS forecast gridpoint and land zone it falls in, and an index of the distinct
+    counties in each state. The file is written next to its destination and moved into place, so
+    processes that already have the old store open are not affected
+
+    :param beaches: map of beach id to beach record, in the order the rows should be stored
+    :param path: where to write the store
+    :param gridpoints: optional map of beach id to [office, grid x, grid y], as built by beach_gridpoints.py.
+        Beaches that aren't in it have no gridpoint
+    :param zones: optional map of beach id to land zone id, as built by beach_zones.py. None means the beach was
+        looked up and isn't in a zone
+    """
+
+    # Only needed to compile the store, and it brings in NumPy
+    import uv_cities
+
+    # Keep every field name in the order it first appears
+    fields = []
+    for record in beaches.values():
+        for name in record.keys():
+            if not name in fields:
+                fields.append(name)
+
+    strings = {}
+    string_data = bytearray()
+    string_offsets = array("I", [0])
+
+    def intern(value):
+        if not value in strings:
+            strings[value] = len(strings)
+            string_data.extend(value.encode("utf-8"))
+            string_offsets.append(len(string_data))
+        return strings[value]
+
+    ids = array("I")
+    cells = array("I")
+    numbers = {column: array("d") for column in NUMERIC_FIELDS}
+
+    for beach_id, record in beaches.items():
+        ids.append(intern(beach_id))
+
+        for name in fields:
+            cells.append(intern(record.get(name, "")))
+
+        for column, name in NUMERIC_FIELDS.items():
+            numbers[column].append(parse_number(record.get(name, "")))
+
+    centroid_lat = array("d")
+    centroid_lon = array("d")
+    unit_x = array("d")
+    unit_y = array("d")
+    unit_z = array("d")
+    for row in range(len(ids)):
+        lat, lon = centroid(numbers["start_lat"][row], numbers["start_lon"][row], numbers["end_lat"][row], numbers["end_lon"][row])
+        centroid_lat.append(lat)
+        centroid_lon.append(lon)
+
+        if math.isnan(lat) or math.isnan(lon):
+            x, y, z = (math.nan, math.nan, math.nan)
+        else:
+            x, y, z = spatial_index.unit_vector(lat, lon)
+        unit_x.append(x)
+        unit_y.append(y)
+        unit_z.append(z)
+
+    kd_tree = array("I", spatial_index.build_kd_tree(unit_x, unit_y, unit_z))
+
+    # Closest UV bulletin city to each centroid, so weather lookups don't have to search for it
+    uv_city = array("B", uv_cities.closest_uv_city_indexes(centroid_lat, centroid_lon).tolist())
+
+    # Distinct counties in each state, with the rows that share them. States come from the beach id
+    # prefix, the same way the by_state shards are split, and rows stay in file order
+    counties = {}
+    for row, beach_id in enumerate(beaches.keys()):
+        county = beaches[beach_id].get("BEACH_COUNTY", "")
+        counties.setdefault(beach_id[0:2], {}).setdefault(county, []).append(row)
+
+    # Forecast gridpoints, with each office stored once
+    if gridpoints is None:
+        gridpoints = {}
+    grid_offices = []
+    grid_office = array("H")
+    grid_x = array("H")
+    grid_y = array("H")
+    for beach_id in beaches.keys():
+        gridpoint = gridpoints.get(beach_id)
+        if gridpoint is None:
+            grid_office.append(NO_GRIDPOINT)
+            grid_x.append(0)
+            grid_y.append(0)
+            continue
+
+        office, x, y = gridpoint
+        if not office in grid_offices:
+            grid_offices.append(office)
+        grid_office.append(grid_offices.index(office))
+        grid_x.append(x)
+        grid_y.append(y)
+
+    # Land zones, as string ids. Beaches that were looked up without finding a zone get an empty string
+    if zones is None:
+        zones = {}
+    zone = array("I")
+    for beach_id in beaches.keys():
+        if not beach_id in zones:
+            zone.append(NO_ZONE)
+        elif zones[beach_id] is None:
+            zone.append(intern(""))
+        else:
+            zone.append(intern(zones[beach_id]))
+
+    beach_ids = list(beaches.keys())
+    id_index = array("I", sorted(range(len(beach_ids)), key=lambda row: beach_ids[row]))
+
+    sections = [
+        ("fields", json.dumps(fields).encode("utf-8")),
+        ("strings", bytes(string_data)),
+        ("string_offsets", string_offsets.tobytes()),
+        ("ids", ids.tobytes()),
+        ("id_index", id_index.tobytes()),
+        ("cells", cells.tobytes())
+    ]
+    for column, values in numbers.items():
+        sections.append((column, values.tobytes()))
+    sections.append(("centroid_lat", centroid_lat.tobytes()))
+    sections.append(("centroid_lon", centroid_lon.tobytes()))
+    sections.append(("unit_x", unit_x.tobytes()))
+    sections.append(("unit_y", unit_y.tobytes()))
+    sections.append(("unit_z", unit_z.tobytes()))
+    sections.append(("kd_tree", kd_tree.tobytes()))
+    sections.append(("uv_cities", json.dumps(uv_cities.CITY_NAMES).encode("utf-8")))
+    sections.append(("uv_city", uv_city.tobytes()))
+    sections.append(("grid_offices", json.dumps(grid_offices).encode("utf-8")))
+    sections.append(("grid_office", grid_office.tobytes()))
+    sections.append(("grid_x", grid_x.tobytes()))
+    sections.append(("grid_y", grid_y.tobytes()))
+    sections.append(("zone", zone.tobytes()))
+    for state, index in counties.items():
+        sections.append((f"county_{state}", json.dumps(list(index.items())).encode("utf-8")))
+
+    write_sections(path, len(beach_ids), sections)
+
+
+def write_sections(path, row_count, sections):
+    """
+    Write a store file from its sections. Every section starts on an 8-byte boundary so the float
+    columns can be read in place
+
+    :param path: where to write the store
+    :param row_count: number of beaches in the store
+    :param sections: list of (name, bytes) pairs
+    """
+
+    offset = HEADER.size + SECTION.size * len(sections)
+    directory = []
+    for name, data in sections:
+        offset += -offset % 8
+        directory.append((name, offset, len(data)))
+        offset += len(data)
+
+    byte_order = 0 if sys.byteorder == "little" else 1
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, byte_order, row_count, len(sections)))
+        for name, start, length in directory:
+            f.write(SECTION.pack(name.encode("ascii"), start, length))
+
+        for (name, data), (_, start, _) in zip(sections, directory):
+            f.write(b"\0" * (start - f.tell()))
+            f.write(data)
+
+    os.replace(temp_path, path)
+
+
+class BeachStore:
+    """
+    Read-only view of a compiled beach store. The file is memory-mapped, so opening it is cheap and
+    the pages are shared between every process that has it open. Rows are only decoded when asked for
+    """
+
+    def __init__(self, path=store_path):
+        """
+        Open a compiled store
+
+        :param path: the store to open
+        :raises ValueError: if the file is not a store this version can read
+        """
+
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, byte_order, self.row_count, section_count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION or byte_order != (0 if sys.byteorder == "little" else 1):
+            raise ValueError(f"'{path}' is not a compatible beach store")
+
+        view = memoryview(self.map)
+        self.sections = {}
+        for i in range(section_count):
+            name, start, length = SECTION.unpack_from(self.map, HEADER.size + i * SECTION.size)
+            self.sections[name.rstrip(b"\0").decode("ascii")] = view[start:start + length]
+
+        self.fields = json.loads(bytes(self.sections["fields"]).decode("utf-8"))
+        self.field_columns = {name: i for i, name in enumerate(self.fields)}
+
+        self.strings = self.sections["strings"]
+        self.string_offsets = self.sections["string_offsets"].cast("I")
+        self.ids = self.sections["ids"].cast("I")
+        self.id_index = self.sections["id_index"].cast("I")
+        self.cells = self.sections["cells"].cast("I")
+        self.kd_tree = self.sections["kd_tree"].cast("I")
+        self.uv_city_names = json.loads(bytes(self.sections["uv_cities"]).decode("utf-8"))
+        self.uv_cities = self.sections["uv_city"]
+        self.grid_offices = json.loads(bytes(self.sections["grid_offices"]).decode("utf-8"))
+        self.grid_office = self.sections["grid_office"].cast("H")
+        self.grid_x = self.sections["grid_x"].cast("H")
+        self.grid_y = self.sections["grid_y"].cast("H")
+        self.zones = self.sections["zone"].cast("I")
+        self.centroid_arrays = None
+        self.county_indexes = {}
+
+    def __len__(self):
+        return self.row_count
+
+    def string(self, string_id):
+        """
+        Decode a string from the string table
+
+        :param string_id: id of the string
+        :returns: the string
+        """
+
+        start = self.string_offsets[string_id]
+        stop = self.string_offsets[string_id + 1]
+        return str(self.strings[start:stop], "utf-8")
+
+    def beach_id(self, row):
+        """
+        :param row: the row to look at
+        :returns: the beach id stored in that row
+        """
+
+        return self.string(self.ids[row])
+
+    def row_of(self, beach_id):
+        """
+        Find the row for a beach id with a binary search over the id index
+
+        :param beach_id: the beach id to search for
+        :returns: the row, or -1 if the beach id is not in the store. Ids that aren't strings are never in it
+        """
+
+        if not isinstance(beach_id, str):
+            return -1
+
+        low = 0
+        high = self.row_count
+        while low < high:
+            middle = (low + high) // 2
+            found = self.beach_id(self.id_index[middle])
+            if found < beach_id:
+                low = middle + 1
+            elif found > beach_id:
+                high = middle
+            else:
+                return self.id_index[middle]
+
+        return -1
+
+    def field(self, row, name):
+        """
+        :param row: the row to look at
+        :param name: the field name, as it appears in beach_attributes.json
+        :returns: the raw string value of the field, or an empty string if the store doesn't have it
+        """
+
+        column = self.field_columns.get(name)
+        if column is None:
+            return ""
+        return self.string(self.cells[row * len(self.fields) + column])
+
+    def record(self, row):
+        """
+        :param row: the row to decode
+        :returns: the raw record for that row, the same as its entry in beach_attributes.json
+        """
+
+        start = row * len(self.fields)
+        return {name: self.string(self.cells[start + i]) for i, name in enumerate(self.fields)}
+
+    def column(self, name):
+        """
+        :param name: one of the keys of NUMERIC_FIELDS, "centroid_lat", "centroid_lon", "unit_x", "unit_y" or "unit_z"
+        :returns: the float column, with NaN for missing values. Indexed by row
+        """
+
+        return self.sections[name].cast("d")
+
+    def number(self, row, name):
+        """
+        :param row: the row to look at
+        :param name: one of the keys of NUMERIC_FIELDS
+        :returns: the value as a float, or NaN if it was missing or invalid
+        """
+
+        return self.column(name)[row]
+
+    def uv_city(self, row):
+        """
+        :param row: the row to look at
+        :returns: the UV bulletin city closest to the beach, or an empty string if the beach has no centroid
+        """
+
+        index = self.uv_cities[row]
+        if index == NO_UV_CITY:
+            return ""
+        return self.uv_city_names[index]
+
+    def gridpoint(self, row):
+        """
+        :param row: the row to look at
+        :returns: the beach's NWS forecast gridpoint as (office, grid x, grid y), or None if it isn't known
+        """
+
+        office = self.grid_office[row]
+        if office == NO_GRIDPOINT:
+            return None
+        return (self.grid_offices[office], self.grid_x[row], self.grid_y[row])
+
+    def zone(self, row):
+        """
+        :param row: the row to look at
+        :returns: the NWS land zone id the beach is in, an empty string if it was looked up and isn't in one,
+            or None if it isn't in the zone table
+        """
+
+        zone = self.zones[row]
+        if zone == NO_ZONE:
+            return None
+        return self.string(zone)
+
+    def nearest(self, lat, lon, count, after=None):
+        """
+        Find the beaches whose centroids are closest to a point by great-circle distance, using the spatial index
+
+        :param lat: latitude to search from
+        :param lon: longitude to search from
+        :param count: how many beaches to find
+        :param after: optional (score, row) pair from a previous call. Only beaches ranked after it are returned
+        :returns: list of (score, row) pairs, closest first, scored as in spatial_index.nearest. Beaches without a
+            centroid are never included
+        """
+
+        return spatial_index.nearest(self.kd_tree, self.column("unit_x"), self.column("unit_y"), self.column("unit_z"), lat, lon, count, after)
+
+    def county_index(self, state):
+        """
+        Get the distinct counties in a state, decoding them on first use
+
+        :param state: the enumerated state
+        :returns: list of (county, rows) pairs, in the order each county first appears. Each list of rows is in
+            file order. Empty if the state has no beaches
+        """
+
+        if not state in self.county_indexes:
+            section = self.sections.get(f"county_{state}")
+            if section is None:
+                self.county_indexes[state] = []
+            else:
+                self.county_indexes[state] = [(county, rows) for county, rows in json.loads(bytes(section).decode("utf-8"))]
+        return self.county_indexes[state]
+
+    def centroids(self):
+        """
+        Get the beach centroids as NumPy arrays for the vectorized distance kernel, resolving them on first use
+
+        :returns: the CentroidArrays for this store
+        """
+
+        if self.centroid_arrays is None:
+            import distance_kernel
+            self.centroid_arrays = distance_kernel.CentroidArrays(self)
+        return self.centroid_arrays
+
+
+def is_stale(path=store_path, source=json_path):
+    """
+    Check if a store needs to be compiled
+
+    :param path: the compiled store
+    :param source: the JSON it is compiled from
+    :returns: True if the store is missing or older than its source or one of the lookup tables
+    """
+
+    if not os.path.exists(path):
+        return True
+    for dependency in (source, gridpoints_path, zones_path):
+        if os.path.exists(dependency) and os.path.getmtime(path) < os.path.getmtime(dependency):
+            return True
+    return False
+
+
+def load_tables():
+    """
+    Read the per-beach lookup tables that have been built
+
+    :returns: (gridpoints, zones), either of which is None if it hasn't been built
+    """
+
+    tables = []
+    for table_path in (gridpoints_path, zones_path):
+        table = None
+        if os.path.exists(table_path):
+            with open(table_path, 'r') as table_file:
+                table = json.loads(table_file.read())
+        tables.append(table)
+
+    return tuple(tables)
+
+
+def compile_from_json(path=store_path, source=json_path):
+    """
+    Compile the store from beach_attributes.json and, if they have been built, beach_gridpoints.json and
+    beach_zones.json. If beach_attributes.json hasn't been built either, as in a fresh checkout, the whole
+    data build is run from the CSV instead
+
+    :param path: where to write the store
+    :param source: the beach JSON to compile
+    """
+
+    if not os.path.exists(source) and path == store_path and source == json_path:
+        import build_data
+        build_data.build()
+        return
+
+    with open(source, 'r') as beaches_file:
+        beaches = json.loads(beaches_file.read())
+
+    compile_store(beaches, path, *load_tables())
+
+
+def load_store(path=store_path, source=json_path):
+    """
+    Open the compiled store, compiling it from beach_attributes.json first if it is missing or out of date
+
+    :param path: the compiled store
+    :param source: the JSON it is compiled from
+    :returns: the opened BeachStore
+    """
+
+    if is_stale(path, source):
+        compile_from_json(path, source)
+
+    try:
+        return BeachStore(path)
+    except ValueError:
+        # Written by an older version, so build it again
+        compile_from_json(path, source)
+        return BeachStore(path)
+
+
+# Compile just the store: python beach_store.py. To build every data file, use build_data.py
+if __name__ == "__main__":
+    compile_from_json(store_path, json_path)
+
+    print(f"Compiled {store_path}")
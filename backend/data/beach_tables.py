@@ -0,0 +1,104 @@
+import json
+import math
+import os
+import sys
+
+import beach_store
+
+# Save progress after this many lookups
+SAVE_EVERY = 100
+
+
+def load_table(path):
+    """
+    Read a per-beach lookup table
+
+    :param path: the table to read
+    :returns: map of beach id to value, or None if the table hasn't been built
+    """
+
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as table_file:
+        return json.loads(table_file.read())
+
+
+def save_table(table, path):
+    """
+    Write a per-beach lookup table, replacing the old one all at once
+
+    :param table: map of beach id to value
+    :param path: where to write the table
+    """
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as table_file:
+        table_file.write(json.dumps(table))
+    os.replace(temp_path, path)
+
+
+def build_table(path, lookup, beach_ids=None):
+    """
+    Look up a value for every beach centroid that isn't in a table yet, and save the table. The table is
+    saved as it goes, so an interrupted run picks up where it left off. Beaches that lookup returns None for
+    are kept as None so they aren't looked up again, and beaches whose lookup raises are left out so the next
+    run tries them again
+
+    :param path: the table to build, as beach id to value
+    :param lookup: function taking a latitude and longitude and returning the value for that point
+    :param beach_ids: optional list of beach ids. If given, only those beaches are looked up
+    """
+
+    beaches = beach_store.load_store(beach_store.store_path, beach_store.json_path)
+
+    if beach_ids is not None:
+        beach_ids = set(beach_ids)
+
+    table = load_table(path)
+    if table is None:
+        table = {}
+
+    lats = beaches.column("centroid_lat")
+    lons = beaches.column("centroid_lon")
+
+    looked_up = 0
+    for row in range(len(beaches)):
+        beach_id = beaches.beach_id(row)
+        if beach_id in table or math.isnan(lats[row]) or math.isnan(lons[row]):
+            continue
+        if beach_ids is not None and not beach_id in beach_ids:
+            continue
+
+        try:
+            table[beach_id] = lookup(lats[row], lons[row])
+        except Exception as e:
+            print(f"Could not look up {beach_id}: {e}", file=sys.stderr)
+            continue
+
+        looked_up += 1
+        if looked_up % SAVE_EVERY == 0:
+            save_table(table, path)
+            print(f"Looked up {looked_up} beaches")
+
+    save_table(table, path)
+    print(f"Looked up {looked_up} beaches, saved {path}")
+
+
+def build_from_arguments(arguments, path, lookup):
+    """
+    Build a table from the command line. --output writes it somewhere other than path, and --beach-ids
+    only looks up a comma separated list of beaches
+
+    :param arguments: command line arguments
+    :param path: where the table goes by default
+    :param lookup: function taking a latitude and longitude and returning the value for that point
+    """
+
+    if "--output" in arguments:
+        path = arguments[arguments.index("--output") + 1]
+
+    beach_ids = None
+    if "--beach-ids" in arguments:
+        beach_ids = [beach_id.strip() for beach_id in arguments[arguments.index("--beach-ids") + 1].split(",")]
+
+    build_table(path, lookup, beach_ids)
@@ -0,0 +1,17 @@
+import sys
+
+import beach_store
+import beach_tables
+
+# Build step: python beach_zones.py [--output PATH] [--beach-ids ID,ID,...]
+#
+# Looks up the NWS land zone for every beach centroid and saves them to
+# beach_data/beach_zones.json, which beach_store.py compiles into the store. The
+# table is saved as it goes, so an interrupted run picks up where it left off. Requests
+# go to BEACH_DAY_NWS_URL, so the table can also be built against standin.py.
+
+
+if __name__ == "__main__":
+    import events
+
+    beach_tables.build_from_arguments(sys.argv[1:], beach_store.zones_path, events.get_zone_id)
@@ -1,14 +1,107 @@
 import json
-import os
+import math
 
-# Construct the correct absolute path
-base_dir = os.path.dirname(__file__)  # Get the directory of the current script
-json_path = os.path.join(base_dir, "beach_data", "beach_attributes.json")
+import beach_store
+import timings
 
-# All functions use this, and it never changes, so load it globally
-beaches = {}
-with open(json_path, 'r') as beaches_file:
-    beaches = json.loads(beaches_file.read())
+# All functions use this, and it never changes, so open it once. The store is memory-mapped,
+# so rows are only decoded when they are looked up
+store = None
+
+
+def get_store():
+    """
+    Get the compiled beach store, opening it on first use
+
+    :returns: the BeachStore shared by this process
+    """
+
+    global store
+    if store is None:
+        with timings.span("load beach store"):
+            store = beach_store.load_store()
+    return store
+
+
+class BeachRecord:
+    """
+    One beach, normalized once from its row in the store. Numbers are kept as floats, with NaN where they are
+    missing, and the response map is only built when it is asked for
+    """
+
+    __slots__ = ("row", "name", "county", "state", "tribe", "access", "length", "latitude", "longitude", "joinkey",
+                 "uv_city", "gridpoint", "zone")
+
+    def __init__(self, beaches, row):
+        """
+        :param beaches: the BeachStore to read from
+        :param row: the beach's row in the store
+        """
+
+        self.row = row
+        self.name = beaches.field(row, "BEACH_NAME")
+        self.county = beaches.field(row, "BEACH_COUNTY")
+        self.state = beaches.field(row, "BEACH_STATE")
+        self.tribe = beaches.field(row, "BEACH_TRIBE_CODE")
+        self.access = beaches.field(row, "BEACH_ACCESS")
+        self.joinkey = beaches.field(row, "SOURCE_JOINKEY")
+
+        # Length is already parsed in the store, and the centroid is worked out from the endpoints the
+        # same way as averaging them here would be
+        self.length = beaches.number(row, "length")
+        self.latitude = beaches.column("centroid_lat")[row]
+        self.longitude = beaches.column("centroid_lon")[row]
+
+        self.uv_city = beaches.uv_city(row)
+        self.gridpoint = beaches.gridpoint(row)
+        self.zone = beaches.zone(row)
+
+    def to_dict(self):
+        """
+        :returns: JSON-compatible map in the format of get_beach_info_by_id. A new map every time, so callers
+            can add to it
+        """
+
+        return {
+            "beach_name": self.name,
+            "beach_county": self.county,
+            "beach_state": self.state,
+            "beach_tribe": self.tribe,
+            "beach_length": "" if math.isnan(self.length) else self.length,
+            "beach_access": self.access,
+            "latitude": "" if math.isnan(self.latitude) else str(self.latitude),
+            "longitude": "" if math.isnan(self.longitude) else str(self.longitude),
+            "joinkey": self.joinkey
+        }
+
+
+# Beaches that have been looked up, by id, so searches and batches that ask for the same beach again
+# don't decode it again. Ids that aren't in the store are not kept, so this can't grow past the number of
+# beaches however many unknown ids a worker is asked about
+records = {}
+
+
+def get_record(beach_id):
+    """
+    Get the normalized record for a beach, building it on first use
+
+    :param beach_id: the beach id to look up
+    :returns: the BeachRecord, or None if the beach id is not in the store
+    """
+
+    # Ids from a request can be any JSON value, and only strings can be in the store
+    if not isinstance(beach_id, str):
+        return None
+
+    record = records.get(beach_id)
+    if record is None:
+        beaches = get_store()
+        row = beaches.row_of(beach_id)
+        if row == -1:
+            return None
+        record = BeachRecord(beaches, row)
+        records[beach_id] = record
+    return record
 
 
 def get_beach_info_by_id(beach_id):
@@ -29,90 +122,10 @@ def get_beach_info_by_id(beach_id):
     * joinkey
     """
 
-    try:
-        beach_info = beaches[beach_id]
-
-        # Check and replace missing or empty fields with empty string
-        beach_name = beach_info.get("BEACH_NAME", "")
-        beach_county = beach_info.get("BEACH_COUNTY", "")
-        beach_state = beach_info.get("BEACH_STATE", "")
-        beach_tribe = beach_info.get("BEACH_TRIBE_CODE", "")
-        beach_length = beach_info.get("BEACH_LEN_IN_MI", "")
-        beach_access = beach_info.get("BEACH_ACCESS", "")
-
-        # Check if latitude and longitude values are available before calculating
-        start_lat = beach_info.get("START_LATITUDE_MEASURE", "")
-        end_lat = beach_info.get("END_LATITUDE_MEASURE", "")
-        start_lon = beach_info.get("START_LONGITUDE_MEASURE", "")
-        end_lon = beach_info.get("END_LONGITUDE_MEASURE", "")
-
-        # Use exception handling to detect invalid length and endpoint measurements
-        try:
-            beach_length = float(beach_length)
-        except ValueError:
-            beach_length = ""
-
-        try:
-            start_lat = float(start_lat)
-        except ValueError:
-            start_lat = ""
-        
-        try:
-            end_lat = float(end_lat)
-        except ValueError:
-            end_lat = ""
-        
-        try:
-            start_lon = float(start_lon)
-        except ValueError:
-            start_lon = ""
-        
-        try:
-            end_lon = float(end_lon)
-        except ValueError:
-            end_lon = ""
-
-        # Compute latitude as the average of start and end if they both exist, or
-        # select whichever exists. This is because sometimes one end is left out if
-        # it would be similar to the other
-        if start_lat != "" and end_lat != "":
-            latitude = str((start_lat + end_lat) / 2.0)
-        elif start_lat != "":
-            latitude = str(start_lat)
-        elif end_lat != "":
-            latitude = str(end_lat)
-        else:
-            latitude = ""
-        
-        # Same as above, for longitude
-        if start_lon != "" and end_lon != "":
-            longitude = str((start_lon + end_lon) / 2.0)
-        elif start_lon != "":
-            longitude = str(start_lon)
-        elif end_lat != "":
-            longitude = str(end_lon)
-        else:
-            longitude = ""
-        
-        
-        joinkey = beach_info.get("SOURCE_JOINKEY", "")
-        
-        result = {
-            "beach_name": beach_name,
-            "beach_county": beach_county,
-            "beach_state": beach_state,
-            "beach_tribe": beach_tribe,
-            "beach_length": beach_length,
-            "beach_access": beach_access,
-            "latitude": latitude,
-            "longitude": longitude,
-            "joinkey": joinkey
-        }
+    record = get_record(beach_id)
 
-        return result
-        
     # If requested beach ID doest not exist, exit and respond with an error response
-    except KeyError as e:
+    if record is None:
         result = {
             "code": "ERROR",
             "error_type": "invalid_beach_id",
@@ -121,12 +134,51 @@ def get_beach_info_by_id(beach_id):
         print(json.dumps(result, indent=4))
         exit()
 
+    return record.to_dict()
+
 
+def get_uv_city(beach_id):
+    """
+    Get the UV bulletin city closest to a beach, as worked out when the beach data was built
+
+    :param beach_id: the beach id to look up
+    :returns: the city name as it appears on the bulletin, or an empty string if it isn't known
+    """
 
+    record = get_record(beach_id)
+    if record is None:
+        return ""
+    return record.uv_city
 
 
+def get_gridpoint(beach_id):
+    """
+    Get the NWS forecast gridpoint a beach falls in, as worked out when the beach data was built
+
+    :param beach_id: the beach id to look up
+    :returns: (office, grid x, grid y), or None if it isn't known
+    """
+
+    record = get_record(beach_id)
+    if record is None:
+        return None
+    return record.gridpoint
+
+
+def get_zone(beach_id):
+    """
+    Get the NWS land zone a beach is in, as worked out when the beach data was built
+
+    :param beach_id: the beach id to look up
+    :returns: the zone id, an empty string if the beach isn't in a zone, or None if it isn't known
+    """
+
+    record = get_record(beach_id)
+    if record is None:
+        return None
+    return record.zone
+
 
-# Get dummy beach info
 def get_dummy_beach_info_by_id(beach_id):
     """
     Original dummy function from before the ID system was finalized. Still compatible with many other components, so
@@ -147,7 +199,12 @@ def get_dummy_beach_info_by_id(beach_id):
     """
 
     try:
-        beach_info = beaches[beach_id]
+        beaches = get_store()
+        row = beaches.row_of(beach_id)
+        if row == -1:
+            raise KeyError(beach_id)
+
+        beach_info = beaches.record(row)
 
         # Check and replace missing or empty fields with "N/A"
         beach_name = beach_info.get("BEACH_NAME", "N/A")
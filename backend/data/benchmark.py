@@ -0,0 +1,388 @@
+import inspect
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+# Benchmarks for the data layer: python benchmark.py [--quick] [--output results.json]
+#
+# Times the hot paths of the data layer without touching the network: searches for every state and across
+# page sizes and many points, beach lookups, UV bulletin parsing and lookups, the get_weather.py dispatcher,
+# whole one-shot runs of get_weather.py, and response encoding. Results are written as JSON, and two result
+# files can be compared with: python benchmark.py --compare old.json new.json [--threshold 0.05]
+#
+# The benchmarks only go through entry points that every version of the data layer has, and skip the ones
+# a version doesn't have yet, so this file can be copied into an older checkout to measure it the same way
+
+# Page sizes to search for
+PAGE_SIZES = [10, 50, 100, 250, 500]
+
+# Points to search from, and beaches to look up
+POINT_COUNT = 200
+LOOKUP_COUNT = 1000
+
+# Times each benchmark is run, and the best, median and mean of them are reported
+REPEATS = 5
+
+# Ratio of medians past which --compare calls a change faster or slower
+COMPARE_THRESHOLD = 0.05
+
+# The same inputs every run, so results from two commits can be compared
+SEED = 330
+
+# Cities on the made-up UV index bulletin, about as many as the real one has
+BULLETIN_CITIES = 58
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+json_path = os.path.join(base_dir, "beach_data", "beach_attributes.json")
+
+
+def run_benchmark(body, ops, repeats):
+    """
+    Time a benchmark
+
+    :param body: function that runs the benchmark once
+    :param ops: how many operations one run of body does
+    :param repeats: how many times to run body
+    :returns: JSON-compatible map with the seconds per operation of the best, median and mean runs
+    """
+
+    # The first run pays for loading indexes and compiling, so it isn't counted
+    body()
+
+    times = []
+    for _ in range(repeats):
+        begin = time.perf_counter()
+        body()
+        times.append((time.perf_counter() - begin) / ops)
+
+    return {
+        "ops": ops,
+        "repeats": repeats,
+        "best": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times)
+    }
+
+
+def load_inputs():
+    """
+    Read the beach data the inputs are picked from. It is read straight from beach_attributes.json, which
+    every version has, so every version is given the same inputs
+
+    :returns: (list of beach ids in file order, map of beach id to (lat, lon) for beaches with both endpoints,
+        map of state to its counties in the order they first appear)
+    """
+
+    with open(json_path, 'r') as f:
+        records = json.loads(f.read())
+
+    centers = {}
+    counties = {}
+    for beach_id, record in records.items():
+        try:
+            lat = (float(record["START_LATITUDE_MEASURE"]) + float(record["END_LATITUDE_MEASURE"])) / 2.0
+            lon = (float(record["START_LONGITUDE_MEASURE"]) + float(record["END_LONGITUDE_MEASURE"])) / 2.0
+            centers[beach_id] = (lat, lon)
+        except (KeyError, ValueError):
+            pass
+
+        state_counties = counties.setdefault(record.get("BEACH_STATE", ""), [])
+        if not record.get("BEACH_COUNTY", "") in state_counties:
+            state_counties.append(record.get("BEACH_COUNTY", ""))
+
+    counties.pop("", None)
+    return (list(records.keys()), centers, counties)
+
+
+def sample_points(centers, count, rng):
+    """
+    Pick points to search from. Half are beaches, which is what the frontend mostly sends, and half are
+    anywhere in the lower 48 states
+
+    :param centers: map of beach id to (lat, lon)
+    :param count: how many points to pick
+    :param rng: random.Random to pick with
+    :returns: list of (lat, lon) pairs
+    """
+
+    points = [centers[beach_id] for beach_id in rng.sample(list(centers.keys()), count // 2)]
+    while len(points) < count:
+        points.append((rng.uniform(25.0, 49.0), rng.uniform(-124.0, -67.0)))
+    return points
+
+
+def synthetic_bulletin(rng):
+    """
+    Make up a UV index bulletin in the same layout as the CPC's bulletin.txt, two cities to a line
+
+    :param rng: random.Random to pick the UV indexes with
+    :returns: the text of the bulletin
+    """
+
+    lines = [
+        "         UV INDEX FORECAST",
+        "",
+        "CITY               STATE  UVI        CITY               STATE  UVI"
+    ]
+    cells = [f"{'CITY ' + str(i):<18}  {'ST':<5}  {rng.randint(0, 11):>3}" for i in range(BULLETIN_CITIES)]
+    for i in range(0, len(cells), 2):
+        lines.append("        ".join(cells[i:i + 2]))
+    return "\n".join(lines) + "\n"
+
+
+def run_one_shot(request):
+    """
+    Run get_weather.py once for a request, the way the backend did before worker mode
+
+    :param request: the request, as a JSON-compatible map
+    """
+
+    subprocess.run([sys.executable, os.path.join(base_dir, "get_weather.py")], input=(json.dumps(request) + "\n").encode("utf-8"),
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+
+def collect(quick=False):
+    """
+    Run every benchmark that this version of the data layer supports
+
+    :param quick: if True, run each benchmark fewer times over fewer inputs, for a fast check
+    :returns: map of benchmark name to its parameters and timings
+    """
+
+    import basic_weather
+    import beach_search
+    import beaches
+
+    repeats = 2 if quick else REPEATS
+    point_count = POINT_COUNT // 10 if quick else POINT_COUNT
+    lookup_count = LOOKUP_COUNT // 10 if quick else LOOKUP_COUNT
+
+    # Versions with a beach store build beach_attributes.json along with it if it is missing
+    get_store = getattr(beaches, "get_store", None)
+    if get_store is not None:
+        get_store()
+
+    rng = random.Random(SEED)
+    all_ids, centers, counties = load_inputs()
+    points = sample_points(centers, point_count, rng)
+    beach_ids = rng.sample(all_ids, lookup_count)
+    states = sorted(counties.keys())
+
+    # Caches that later versions keep between requests. They are emptied where a benchmark needs to start cold
+    clear_search_cache = getattr(beach_search, "clear_search_cache", None)
+    records = getattr(beaches, "records", None)
+
+    def clear():
+        if clear_search_cache is not None:
+            clear_search_cache()
+
+    results = {}
+
+    def add(name, params, body, ops):
+        results[name] = {"params": params, **run_benchmark(body, ops, repeats)}
+
+    # Searching from scratch, the page after it, and pages that the search cache already holds
+    for size in PAGE_SIZES:
+        def search_points(size=size):
+            for lat, lon in points:
+                clear()
+                beach_search.search_beach_by_lat_lon_no_weather(lat, lon, 0, size)
+        add(f"search_lat_lon/size={size}", {"points": len(points), "size": size}, search_points, len(points))
+
+    for size in PAGE_SIZES:
+        def next_pages(size=size):
+            for lat, lon in points:
+                clear()
+                page = beach_search.search_beach_by_lat_lon_no_weather(lat, lon, 0, size)
+                if page.get("cursor"):
+                    beach_search.search_beach_by_lat_lon_no_weather(lat, lon, 0, size, page["cursor"])
+                else:
+                    beach_search.search_beach_by_lat_lon_no_weather(lat, lon, size, 2 * size)
+        add(f"search_lat_lon_next_page/size={size}", {"points": len(points), "size": size}, next_pages, len(points))
+
+    def cached_point():
+        lat, lon = points[0]
+        for _ in points:
+            beach_search.search_beach_by_lat_lon_no_weather(lat, lon, 0, 10)
+    clear()
+    add("search_lat_lon_cached/size=10", {"points": len(points), "size": 10}, cached_point, len(points))
+
+    for state in states:
+        queries = [counties[state][0], counties[state][-1][::-1]]
+        for size in (10, beach_search.MAX_SEARCH_RESULTS):
+            def search_state(state=state, queries=queries, size=size):
+                for county in queries:
+                    clear()
+                    beach_search.search_beach_by_county_state_no_weather(county, state, 0, size)
+            add(f"search_county_state/state={state}/size={size}", {"state": state, "counties": len(counties[state]), "size": size},
+                search_state, len(queries))
+
+    # Beach lookups, before and after each beach has been decoded once
+    def lookup_cold():
+        if records is not None:
+            records.clear()
+        for beach_id in beach_ids:
+            beaches.get_beach_info_by_id(beach_id)
+    add("get_beach_info_by_id/cold", {"beaches": len(beach_ids)}, lookup_cold, len(beach_ids))
+
+    def lookup_warm():
+        for beach_id in beach_ids:
+            beaches.get_beach_info_by_id(beach_id)
+    add("get_beach_info_by_id/warm", {"beaches": len(beach_ids)}, lookup_warm, len(beach_ids))
+
+    # UV bulletin parsing, and lookups against a bulletin that is already loaded for today. Older versions
+    # download the bulletin for every lookup, so they only get these where they can parse it on its own
+    bulletin = synthetic_bulletin(rng)
+    parse_uv_bulletin = getattr(basic_weather, "parse_uv_bulletin", None)
+    if parse_uv_bulletin is not None:
+        uvmap = parse_uv_bulletin(bulletin)
+        add("parse_uv_bulletin", {"cities": len(uvmap), "bytes": len(bulletin)}, lambda: parse_uv_bulletin(bulletin), 1)
+
+        if hasattr(basic_weather, "uv_bulletin"):
+            basic_weather.uv_bulletin.update({"uvmap": uvmap, "day": datetime.now(timezone.utc).date().isoformat(), "retry": None})
+            add("get_uv_index/closest_city", {"points": len(points)},
+                lambda: [basic_weather.get_uv_index(lat, lon) for lat, lon in points], len(points))
+            if "uv_city" in inspect.signature(basic_weather.get_uv_index).parameters:
+                add("get_uv_index/stored_city", {"points": len(points)},
+                    lambda: [basic_weather.get_uv_index(lat, lon, "CITY 0 ST") for lat, lon in points], len(points))
+
+    # The whole dispatcher in this process, for the requests that don't need the network. Older versions only
+    # run requests as a script, which the one-shot benchmarks below cover
+    requests = {
+        "get_beach_info_by_id": [{"request_type": "get_beach_info_by_id", "beach_id": beach_id} for beach_id in beach_ids]
+    }
+    for size in (10, beach_search.MAX_SEARCH_RESULTS):
+        requests[f"search_beach_by_lat_lon_no_weather/size={size}"] = [
+            {"request_type": "search_beach_by_lat_lon_no_weather", "latitude": lat, "longitude": lon, "start": 0, "stop": size}
+            for lat, lon in points
+        ]
+        requests[f"search_beach_by_county_state_no_weather/size={size}"] = [
+            {"request_type": "search_beach_by_county_state_no_weather", "county": counties[state][0], "state": state, "start": 0, "stop": size}
+            for state in states
+        ]
+
+    # Versions without handle_request read a request from standard input as soon as get_weather is imported,
+    # so it is only imported once its source shows that it can be
+    with open(os.path.join(base_dir, "get_weather.py"), 'r') as f:
+        dispatcher = "def handle_request(" in f.read()
+
+    handle_request = None
+    if dispatcher:
+        import get_weather
+        handle_request = get_weather.handle_request
+
+    if handle_request is not None:
+        for name, inputs in requests.items():
+            def dispatch(inputs=inputs):
+                clear()
+                for input_params in inputs:
+                    handle_request(input_params)
+            add(f"dispatch/{name}", {"requests": len(inputs)}, dispatch, len(inputs))
+
+    # Whole runs of get_weather.py, each in a new process, which is how the backend ran every request before
+    # worker mode. These take a while each, so there are only a few
+    one_shot = {
+        "get_beach_info_by_id": requests["get_beach_info_by_id"][0],
+        "search_beach_by_lat_lon_no_weather/size=10": requests["search_beach_by_lat_lon_no_weather/size=10"][0],
+        "search_beach_by_county_state_no_weather/size=10": requests["search_beach_by_county_state_no_weather/size=10"][0]
+    }
+    for name, request in one_shot.items():
+        add(f"one_shot/{name}", {"requests": 1}, lambda request=request: run_one_shot(request), 1)
+
+    # Writing a full page of results
+    try:
+        import response_encoding
+    except ImportError:
+        response_encoding = None
+
+    if response_encoding is not None:
+        lat, lon = points[0]
+        page = beach_search.search_beach_by_lat_lon_no_weather(lat, lon, 0, beach_search.MAX_SEARCH_RESULTS)
+        for encoding in response_encoding.ENCODINGS:
+            if response_encoding.check_encoding(encoding) is not None:
+                continue
+            add(f"encode/{encoding}", {"results": len(page["order"]), "bytes": len(response_encoding.encode(page, encoding))},
+                lambda encoding=encoding: response_encoding.encode(page, encoding), 1)
+
+    return results
+
+
+def describe():
+    """
+    Describe where the benchmarks ran, so results from different machines or commits can be told apart
+
+    :returns: JSON-compatible map
+    """
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.time()
+    }
+
+
+def compare(old, new, threshold=COMPARE_THRESHOLD):
+    """
+    Compare two sets of results by their median times
+
+    :param old: results from describe and collect, as loaded from a results file
+    :param new: results to compare against them
+    :param threshold: ratio past which a change is reported as faster or slower
+    :returns: list of lines describing each benchmark
+    """
+
+    lines = [f"{'benchmark':<60} {'old':>12} {'new':>12} {'ratio':>8}"]
+    for name in sorted(set(old["results"]) | set(new["results"])):
+        if not name in old["results"] or not name in new["results"]:
+            lines.append(f"{name:<60} {'only in ' + ('new' if name in new['results'] else 'old'):>34}")
+            continue
+
+        old_median = old["results"][name]["median"]
+        new_median = new["results"][name]["median"]
+        ratio = new_median / old_median if old_median > 0 else float("inf")
+
+        change = ""
+        if ratio < 1 - threshold:
+            change = "faster"
+        elif ratio > 1 + threshold:
+            change = "slower"
+
+        lines.append(f"{name:<60} {old_median * 1e6:>10.1f}us {new_median * 1e6:>10.1f}us {ratio:>7.2f}x {change}")
+    return lines
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+
+    if "--compare" in arguments:
+        position = arguments.index("--compare")
+        with open(arguments[position + 1], 'r') as f:
+            old = json.loads(f.read())
+        with open(arguments[position + 2], 'r') as f:
+            new = json.loads(f.read())
+        threshold = COMPARE_THRESHOLD
+        if "--threshold" in arguments:
+            threshold = float(arguments[arguments.index("--threshold") + 1])
+        print("\n".join(compare(old, new, threshold)))
+    else:
+        report = describe()
+        report["results"] = collect("--quick" in arguments)
+
+        if "--output" in arguments:
+            with open(arguments[arguments.index("--output") + 1], 'w') as f:
+                json.dump(report, f, indent=4)
+        else:
+            print(json.dumps(report, indent=4))
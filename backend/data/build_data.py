@@ -0,0 +1,200 @@
+import csv
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import beach_store
+
+# Build step: python build_data.py [--force] [--tables [--beach-ids ID,ID,...]]
+#
+# Reads the EPA beach attributes CSV once and writes everything derived from it: beach_attributes.json,
+# the per-state shards in by_state/states, and the compiled beach store with its centroids, spatial and
+# county indexes, UV cities, and the gridpoint and zone tables if they have been looked up. Each artifact
+# records a hash of its inputs in build_manifest.json, and is skipped if it is already up to date.
+#
+# With --tables, the gridpoint and zone tables are looked up from the NWS first, the same way
+# beach_gridpoints.py and beach_zones.py do, and the store is compiled with them. Only beaches missing from
+# the tables are looked up. Requests go to BEACH_DAY_NWS_URL, so this can also run against standin.py.
+
+# Construct the correct absolute path
+base_dir = os.path.dirname(__file__)  # Get the directory of the current script
+data_dir = os.path.join(base_dir, "beach_data")
+csv_path = os.path.join(data_dir, "beach_attributes_20240228.csv")
+shards_dir = os.path.join(data_dir, "by_state", "states")
+manifest_path = os.path.join(data_dir, "build_manifest.json")
+
+# The CSV opens with a title and a publisher line before the header
+CSV_HEADER_ROW = 2
+
+# Most artifacts written at once
+BUILD_WORKERS = int(os.environ.get("BEACH_DAY_BUILD_WORKERS", str(os.cpu_count() or 4)))
+
+
+def read_csv(path=csv_path):
+    """
+    Parse the beach attributes CSV. Fields are read with the csv module, so quoted values that contain commas,
+    such as "Mariner Park Beach, aka Homer Spit Beach", stay in one field
+
+    :param path: the CSV to read
+    :returns: map of beach id to record, in file order. Each record maps every other column to its value
+    """
+
+    with open(path, 'r', encoding="utf-8-sig", newline="") as csv_file:
+        reader = csv.reader(csv_file)
+        for _ in range(CSV_HEADER_ROW):
+            next(reader)
+
+        header = next(reader)
+        beaches = {}
+        for row in reader:
+            if len(row) == 0 or row[0] == "":
+                continue
+            beaches[row[0]] = dict(zip(header[1:], row[1:]))
+
+    return beaches
+
+
+def split_by_state(beaches):
+    """
+    Split beaches into per-state shards by the state prefix of their beach id
+
+    :param beaches: map of beach id to record
+    :returns: map of state to map of beach id to record, each in file order
+    """
+
+    states = {}
+    for beach_id, record in beaches.items():
+        states.setdefault(beach_id[0:2], {})[beach_id] = record
+    return states
+
+
+def hash_files(*paths):
+    """
+    Hash the contents of some files together. Missing files hash differently from empty ones
+
+    :param paths: the files to hash
+    :returns: hex digest
+    """
+
+    digest = hashlib.sha256()
+    for path in paths:
+        if not os.path.exists(path):
+            digest.update(b"missing\0")
+            continue
+
+        digest.update(b"file\0")
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def write_json(path, value):
+    """
+    Write a JSON file in the same format as the rest of beach_data, replacing the old one all at once
+
+    :param path: where to write it
+    :param value: JSON-compatible value
+    """
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(value, f, indent=4)
+    os.replace(temp_path, path)
+
+
+def build_tables(beach_ids=None):
+    """
+    Look up the NWS gridpoint and land zone of every beach that isn't in their tables yet
+
+    :param beach_ids: optional list of beach ids. If given, only those beaches are looked up
+    """
+
+    import beach_gridpoints
+    import beach_tables
+    import events
+    import upstream
+
+    N = upstream.Client()
+    beach_tables.build_table(beach_store.gridpoints_path, lambda lat, lon: beach_gridpoints.lookup_gridpoint(N, lat, lon), beach_ids)
+    beach_tables.build_table(beach_store.zones_path, events.get_zone_id, beach_ids)
+
+
+def build(force=False, tables=False, beach_ids=None):
+    """
+    Build every artifact that is missing or out of date
+
+    :param force: if True, build every artifact even if it looks up to date
+    :param tables: if True, also look up the gridpoint and zone tables, see build_tables
+    :param beach_ids: optional list of beach ids to limit the table lookups to
+    :returns: list of the names of the artifacts that were built
+    """
+
+    if tables:
+        # The lookups start from the beach centroids in the store, and the store is then compiled again
+        # with the tables
+        built = build(force)
+        build_tables(beach_ids)
+        return built + [name for name in build() if not name in built]
+
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.loads(f.read())
+
+    csv_hash = hash_files(csv_path)
+    store_hash = f"{hash_files(csv_path, beach_store.gridpoints_path, beach_store.zones_path)}-v{beach_store.VERSION}"
+
+    beaches = read_csv(csv_path)
+    states = split_by_state(beaches)
+
+    # Each artifact: (name, input hash, files it writes, function that writes them)
+    artifacts = [
+        ("beach_attributes", csv_hash, [beach_store.json_path], lambda: write_json(beach_store.json_path, beaches)),
+        ("beach_store", store_hash, [beach_store.store_path], lambda: beach_store.compile_store(beaches, beach_store.store_path, *beach_store.load_tables()))
+    ]
+    for state, shard in states.items():
+        shard_path = os.path.join(shards_dir, f"{state}.json")
+        artifacts.append((f"by_state/{state}", csv_hash, [shard_path], lambda shard_path=shard_path, shard=shard: write_json(shard_path, shard)))
+
+    stale = []
+    for name, input_hash, outputs, write in artifacts:
+        if force or manifest.get(name) != input_hash or not all(os.path.exists(output) for output in outputs):
+            stale.append((name, input_hash, write))
+
+    os.makedirs(shards_dir, exist_ok=True)
+    built = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, BUILD_WORKERS)) as executor:
+            futures = [(name, input_hash, executor.submit(write)) for name, input_hash, write in stale]
+
+            for name, input_hash, future in futures:
+                future.result()
+                manifest[name] = input_hash
+                built.append(name)
+    finally:
+        # Keep track of whatever did get built, even if something else failed
+        write_json(manifest_path, manifest)
+
+    # The store is checked against beach_attributes.json by modification time, and they may have finished in
+    # either order
+    if "beach_store" in built:
+        os.utime(beach_store.store_path)
+
+    return built
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+
+    beach_ids = None
+    if "--beach-ids" in arguments:
+        beach_ids = [beach_id.strip() for beach_id in arguments[arguments.index("--beach-ids") + 1].split(",")]
+
+    built = build("--force" in arguments, "--tables" in arguments, beach_ids)
+    if len(built) == 0:
+        print("Everything is up to date")
+    else:
+        print(f"Built {', '.join(built)}")
@@ -0,0 +1,108 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+# Construct the correct absolute path
+base_dir = os.path.dirname(__file__)  # Get the directory of the current script
+
+# Shared by every process on the machine, so results fetched by one request are there for the next
+cache_path = os.environ.get("BEACH_DAY_CACHE_PATH", os.path.join(base_dir, "cache.sqlite3"))
+
+# How long to wait for another process that is writing to the cache, in seconds
+LOCK_TIMEOUT = 5.0
+
+# Chance that a write also clears out expired values, so the file doesn't grow forever
+PURGE_CHANCE = 0.01
+
+# sqlite connections can't be shared between threads, so each thread opens its own
+connections = threading.local()
+
+
+def get_connection():
+    """
+    Get this thread's connection to the cache, opening it and creating the table on first use
+
+    :returns: the sqlite3 connection
+    """
+
+    connection = getattr(connections, "connection", None)
+    if connection is None:
+        connection = sqlite3.connect(cache_path, timeout=LOCK_TIMEOUT, isolation_level=None)
+
+        # Write-ahead logging lets readers in other processes keep going while one process writes
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        connections.connection = connection
+    return connection
+
+
+def get(namespace, key):
+    """
+    Look up a cached value. The cache is only ever an optimization, so if it can't be read this
+    behaves like a miss
+
+    :param namespace: which kind of value this is, so different callers can't collide
+    :param key: the key within the namespace
+    :returns: the cached value, or None if it is missing or expired
+    """
+
+    try:
+        row = get_connection().execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires > ?",
+            (namespace, key, time.time())
+        ).fetchone()
+    except sqlite3.Error:
+        return None
+
+    if row is None:
+        return None
+    return json.loads(row[0])
+
+
+def put(namespace, key, value, expires):
+    """
+    Store a value in the cache, replacing anything already stored under the same key. Values that have
+    already expired are not stored. Failures to write are ignored
+
+    :param namespace: which kind of value this is, so different callers can't collide
+    :param key: the key within the namespace
+    :param value: JSON-compatible value to store
+    :param expires: Unix time at which the value stops being valid
+    """
+
+    if expires <= time.time():
+        return
+
+    try:
+        get_connection().execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), expires)
+        )
+    except sqlite3.Error:
+        return
+
+    if random.random() < PURGE_CHANCE:
+        purge()
+
+
+def purge():
+    """
+    Delete every expired value from the cache
+    """
+
+    try:
+        get_connection().execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+    except sqlite3.Error:
+        pass
@@ -0,0 +1,94 @@
+import numpy as np
+
+import spatial_index
+
+
+class CentroidArrays:
+    """
+    Beach centroids as NumPy arrays, resolved once from the beach store. Rows without a centroid
+    are left out, and `rows` maps each array position back to its row in the store
+    """
+
+    def __init__(self, store):
+        """
+        :param store: the BeachStore to read centroids from
+        """
+
+        lats = np.frombuffer(store.column("centroid_lat"), dtype=np.float64)
+        lons = np.frombuffer(store.column("centroid_lon"), dtype=np.float64)
+
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        self.rows = np.flatnonzero(valid)
+        self.x = np.frombuffer(store.column("unit_x"), dtype=np.float64)[valid]
+        self.y = np.frombuffer(store.column("unit_y"), dtype=np.float64)[valid]
+        self.z = np.frombuffer(store.column("unit_z"), dtype=np.float64)[valid]
+
+
+def chord(centroids, lat, lon, positions=None):
+    """
+    Straight-line distance on the unit sphere from a point to every beach centroid at once. It ranks beaches
+    the same way as the great-circle distance, and is computed exactly the way spatial_index.nearest computes
+    it, so both give the same score to a beach and a cursor from one can be continued in the other
+
+    :param centroids: the CentroidArrays to score
+    :param lat: latitude to measure from, in degrees
+    :param lon: longitude to measure from, in degrees
+    :param positions: optional array of positions to score instead of all of them
+    :returns: array of scores, one per position
+    """
+
+    qx, qy, qz = spatial_index.unit_vector(lat, lon)
+
+    x = centroids.x
+    y = centroids.y
+    z = centroids.z
+    if positions is not None:
+        x = x[positions]
+        y = y[positions]
+        z = z[positions]
+
+    dx = x - qx
+    dy = y - qy
+    dz = z - qz
+    return np.sqrt(dx * dx + dy * dy + dz * dz)
+
+
+def nearest(centroids, lat, lon, count, after=None):
+    """
+    Rank the beaches closest to a point with a full scan. Beaches are scored with chord, and ties are broken by row
+
+    :param centroids: the CentroidArrays to score
+    :param lat: latitude to search from
+    :param lon: longitude to search from
+    :param count: how many beaches to find
+    :param after: optional (score, row) pair, from this function or spatial_index.nearest. Only beaches ranked
+        after it are returned
+    :returns: list of (score, row) pairs, closest first
+    """
+
+    total = len(centroids.rows)
+    count = min(count, total)
+    if count <= 0:
+        return []
+
+    positions = np.arange(total)
+    distances = chord(centroids, lat, lon)
+
+    if after is not None:
+        rows = centroids.rows[positions]
+        keep = ((distances > after[0]) | ((distances == after[0]) & (rows > after[1]))) & (rows != after[1])
+        positions = positions[keep]
+        distances = distances[keep]
+        count = min(count, len(positions))
+        if count == 0:
+            return []
+
+    # Partial selection first, then order just the selected ones by distance and row
+    if count < len(positions):
+        cutoff = np.partition(distances, count - 1)[count - 1]
+        keep = distances <= cutoff
+        positions = positions[keep]
+        distances = distances[keep]
+
+    order = np.lexsort((centroids.rows[positions], distances))[:count]
+    return [(float(distances[i]), int(centroids.rows[positions[i]])) for i in order]
@@ -1,50 +1,261 @@
-import requests
 import json
+import math
 import os
+import sys
+import time as clock
+from bisect import bisect_right
 from datetime import datetime
 
+import timings
+import upstream
+
 base_dir = os.path.dirname(__file__)
 
-def check_event(time, beach_id, event_name, email_address):
+# The national alert snapshot is fetched again once it is this many seconds old
+ALERT_SNAPSHOT_TTL = float(os.environ.get("BEACH_DAY_ALERT_SNAPSHOT_TTL", "300"))
+
+# For testing, send email through this SMTP server without TLS or a login instead of through Gmail
+SMTP_HOST = os.environ.get("BEACH_DAY_SMTP_HOST", "")
+SMTP_PORT = int(os.environ.get("BEACH_DAY_SMTP_PORT", "1025"))
+
+# Seconds to wait for the SMTP server to connect or answer
+SMTP_TIMEOUT = float(os.environ.get("BEACH_DAY_SMTP_TIMEOUT", "10"))
+
+def check_event(time, beach_id, event_name, email_address, shared_snapshot=False):
     """
     Check an event for relevant alerts
 
     :param time: the datetime object for the event
     :param beach_id: the beach id for the event
     :param event_name: user-specified name for the event
+    :param shared_snapshot: whether to check against the national alert snapshot, which only pays off in a
+        process that checks many events. Otherwise just the alerts for the beach's zone are fetched
     :returns: JSON-compatible object with the notifications or lack thereof
     """
     import beaches
-    import basic_forecast
 
     beach = beaches.get_beach_info_by_id(beach_id)
 
-    lat = float(beach["latitude"])
-    lon = float(beach["longitude"])
+    # Most beaches are in the zone table, so only the rest need a live lookup
+    zone_id = beaches.get_zone(beach_id)
+    if zone_id is None:
+        lat = float(beach["latitude"])
+        lon = float(beach["longitude"])
+        zone_id = get_zone_id(lat, lon)
 
-    point_info = requests.get(f"https://api.weather.gov/zones?type=land&point={lat},{lon}&limit=500").json()
-
-    try:
-        zone_id = point_info["features"][0]["properties"]["id"]
-    except IndexError:
+    if zone_id is None or zone_id == "":
         return {
             "action": "none"
         }
 
-    alerts = get_alerts(time, zone_id)
+    if shared_snapshot:
+        index = get_alert_snapshot()
+    else:
+        index = AlertIndex(get_alerts(zone_id))
 
-    messages = []
+    return notify(index.headlines(zone_id, time), event_name, email_address)
 
-    for alert in alerts:
-        start = alert["properties"]["onset"]
-        end = alert["properties"]["ends"]
 
-        start = datetime.strptime(start,"%Y-%m-%dT%H:%M:%S%z")
-        end = datetime.strptime(end,"%Y-%m-%dT%H:%M:%S%z")
+def check_events_batch(events):
+    """
+    Check many events for relevant alerts at once. Each distinct beach's zone is only found once, and every
+    event is checked against the same national alert snapshot
+
+    :param events: list of (time, beach_id, event_name, email_address) tuples, see check_event
+    :returns: list of JSON-compatible objects with the notifications or lack thereof, in the same order as events.
+        An event whose beach id doesn't exist gets an error response instead. Events at a beach whose zone
+        couldn't be looked up get no notification
+    """
+    import beaches
+
+    store = beaches.get_store()
+
+    # Find each distinct beach's zone once
+    zone_of = {}
+    for _, beach_id, _, _ in events:
+        if beach_id in zone_of:
+            continue
+
+        if store.row_of(beach_id) == -1:
+            zone_of[beach_id] = None
+            continue
+
+        # Most beaches are in the zone table, so only the rest need a live lookup
+        zone_id = beaches.get_zone(beach_id)
+        if zone_id is not None:
+            zone_of[beach_id] = zone_id if zone_id != "" else None
+            continue
+
+        beach = beaches.get_beach_info_by_id(beach_id)
+        try:
+            lat = float(beach["latitude"])
+            lon = float(beach["longitude"])
+        except ValueError:
+            # Without a location there is no zone to check
+            zone_of[beach_id] = None
+            continue
+
+        # One beach that can't be looked up shouldn't stop the rest of the batch from being checked
+        try:
+            zone_of[beach_id] = get_zone_id(lat, lon)
+        except Exception as e:
+            print(f"Could not find the zone for {beach_id}: {e}", file=sys.stderr)
+            zone_of[beach_id] = None
+
+    snapshot = get_alert_snapshot()
+
+    results = []
+    for time, beach_id, event_name, email_address in events:
+        if store.row_of(beach_id) == -1:
+            results.append({
+                "code": "ERROR",
+                "error_type": "invalid_beach_id",
+                "message": "The requested beach ID could not be found"
+            })
+            continue
+
+        zone_id = zone_of[beach_id]
+        if zone_id is None:
+            results.append({
+                "action": "none"
+            })
+            continue
+
+        results.append(notify(snapshot.headlines(zone_id, time), event_name, email_address))
+
+    # Cycles are far enough apart that the server would drop the session anyway
+    close_smtp_session()
+
+    return results
+
+
+def get_zone_id(lat, lon):
+    """
+    Find the land zone a point is in
+
+    :param lat: latitude of the point
+    :param lon: longitude of the point
+    :returns: the zone id, or None if the point isn't in a zone or the response doesn't name one
+    """
+
+    point_info = upstream.get(upstream.nws_url(f"/zones?type=land&point={lat},{lon}&limit=500")).json()
+
+    try:
+        return point_info["features"][0]["properties"]["id"]
+    except (IndexError, KeyError, TypeError):
+        return None
+
+
+def parse_alert_time(value, missing):
+    """
+    Parse an alert timestamp
+
+    :param value: the timestamp from the alert, which may be null
+    :param missing: what to use if it is null
+    :returns: the timestamp as Unix time
+    """
+
+    if value is None:
+        return missing
+    return datetime.strptime(value,"%Y-%m-%dT%H:%M:%S%z").timestamp()
+
+
+class AlertIndex:
+    """
+    Active alerts indexed by the zones they affect. Each zone's alerts are sorted by onset, so finding the
+    alerts in effect at a time only looks at the ones that have already started
+    """
+
+    def __init__(self, alerts):
+        """
+        :param alerts: features response for the active alerts
+        """
+
+        # zone id -> list of (onset, position in the feed, end, headline)
+        self.zones = {}
+        for position, alert in enumerate(alerts):
+            properties = alert["properties"]
+
+            # Alerts without an onset are in effect from when they were issued, and alerts
+            # without an end are in effect until further notice
+            onset = parse_alert_time(properties.get("onset") or properties.get("effective"), -math.inf)
+            end = parse_alert_time(properties.get("ends"), math.inf)
+            entry = (onset, position, end, properties.get("headline") or properties.get("event", ""))
+
+            for zone_id in alert_zones(properties):
+                self.zones.setdefault(zone_id, []).append(entry)
+
+        self.onsets = {}
+        for zone_id, entries in self.zones.items():
+            entries.sort()
+            self.onsets[zone_id] = [entry[0] for entry in entries]
+
+    def headlines(self, zone_id, time):
+        """
+        Find the alerts in effect in a zone at a given time
+
+        :param zone_id: the zone to check
+        :param time: the datetime object to check
+        :returns: list of headlines for the alerts in effect, in the order the feed lists them
+        """
+
+        entries = self.zones.get(zone_id)
+        if entries is None:
+            return []
+
+        time = time.timestamp()
+        started = entries[:bisect_right(self.onsets[zone_id], time)]
+        return [headline for _, _, headline in sorted((position, end, headline) for _, position, end, headline in started if time <= end)]
+
+
+def alert_zones(properties):
+    """
+    Find the zones an alert affects
+
+    :param properties: the alert's properties
+    :returns: set of zone ids
+    """
+
+    zones = set(properties.get("geocode", {}).get("UGC", []))
+
+    # Zone links end in the zone id
+    for link in properties.get("affectedZones", []):
+        zones.add(link.rstrip("/").split("/")[-1])
+
+    return zones
+
+
+# The latest national alert snapshot, shared by every event check this process handles
+alert_snapshot = {"fetched": None, "index": None}
+
+
+def get_alert_snapshot():
+    """
+    Get an index of every active alert in the country. The feed is fetched once and reused for
+    ALERT_SNAPSHOT_TTL seconds, so a whole check cycle makes one request however many events it checks
+
+    :returns: the AlertIndex for the snapshot
+    """
+
+    now = clock.monotonic()
+    if alert_snapshot["fetched"] is None or now - alert_snapshot["fetched"] > ALERT_SNAPSHOT_TTL:
+        with timings.span("alert snapshot"):
+            alert_snapshot["index"] = AlertIndex(get_alerts())
+        alert_snapshot["fetched"] = now
+
+    return alert_snapshot["index"]
+
+
+def notify(messages, event_name, email_address):
+    """
+    Build the notification for an event, and email it to the user if they have an address
+
+    :param messages: headlines of the alerts affecting the event
+    :param event_name: user-specified name for the event
+    :param email_address: the user's email address, which may be empty
+    :returns: JSON-compatible object with the notifications or lack thereof
+    """
 
-        if start <= time and time <= end:
-            messages.append(alert["properties"]["headline"])
-    
     if len(messages) == 0:
         return {
             "action": "none"
@@ -55,13 +266,8 @@ def check_event(time, beach_id, event_name, email_address):
             title = f"Your event '{event_name}' may be impacted by one or more National Weather Service alerts or advisories. Contact local authorities for accurate and up-to-date information. Advisories follow:\n"
             subject = f"Event '{event_name}' impacted by NWS Alert"
 
-            body = ""
-            with open(os.path.join(base_dir, "email_template.html"), 'r') as f:
-                body = f.read()
-            
-            alert_template = ""
-            with open(os.path.join(base_dir, "email_alert_template.html"), 'r') as f:
-                alert_template = f.read()
+            body = get_template("email_template.html")
+            alert_template = get_template("email_alert_template.html")
             
             body = body.replace("%~^title^~%", title)
 
@@ -70,7 +276,12 @@ def check_event(time, beach_id, event_name, email_address):
                 message_alerts += alert_template.replace("%~^info^~%", m.strip())
             
             body = body.replace("%~^alerts^~%", message_alerts)
-            send_email(email_address, subject, body)
+
+            # The in-app notification still goes out if the email can't be sent
+            try:
+                send_email(email_address, subject, body)
+            except Exception as e:
+                print(f"Could not email {email_address}: {e}", file=sys.stderr)
 
 
         title = f"Event '{event_name}' impacted by NWS Alert"
@@ -84,48 +295,136 @@ def check_event(time, beach_id, event_name, email_address):
             "message": message
         }
 
-    return {
-        "action": "none"
-    }
-
 
-def get_alerts(time, zone_id):
+def get_alerts(zone_id=None):
     """
-    Check alerts in a zone at a given time
+    Fetch the active alerts in a zone, or in the whole country
 
-    :param time: datetime object with the time to check
-    :param zone_id: the zone id of the beach that the event occurs at
-    :returns: features response for the alerts in the beach's zone at the given time
+    :param zone_id: the zone to fetch alerts for, or None for every zone
+    :returns: features response for the active alerts
     """
-    alerts = requests.get(f"https://api.weather.gov/alerts/active?status=actual&message_type=alert,update,cancel&zone={zone_id}&urgency=Immediate,Expected,Future&severity=Extreme,Severe,Moderate,Minor&certainty=Observed,Likely,Possible,Unlikely&limit=500")
+    path = "/alerts/active?status=actual&message_type=alert,update,cancel&urgency=Immediate,Expected,Future&severity=Extreme,Severe,Moderate,Minor&certainty=Observed,Likely,Possible,Unlikely"
+    if zone_id is not None:
+        path += f"&zone={zone_id}&limit=500"
+
+    alerts = upstream.get(upstream.nws_url(path))
     
     alerts = alerts.json()["features"]
 
     return alerts
 
+# Email templates, read from disk on first use
+templates = {}
+
+
+def get_template(name):
+    """
+    Get an email template, reading it on first use
+
+    :param name: file name of the template, in this folder
+    :returns: the template text
+    """
+
+    if not name in templates:
+        with open(os.path.join(base_dir, name), 'r') as f:
+            templates[name] = f.read()
+    return templates[name]
+
+
+# The sender address and app password, read from the backend .env on first use
+email_credentials = None
+
+
+def get_email_credentials():
+    """
+    Get the address and app password to send email with
+
+    :returns: (from address, app password), either of which is empty if it isn't set
+    """
+
+    global email_credentials
+    if email_credentials is None:
+        from_address = ""
+        app_pass = ""
+        env_path = os.path.join(base_dir, "..", ".env")
+        if os.path.exists(env_path):
+            with open(env_path, 'r') as f:
+                for line in f.readlines():
+                    parts = line.split("=")
+                    if len(parts) == 2:
+                        if parts[0].strip() == "BEACH_DAY_EMAIL":
+                            from_address = parts[1].strip()
+                        if parts[0].strip() == "BEACH_DAY_APP_PASS":
+                            app_pass = parts[1].strip()
+        email_credentials = (from_address, app_pass)
+    return email_credentials
+
+
+# Logged in SMTP session, kept open so many messages can be sent with one login
+smtp_session = None
+
+
+def get_smtp_session():
+    """
+    Get the SMTP session, connecting and logging in if there isn't one open. The session is only kept once
+    the login has succeeded
+
+    :returns: the smtplib session
+    :raises smtplib.SMTPException: if the login fails
+    """
+
+    global smtp_session
+    if smtp_session is None:
+        import smtplib
+
+        if SMTP_HOST != "":
+            session = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        else:
+            from_address, app_pass = get_email_credentials()
+            session = smtplib.SMTP_SSL('smtp.gmail.com', 465, timeout=SMTP_TIMEOUT)
+            try:
+                session.login(from_address, app_pass)
+            except Exception:
+                session.close()
+                raise
+        smtp_session = session
+    return smtp_session
+
+
+def close_smtp_session():
+    """
+    Close the SMTP session if one is open. Errors closing it are ignored, since it is being thrown away
+    """
+
+    global smtp_session
+    if smtp_session is not None:
+        try:
+            smtp_session.quit()
+        except Exception:
+            pass
+        smtp_session = None
+
+
 def send_email(address, subject, body):
     """
-    Send an email from the beach day noreply address
+    Send an email from the beach day noreply address. The SMTP session is reused between messages, and if
+    sending on it fails, it is thrown away, a new one is opened and the message is sent once more. A rejected
+    login isn't tried again, since the credentials won't have changed
 
     :param address: the address to send to
     :param subject: subject line for the message
     :param body: HTML body for the message
+    :raises smtplib.SMTPAuthenticationError: if the login is rejected
     """
 
-    from_address = ""
-    app_pass = ""
-    with open(os.path.join(base_dir, "..", ".env"), 'r') as f:
-        for line in f.readlines():
-            parts = line.split("=")
-            if len(parts) == 2:
-                if parts[0].strip() == "BEACH_DAY_EMAIL":
-                    from_address = parts[1].strip()
-                if parts[0].strip() == "BEACH_DAY_APP_PASS":
-                    app_pass = parts[1].strip()
-    
-    if from_address == "" or app_pass == "":
+    from_address, app_pass = get_email_credentials()
+
+    if SMTP_HOST == "" and (from_address == "" or app_pass == ""):
         return
 
+    if from_address == "":
+        from_address = "noreply@localhost"
+
     import smtplib
     from email.mime.text import MIMEText
 
@@ -134,6 +433,10 @@ def send_email(address, subject, body):
     email['From'] = from_address
     email['To'] = address
 
-    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-        server.login(from_address, app_pass)
-        server.sendmail(from_address, address, email.as_string())
+    try:
+        get_smtp_session().sendmail(from_address, address, email.as_string())
+    except smtplib.SMTPAuthenticationError:
+        raise
+    except (smtplib.SMTPException, ConnectionError):
+        close_smtp_session()
+        get_smtp_session().sendmail(from_address, address, email.as_string())
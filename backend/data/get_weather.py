@@ -1,6 +1,8 @@
 # Documentation in beach-day/docs/data_interface.md
 
-
+# Startup is timed from here, see docs/data_interface.md
+import time
+started = time.perf_counter()
 
 # Get current date and time
 from datetime import datetime
@@ -9,372 +11,621 @@ import datetime as dt
 # Handle json data
 import json
 
-# Entry point
-# Get the parameters as JSON from standard input
-# Then handle each request type
-input_params = json.loads(input())
-try:
-    request_type = input_params["request_type"]
-except KeyError:
-    result = {
-        "code": "ERROR",
-        "error_type": "missing_request_type",
-        "message": "All requests must supply the 'request_type' key"
-    }
-    print(json.dumps(result, indent=4))
-    exit()
-
-# Check for each request type
-# Collect inputs for that request type
-# Redirect the response to one of the other data components
-# These requests are documented in docs/data_interface.md
-try:
-    # Generic weather info, not meant for building a map
-    if request_type == "current_basic_weather":
-        import basic_weather
-
-        now = datetime.now()
+# Worker mode support
+import contextlib
+import io
+import os
+import sys
 
-        result = {}
+# Opt-in timing breakdown
+import timings
+
+# Set by worker mode, where one process handles many requests and can share state between them
+worker_mode = False
+
+
+def handle_request(input_params, emit=None):
+    """
+    Fulfill a single request. The request types are documented in docs/data_interface.md
+
+    :param input_params: the decoded JSON request
+    :param emit: optional function that writes one streamed result. Search and batch requests that set "stream"
+        pass each result to it as soon as it is ready, and respond with just the trailer
+    :returns: JSON-compatible map with the response for the request
+    """
+
+    try:
+        request_type = input_params["request_type"]
+    except KeyError:
+        result = {
+            "code": "ERROR",
+            "error_type": "missing_request_type",
+            "message": "All requests must supply the 'request_type' key"
+        }
+        return result
+
+    # Streaming is opt-in per request
+    if not input_params.get("stream"):
+        emit = None
+
+    # Check for each request type
+    # Collect inputs for that request type
+    # Redirect the response to one of the other data components
+    # These requests are documented in docs/data_interface.md
+    try:
+        # Generic weather info, not meant for building a map
+        if request_type == "current_basic_weather":
+            import basic_weather
+
+            now = datetime.now()
+
+            result = {}
+
+            if "zip_code" in input_params:
+                zip_code = str(input_params["zip_code"])
+                country = input_params.get("country_code", "US")
+                result = basic_weather.get_basic_weather_zip(zip_code, country)
+            elif "latitude" in input_params and "longitude" in input_params:
+                lat = float(input_params["latitude"])
+                lon = float(input_params["longitude"])
+                result = basic_weather.get_basic_weather_latlon(lat, lon)
+            else:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: missing both (zip_code) and (latitude, longitude)",
+                    "message": f"Malformed request for request type '{request_type}' (must specify either zip_code or latitude and longitude)"
+                }
+                return result
+
+            result["code"] = "current_basic_weather"
+
+            return result
+
+        # Beach info by id
+        elif request_type == "get_beach_info_by_id":
+            import beaches
+
+            beach_id = input_params["beach_id"]
+
+            beach_info = beaches.get_beach_info_by_id(beach_id)
+
+            result = beach_info
+            result["code"] = "get_beach_info_by_id"
+
+            return result
+
+        # Beach info with weather included
+        elif request_type == "get_beach_info_weather_by_id":
+            import beaches
+            import basic_weather
+
+            beach_id = input_params["beach_id"]
+
+            beach_info = beaches.get_beach_info_by_id(beach_id)
+
+            lat = beach_info["latitude"]
+            lon = beach_info["longitude"]
+            beach_weather = basic_weather.get_basic_weather_latlon(lat, lon, beaches.get_uv_city(beach_id), beaches.get_gridpoint(beach_id))
+
+            result = beach_info
+            result["weather"] = beach_weather
+            result["code"] = "get_beach_info_weather_by_id"
+
+            return result
+
+
+        # Beach info with weather included (batch mode)
+        elif request_type == "get_beach_info_weather_by_id_batch":
+            import beach_search
+
+            beaches_input = map(lambda x: x.strip(), input_params["beach_ids"].split(","))
+
+            # Repeated ids share one entry in the response
+            order = list(dict.fromkeys(beaches_input))
+
+            timings.lap("validate")
+
+            # Fetch weather for every beach at once
+            beaches_info = beach_search.page_with_weather(order, emit)
+
+            if beaches_info is None:
+                result = {
+                    "order": order
+                }
+            else:
+                result = beaches_info
+            result["code"] = "get_beach_info_weather_by_id_batch"
+
+            return result
+
+        # Beach search by county and state
+        elif request_type == "search_beach_by_county_state":
+            import beach_search
+
+            county = input_params["county"]
+            state = input_params["state"]
+
+            try:
+                start = int(str(input_params["start"]))
+            except ValueError:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: start must be a valid integer",
+                    "message": f"Malformed request for request type '{request_type}'"
+                }
+                return result
+
+            try:
+                stop = int(str(input_params["stop"]))
+            except ValueError:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: stop must be a valid integer",
+                    "message": f"Malformed request for request type '{request_type}'"
+                }
+                return result
+
+            timings.lap("validate")
+            result = beach_search.search_beach_by_county_state(county, state, start, stop, input_params.get("cursor"), emit)
+            result["code"] = "search_beach_by_county_state"
+
+            return result
+
+        # Beach search by latitude and longitude
+        elif request_type == "search_beach_by_lat_lon":
+            import beach_search
+
+            try:
+                latitude = float(str(input_params["latitude"]))
+            except ValueError:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: latitude must be a valid float",
+                    "message": f"Malformed request for request type '{request_type}'"
+                }
+                return result
+
+            try:
+                longitude = float(str(input_params["longitude"]))
+            except ValueError:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: longitude must be a valid float",
+                    "message": f"Malformed request for request type '{request_type}'"
+                }
+                return result
+
+            try:
+                start = int(str(input_params["start"]))
+            except ValueError:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: start must be a valid integer",
+                    "message": f"Malformed request for request type '{request_type}'"
+                }
+                return result
+
+            try:
+                stop = int(str(input_params["stop"]))
+            except ValueError:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: stop must be a valid integer",
+                    "message": f"Malformed request for request type '{request_type}'"
+                }
+                return result
+
+            timings.lap("validate")
+            result = beach_search.search_beach_by_lat_lon(latitude, longitude, start, stop, input_params.get("cursor"), emit)
+            result["code"] = "search_beach_by_lat_lon"
+
+            return result
+
+        # Beach search by county and state without weather info
+        elif request_type == "search_beach_by_county_state_no_weather":
+            import beach_search
+
+            county = input_params["county"]
+            state = input_params["state"]
+
+            try:
+                start = int(str(input_params["start"]))
+            except ValueError:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: start must be a valid integer",
+                    "message": f"Malformed request for request type '{request_type}'"
+                }
+                return result
+
+            try:
+                stop = int(str(input_params["stop"]))
+            except ValueError:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: stop must be a valid integer",
+                    "message": f"Malformed request for request type '{request_type}'"
+                }
+                return result
+
+            timings.lap("validate")
+            result = beach_search.search_beach_by_county_state_no_weather(county, state, start, stop, input_params.get("cursor"), emit)
+            result["code"] = "search_beach_by_county_state"
+
+            return result
+
+        # Beach search by latitude and longitude without weather info
+        elif request_type == "search_beach_by_lat_lon_no_weather":
+            import beach_search
+
+            try:
+                latitude = float(str(input_params["latitude"]))
+            except ValueError:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: latitude must be a valid float",
+                    "message": f"Malformed request for request type '{request_type}'"
+                }
+                return result
+
+            try:
+                longitude = float(str(input_params["longitude"]))
+            except ValueError:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: longitude must be a valid float",
+                    "message": f"Malformed request for request type '{request_type}'"
+                }
+                return result
+
+            try:
+                start = int(str(input_params["start"]))
+            except ValueError:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: start must be a valid integer",
+                    "message": f"Malformed request for request type '{request_type}'"
+                }
+                return result
+
+            try:
+                stop = int(str(input_params["stop"]))
+            except ValueError:
+                result = {
+                    "code": "ERROR",
+                    "error_type": "malformed_request: stop must be a valid integer",
+                    "message": f"Malformed request for request type '{request_type}'"
+                }
+                return result
+
+            timings.lap("validate")
+            result = beach_search.search_beach_by_lat_lon_no_weather(latitude, longitude, start, stop, input_params.get("cursor"), emit)
+            result["code"] = "search_beach_by_lat_lon"
+
+            return result
+
+
+        # Check an event for relevant warnings and alerts
+        elif request_type == "check_event":
+            import events
+            import beaches
+            time = datetime.fromtimestamp(int(input_params["time"]), tz=dt.timezone.utc)
+            beach_id = input_params["beach_id"]
+            event_name = input_params["event_name"]
+            email_address = input_params.get("email_address", "")
+
+            # A single-shot process only checks one event, so only a worker gains from the national snapshot
+            result = events.check_event(time, beach_id, event_name, email_address, shared_snapshot=worker_mode)
+
+            result["code"] = "check_event"
+
+            return result
+
+
+        # Check many events at once, fetching each zone's alerts only once
+        elif request_type == "check_events_batch":
+            import events
+
+            events_input = []
+            for event in input_params["events"]:
+                time = datetime.fromtimestamp(int(event["time"]), tz=dt.timezone.utc)
+                events_input.append((time, event["beach_id"], event["event_name"], event.get("email_address", "")))
+
+            timings.lap("validate")
 
-        if "zip_code" in input_params:
-            zip_code = str(input_params["zip_code"])
-            country = input_params.get("country_code", "US")
-            result = basic_weather.get_basic_weather_zip(zip_code, country)
-        elif "latitude" in input_params and "longitude" in input_params:
-            lat = float(input_params["latitude"])
-            lon = float(input_params["longitude"])
-            result = basic_weather.get_basic_weather_latlon(lat, lon)
-        else:
             result = {
-                "code": "ERROR",
-                "error_type": "malformed_request: missing both (zip_code) and (latitude, longitude)",
-                "message": f"Malformed request for request type '{request_type}' (must specify either zip_code or latitude and longitude)"
+                "results": events.check_events_batch(events_input),
+                "code": "check_events_batch"
             }
-            print(json.dumps(result, indent=4))
-            exit()
 
-        result["code"] = "current_basic_weather"
+            return result
+
 
-        print(json.dumps(result, indent=4))
-        exit()
+        # Hit and miss counts for the search cache in this process
+        elif request_type == "search_cache_stats":
+            import beach_search
 
-    # Beach info by id
-    elif request_type == "get_beach_info_by_id":
-        import beaches
-        import basic_weather
+            result = beach_search.search_cache_stats()
+            result["code"] = "search_cache_stats"
 
-        beach_id = input_params["beach_id"]
+            return result
 
-        beach_info = beaches.get_beach_info_by_id(beach_id)
 
-        result = beach_info
-        result["code"] = "get_beach_info_by_id"
+        # Dummy request types from testing. Will still work, but should be avoided
+        # Dummy beach info (should roughly mimic the real beach info access)
+        elif request_type == "dummy_get_beach_info_by_id":
+            import beaches
 
-        print(json.dumps(result, indent=4))
-        exit()
+            beach_id = input_params["beach_id"]
 
-    # Beach info with weather included
-    elif request_type == "get_beach_info_weather_by_id":
-        import beaches
-        import basic_weather
+            beach_info = beaches.get_dummy_beach_info_by_id(beach_id)
 
-        beach_id = input_params["beach_id"]
-       
-        beach_info = beaches.get_beach_info_by_id(beach_id)
-        
-        lat = beach_info["latitude"]
-        lon = beach_info["longitude"]
-        beach_weather = basic_weather.get_basic_weather_latlon(lat, lon)
+            result = beach_info
+            result["code"] = "dummy_get_beach_info_by_id"
 
-        result = beach_info
-        result["weather"] = beach_weather
-        result["code"] = "get_beach_info_weather_by_id"
-        
-        print(json.dumps(result, indent=4))
-        exit()
-    
-    
-    # Beach info with weather included (batch mode)
-    elif request_type == "get_beach_info_weather_by_id_batch":
-        import beaches
-        import basic_weather
+            return result
 
-        beaches_input = map(lambda x: x.strip(), input_params["beach_ids"].split(","))
+        # Dummy beach info (should roughly mimic the real beach info access) with weather included
+        elif request_type == "dummy_get_beach_info_weather_by_id":
+            import beaches
+            import basic_weather
 
-        beaches_info = {}
+            beach_id = input_params["beach_id"]
 
-        for key in beaches_input:
-            beach_info = beaches.get_beach_info_by_id(key)
+            beach_info = beaches.get_dummy_beach_info_by_id(beach_id)
 
             lat = beach_info["latitude"]
             lon = beach_info["longitude"]
             beach_weather = basic_weather.get_basic_weather_latlon(lat, lon)
 
-            beach_info["weather"] = beach_weather
+            result = beach_info
+            result["weather"] = beach_weather
+            result["code"] = "dummy_get_beach_info_weather_by_id"
 
-            beaches_info[key] = beach_info
-        
-        result = beaches_info
-        result["code"] = "get_beach_info_weather_by_id_batch"
+            return result
 
-        print(json.dumps(result, indent=4))
-        exit()
-    
-    # Beach search by county and state
-    elif request_type == "search_beach_by_county_state":
-        import beach_search
+        elif request_type == "test":
+            import basic_weather
 
-        county = input_params["county"]
-        state = input_params["state"]
+            lat = float(input_params["latitude"])
+            lon = float(input_params["longitude"])
 
-        try:
-            start = int(str(input_params["start"]))
-        except ValueError:
-            result = {
-                "code": "ERROR",
-                "error_type": "malformed_request: start must be a valid integer",
-                "message": f"Malformed request for request type '{request_type}'"
-            }
-            print(json.dumps(result, indent=4))
-            exit()
-        
-        try:
-            stop = int(str(input_params["stop"]))
-        except ValueError:
+            basic_weather.get_uv_index(lat, lon)
+
+        else:
             result = {
                 "code": "ERROR",
-                "error_type": "malformed_request: stop must be a valid integer",
-                "message": f"Malformed request for request type '{request_type}'"
+                "error_type": "request_type_invalid",
+                "message": f"Request type '{request_type}' is not recognized"
             }
-            print(json.dumps(result, indent=4))
-            exit()
+            return result
 
-        result = beach_search.search_beach_by_county_state(county, state, start, stop)
-        result["code"] = "search_beach_by_county_state"
 
-        print(json.dumps(result, indent=4))
-        exit()
+    except KeyError as e:
+        result = {
+            "code": "ERROR",
+            "error_type": "malformed_request",
+            "message": f"Malformed request for request type '{request_type}' (missing key '{e.args[0]}')"
+        }
+        return result
+
+
+def last_printed_response(output):
+    """
+    Recover the response that a data component printed right before calling exit(). Several components
+    report errors this way, so worker mode captures their output and looks for the last JSON object in it
+
+    :param output: everything printed while handling the request
+    :returns: the last printed JSON object, or None if nothing could be decoded
+    """
+
+    position = len(output)
+    while position > 0:
+        position = output.rfind("{", 0, position)
+        if position == -1:
+            break
+
+        if position == 0 or output[position - 1] == "\n":
+            try:
+                return json.loads(output[position:])
+            except ValueError:
+                pass
+
+    return None
+
+
+def handle_request_captured(input_params, emit=None):
+    """
+    Fulfill a single request, keeping anything the data components print along the way out of standard output.
+    Errors that are reported by printing them and calling exit() become the response
+
+    :param input_params: the decoded JSON request
+    :param emit: optional function that writes one streamed result, see handle_request
+    :returns: JSON-compatible map with the response for the request
+    """
+
+    captured = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(captured):
+            result = handle_request(input_params, emit)
+    except SystemExit:
+        result = last_printed_response(captured.getvalue())
+    except Exception as e:
+        result = {
+            "code": "ERROR",
+            "error_type": "DATABASE_unhandled_exception",
+            "message": f"Unhandled {type(e).__name__} while handling request type '{input_params.get('request_type', '')}': {e}"
+        }
 
-    # Beach search by latitude and longitude
-    elif request_type == "search_beach_by_lat_lon":
-        import beach_search
+    if result is None:
+        result = {}
+    return result
 
-        try:
-            latitude = float(str(input_params["latitude"]))
-        except ValueError:
-            result = {
-                "code": "ERROR",
-                "error_type": "malformed_request: latitude must be a valid float",
-                "message": f"Malformed request for request type '{request_type}'"
-            }
-            print(json.dumps(result, indent=4))
-            exit()
-        
-        try:
-            longitude = float(str(input_params["longitude"]))
-        except ValueError:
-            result = {
-                "code": "ERROR",
-                "error_type": "malformed_request: longitude must be a valid float",
-                "message": f"Malformed request for request type '{request_type}'"
-            }
-            print(json.dumps(result, indent=4))
-            exit()
-        
-        try:
-            start = int(str(input_params["start"]))
-        except ValueError:
-            result = {
-                "code": "ERROR",
-                "error_type": "malformed_request: start must be a valid integer",
-                "message": f"Malformed request for request type '{request_type}'"
-            }
-            print(json.dumps(result, indent=4))
-            exit()
-        
-        try:
-            stop = int(str(input_params["stop"]))
-        except ValueError:
-            result = {
-                "code": "ERROR",
-                "error_type": "malformed_request: stop must be a valid integer",
-                "message": f"Malformed request for request type '{request_type}'"
-            }
-            print(json.dumps(result, indent=4))
-            exit()
-        
-        result = beach_search.search_beach_by_lat_lon(latitude, longitude, start, stop)
-        result["code"] = "search_beach_by_lat_lon"
-
-        print(json.dumps(result, indent=4))
-        exit()
-    
-    # Beach search by county and state without weather info
-    elif request_type == "search_beach_by_county_state_no_weather":
-        import beach_search
-
-        county = input_params["county"]
-        state = input_params["state"]
 
-        try:
-            start = int(str(input_params["start"]))
-        except ValueError:
-            result = {
-                "code": "ERROR",
-                "error_type": "malformed_request: start must be a valid integer",
-                "message": f"Malformed request for request type '{request_type}'"
-            }
-            print(json.dumps(result, indent=4))
-            exit()
-        
-        try:
-            stop = int(str(input_params["stop"]))
-        except ValueError:
-            result = {
-                "code": "ERROR",
-                "error_type": "malformed_request: stop must be a valid integer",
-                "message": f"Malformed request for request type '{request_type}'"
-            }
-            print(json.dumps(result, indent=4))
-            exit()
+def respond(handle, input_params, emit, encode, startup=None):
+    """
+    Fulfill a single request and encode the response. If the request sets "timings", or BEACH_DAY_TIMINGS_LOG
+    is set, the request is timed. Requested timings are added to the response, and logged timings are written
+    to standard error as one line of JSON
 
-        result = beach_search.search_beach_by_county_state_no_weather(county, state, start, stop)
-        result["code"] = "search_beach_by_county_state"
+    :param handle: handle_request or handle_request_captured
+    :param input_params: the decoded JSON request
+    :param emit: optional function that writes one streamed result, see handle_request
+    :param encode: function that encodes a response to bytes
+    :param startup: optional seconds the process took to start, to include in the timings
+    :returns: the encoded response, or None if there isn't one
+    """
 
-        print(json.dumps(result, indent=4))
-        exit()
+    wanted = bool(input_params.get("timings"))
+    if not wanted and not timings.LOG_TIMINGS:
+        result = handle(input_params, emit)
+        return None if result is None else encode(result)
 
-    # Beach search by latitude and longitude without weather info
-    elif request_type == "search_beach_by_lat_lon_no_weather":
-        import beach_search
+    timings.start()
+    try:
+        with timings.span(f"handle {input_params.get('request_type', '')}"):
+            result = handle(input_params, emit)
+        with timings.span("serialize"):
+            encoded = None if result is None else encode(result)
+    finally:
+        report = timings.finish()
+
+    if startup is not None:
+        report["startup_ms"] = round(startup * 1000, 3)
+
+    if timings.LOG_TIMINGS:
+        print(json.dumps({"request_type": input_params.get("request_type", ""), **report}), file=sys.stderr, flush=True)
+
+    # The serialize span times the response without the timings, which are then added to it
+    if wanted and result is not None:
+        result["timings"] = report
+        encoded = encode(result)
+
+    return encoded
+
+
+def run_worker():
+    """
+    Long-lived mode. Read one JSON request per line from standard input and write one JSON response per line
+    to standard output, in the same order. If a request has an "id" key, it is copied into its response so the
+    caller can match them up. Anything the data components print along the way is kept out of the response stream.
+    Streamed requests write one line per result before their response, and those lines have no "code" key.
+    Responses are always compact JSON, since the caller splits them on newlines
+    """
+
+    import response_encoding
+
+    global worker_mode
+    worker_mode = True
+
+    requests_in = sys.stdin
+    responses_out = sys.stdout.buffer
+
+    # exit() closes standard input before raising SystemExit, so keep the real one away from it
+    sys.stdin = open(os.devnull, "r")
+
+    for line in requests_in:
+        line = line.strip()
+        if line == "":
+            continue
 
         try:
-            latitude = float(str(input_params["latitude"]))
-        except ValueError:
-            result = {
-                "code": "ERROR",
-                "error_type": "malformed_request: latitude must be a valid float",
-                "message": f"Malformed request for request type '{request_type}'"
-            }
-            print(json.dumps(result, indent=4))
-            exit()
-        
-        try:
-            longitude = float(str(input_params["longitude"]))
-        except ValueError:
-            result = {
-                "code": "ERROR",
-                "error_type": "malformed_request: longitude must be a valid float",
-                "message": f"Malformed request for request type '{request_type}'"
-            }
-            print(json.dumps(result, indent=4))
-            exit()
-        
-        try:
-            start = int(str(input_params["start"]))
+            input_params = json.loads(line)
         except ValueError:
+            input_params = None
+
+        if not isinstance(input_params, dict):
             result = {
                 "code": "ERROR",
-                "error_type": "malformed_request: start must be a valid integer",
-                "message": f"Malformed request for request type '{request_type}'"
+                "error_type": "malformed_request: invalid JSON",
+                "message": "Each line sent to the worker must be a single JSON object"
             }
-            print(json.dumps(result, indent=4))
-            exit()
-        
-        try:
-            stop = int(str(input_params["stop"]))
-        except ValueError:
+            responses_out.write(response_encoding.encode(result, "compact"))
+            responses_out.flush()
+            continue
+
+        def emit(streamed, input_params=input_params):
+            if "id" in input_params:
+                streamed["id"] = input_params["id"]
+            responses_out.write(response_encoding.encode(streamed, "compact"))
+            responses_out.flush()
+
+        encoding = input_params.get("encoding", "compact")
+        if encoding == "msgpack":
             result = {
                 "code": "ERROR",
-                "error_type": "malformed_request: stop must be a valid integer",
-                "message": f"Malformed request for request type '{request_type}'"
+                "error_type": "malformed_request: unknown encoding",
+                "message": "Worker mode writes one line of JSON per response, so it can't use the msgpack encoding"
             }
-            print(json.dumps(result, indent=4))
-            exit()
-        
-        result = beach_search.search_beach_by_lat_lon_no_weather(latitude, longitude, start, stop)
-        result["code"] = "search_beach_by_lat_lon"
-
-        print(json.dumps(result, indent=4))
-        exit()
-
-
-    # Check an event for relevant warnings and alerts
-    elif request_type == "check_event":
-        import events
-        import beaches
-        time = datetime.fromtimestamp(int(input_params["time"]), tz=dt.timezone.utc)
-        beach_id = input_params["beach_id"]
-        event_name = input_params["event_name"]
-        email_address = input_params.get("email_address", "")
+        else:
+            result = response_encoding.check_encoding(encoding)
 
-        result = events.check_event(time, beach_id, event_name, email_address)
+        def encode(result, input_params=input_params):
+            if "id" in input_params:
+                result["id"] = input_params["id"]
+            return response_encoding.encode(result, "compact")
 
-        result["code"] = "check_event"
+        if result is None:
+            encoded = respond(handle_request_captured, input_params, emit, encode)
+        else:
+            encoded = encode(result)
 
-        print(json.dumps(result, indent=4))
-    
+        responses_out.write(encoded)
+        responses_out.flush()
 
-    # Dummy request types from testing. Will still work, but should be avoided
-    # Dummy beach info (should roughly mimic the real beach info access)
-    elif request_type == "dummy_get_beach_info_by_id":
-        import beaches
-        import basic_weather
 
-        beach_id = input_params["beach_id"]
+# Entry point
+if __name__ == "__main__":
+    if "--worker" in sys.argv[1:]:
+        run_worker()
+    elif "--profile-startup" in sys.argv[1:]:
+        import startup_profile
+
+        # Profile a run of the request given on standard input
+        arguments = sys.argv[1:]
+        min_ms = startup_profile.MIN_MS
+        if "--min-ms" in arguments:
+            min_ms = float(arguments[arguments.index("--min-ms") + 1])
+        print("\n".join(startup_profile.profile_startup(input(), min_ms)))
+    else:
+        import response_encoding
 
-        beach_info = beaches.get_dummy_beach_info_by_id(beach_id)
+        # Get the parameters as JSON from standard input
+        # Then handle the request and print the response
+        input_params = json.loads(input())
 
-        result = beach_info
-        result["code"] = "dummy_get_beach_info_by_id"
+        # The encoding can be set for the process, and each request can override it
+        encoding = input_params.get("encoding", response_encoding.DEFAULT_ENCODING)
+        result = response_encoding.check_encoding(encoding)
+        if result is not None:
+            encoding = "pretty"
 
-        print(json.dumps(result, indent=4))
-        exit()
+        # Streamed results go out as they are ready, followed by the response. Pretty JSON can't be split
+        # into lines, so streams use compact JSON instead
+        if encoding == "pretty" and input_params.get("stream"):
+            encoding = "compact"
 
-    # Dummy beach info (should roughly mimic the real beach info access) with weather included
-    elif request_type == "dummy_get_beach_info_weather_by_id":
-        import beaches
-        import basic_weather
+        # Keep hold of the real standard output, since it is redirected while the request is handled
+        responses_out = sys.stdout.buffer
 
-        beach_id = input_params["beach_id"]
-       
-        beach_info = beaches.get_dummy_beach_info_by_id(beach_id)
-        
-        lat = beach_info["latitude"]
-        lon = beach_info["longitude"]
-        beach_weather = basic_weather.get_basic_weather_latlon(lat, lon)
+        def emit(streamed):
+            responses_out.write(response_encoding.encode(streamed, encoding))
+            responses_out.flush()
 
-        result = beach_info
-        result["weather"] = beach_weather
-        result["code"] = "dummy_get_beach_info_weather_by_id"
-        
-        print(json.dumps(result, indent=4))
-        exit()
-    
-    elif request_type == "test":
-        import basic_weather
+        def encode(result):
+            return response_encoding.encode(result, encoding)
 
-        lat = float(input_params["latitude"])
-        lon = float(input_params["longitude"])
+        startup = time.perf_counter() - started
 
-        basic_weather.get_uv_index(lat, lon)
+        if result is not None:
+            encoded = encode(result)
+        elif encoding == "pretty":
+            encoded = respond(handle_request, input_params, emit, encode, startup)
+        else:
+            # Errors are printed as pretty JSON, so catch them and encode them like any other response
+            encoded = respond(handle_request_captured, input_params, emit, encode, startup)
 
-    else:
-        result = {
-            "code": "ERROR",
-            "error_type": "request_type_invalid",
-            "message": f"Request type '{request_type}' is not recognized"
-        }
-        print(json.dumps(result, indent=4))
-        exit()
-
-
-except KeyError as e:
-    result = {
-        "code": "ERROR",
-        "error_type": "malformed_request",
-        "message": f"Malformed request for request type '{request_type}' (missing key '{e.args[0]}')"
-    }
-    print(json.dumps(result, indent=4))
-    exit()
+        if encoded is not None:
+            sys.stdout.flush()
+            responses_out.write(encoded)
+            responses_out.flush()
@@ -1,4 +1,5 @@
-const { execSync } = require('node:child_process');
+const { execSync, spawn } = require('node:child_process');
+const readline = require('node:readline');
 
 /**
  * A list of the scripts the server can run. Does not necessarily have to be
@@ -10,6 +11,75 @@ const scripts = {
 	"update conda env": "conda env update -f data/environment.yml -n noaa --prune"
 };
 
+/**
+ * A list of the long-lived workers the server can run. Each one reads one
+ * JSON request per line on standard input and writes one JSON response per
+ * line on standard output.
+ */
+const workers = {
+	"get weather": "conda run --no-capture-output -n noaa python data/get_weather.py --worker"
+};
+
+/**
+ * The running workers, by worker id. Each entry holds the child process, the
+ * requests that are still waiting on a response, and the next request id.
+ */
+const running = {};
+
+/**
+ * Starts the worker with the given id, or returns it if it is already
+ * running. If the worker exits, every request still waiting on it is rejected
+ * and the next request starts a new one.
+ */
+function getWorker(workerID) {
+	if (running[workerID] !== undefined)
+		return running[workerID];
+
+	const child = spawn(workers[workerID], {
+		shell: true,
+		stdio: ['pipe', 'pipe', 'inherit']
+	});
+	const worker = { child: child, pending: new Map(), nextID: 0 };
+	running[workerID] = worker;
+
+	readline.createInterface({ input: child.stdout }).on('line', (line) => {
+		let response;
+		try {
+			response = JSON.parse(line);
+		} catch (e) {
+			return;
+		}
+
+		const request = worker.pending.get(response.id);
+		if (request === undefined)
+			return;
+
+		const id = response.id;
+		delete response.id;
+
+		// Streamed results come before the response, and have no code
+		if (response.code === undefined) {
+			if (request.onResult !== undefined)
+				request.onResult(response);
+			return;
+		}
+
+		worker.pending.delete(id);
+		request.resolve(response);
+	});
+
+	child.on('exit', () => {
+		if (running[workerID] === worker)
+			delete running[workerID];
+
+		for (const request of worker.pending.values())
+			request.reject(new Error(`Worker '${workerID}' exited`));
+		worker.pending.clear();
+	});
+
+	return worker;
+}
+
 module.exports = {
 	/**
 	 * This command takes two arguments, scriptID and stdin. scriptID is the
@@ -24,5 +94,25 @@ module.exports = {
 			return execSync(scripts[scriptID]);
 		else
 			return execSync(scripts[scriptID], { input: stdin });
+	},
+
+	/**
+	 * This command takes two arguments, workerID and request. workerID is
+	 * the id of the worker to send the request to, which must come from the
+	 * workers table. request is an object that is sent to the worker as one
+	 * line of JSON. The worker is started on first use and kept running so
+	 * later requests skip the startup cost. Returns a promise for the parsed
+	 * response object, which is rejected if the worker exits first. If the
+	 * request sets "stream", onResult is called with each result as soon as
+	 * the worker has it, and the response is just the trailer after them.
+	 */
+	runWorker: function(workerID, request, onResult) {
+		const worker = getWorker(workerID);
+		const id = worker.nextID++;
+
+		return new Promise((resolve, reject) => {
+			worker.pending.set(id, { resolve: resolve, reject: reject, onResult: onResult });
+			worker.child.stdin.write(JSON.stringify({ ...request, id: id }) + "\n");
+		});
 	}
 };
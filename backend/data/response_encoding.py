@@ -0,0 +1,86 @@
+import importlib
+import json
+import os
+
+# How responses are written, documented in docs/data_interface.md:
+#   pretty  - JSON indented by four spaces, the original format
+#   compact - JSON without any whitespace, through orjson when it is available
+#   msgpack - MessagePack
+ENCODINGS = ("pretty", "compact", "msgpack")
+
+# Encoding for requests that don't ask for one
+DEFAULT_ENCODING = os.environ.get("BEACH_DAY_ENCODING", "pretty")
+
+# The optional encoders, orjson and msgpack, by name. Each is imported the first time a response needs it,
+# so pretty responses don't pay for them, and is None if it isn't installed
+encoders = {}
+
+
+def optional_encoder(name):
+    """
+    :param name: the encoder's module name
+    :returns: the module, or None if it isn't installed
+    """
+
+    if not name in encoders:
+        try:
+            encoders[name] = importlib.import_module(name)
+        except ImportError:
+            encoders[name] = None
+    return encoders[name]
+
+
+def check_encoding(encoding):
+    """
+    Check that responses can be written in an encoding
+
+    :param encoding: name of the encoding
+    :returns: None if it can be used, or an error response explaining why not
+    """
+
+    if not encoding in ENCODINGS:
+        return {
+            "code": "ERROR",
+            "error_type": "malformed_request: unknown encoding",
+            "message": f"The encoding must be one of {', '.join(ENCODINGS)}"
+        }
+
+    if encoding == "msgpack" and optional_encoder("msgpack") is None:
+        return {
+            "code": "ERROR",
+            "error_type": "DATABASE_msgpack_not_installed",
+            "message": "The msgpack encoding needs the msgpack package, which is not installed"
+        }
+
+    return None
+
+
+def encode_compact(value):
+    """
+    Encode a value as JSON without any whitespace
+
+    :param value: JSON-compatible value
+    :returns: the encoded bytes, without a trailing newline
+    """
+
+    orjson = optional_encoder("orjson")
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def encode(value, encoding):
+    """
+    Encode a response to be written to standard output. JSON responses end with a newline, and MessagePack
+    responses are written back to back, since each one marks its own end
+
+    :param value: JSON-compatible value
+    :param encoding: one of ENCODINGS
+    :returns: the encoded bytes
+    """
+
+    if encoding == "msgpack":
+        return optional_encoder("msgpack").packb(value)
+    if encoding == "compact":
+        return encode_compact(value) + b"\n"
+    return json.dumps(value, indent=4).encode("utf-8") + b"\n"
@@ -0,0 +1,126 @@
+import heapq
+import math
+
+# Mean radius of the Earth in miles
+EARTH_RADIUS = 3958.8
+
+# Small allowance when deciding whether the far side of a split can hold a closer beach, so
+# floating point rounding never prunes a beach that a full scan would have ranked
+PRUNE_TOLERANCE = 1e-9
+
+
+def unit_vector(lat, lon):
+    """
+    Convert a latitude and longitude to a point on the unit sphere. The straight-line distance between
+    two of these points grows with the great-circle distance between them, so nearest neighbours in this
+    space are nearest neighbours on the globe
+
+    :param lat: latitude in degrees
+    :param lon: longitude in degrees
+    :returns: (x, y, z)
+    """
+
+    phi = math.radians(lat)
+    lam = math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+def build_kd_tree(xs, ys, zs):
+    """
+    Build an implicit 3-d tree over beach centroids on the unit sphere. The tree is stored as a list of
+    rows, where the root of every range of the list sits at its middle, everything before it is on the low
+    side of its split, and everything after it is on the high side. Splits cycle through x, y and z. Rows
+    without a centroid are left out
+
+    :param xs: x coordinate for each row, NaN if missing
+    :param ys: y coordinate for each row, NaN if missing
+    :param zs: z coordinate for each row, NaN if missing
+    :returns: list of rows in tree order
+    """
+
+    coords = (xs, ys, zs)
+    tree = [row for row in range(len(xs)) if xs[row] == xs[row]]
+
+    # Explicit stack instead of recursion: (start, stop, depth)
+    stack = [(0, len(tree), 0)]
+    while len(stack) > 0:
+        start, stop, depth = stack.pop()
+        if stop - start <= 1:
+            continue
+
+        axis = coords[depth % 3]
+        tree[start:stop] = sorted(tree[start:stop], key=lambda row: (axis[row], row))
+
+        middle = (start + stop) // 2
+        stack.append((start, middle, depth + 1))
+        stack.append((middle + 1, stop, depth + 1))
+
+    return tree
+
+
+def nearest(tree, xs, ys, zs, lat, lon, count, after=None):
+    """
+    Find the beaches closest to a point by great-circle distance. Beaches are scored by the straight-line
+    distance between their centroid and the point on the unit sphere, which ranks them the same way. Ties are
+    broken by row, which is the order beaches appear in beach_attributes.json. The scores are computed the same
+    way as distance_kernel.chord, so rankings from the two can be continued from each other
+
+    :param tree: rows in tree order, from build_kd_tree
+    :param xs: x coordinate for each row
+    :param ys: y coordinate for each row
+    :param zs: z coordinate for each row
+    :param lat: latitude to search from
+    :param lon: longitude to search from
+    :param count: how many beaches to find
+    :param after: optional (score, row) pair, as returned by this function. Only beaches ranked after it are returned
+    :returns: list of (score, row) pairs, closest first
+    """
+
+    if count <= 0:
+        return []
+
+    coords = (xs, ys, zs)
+    query = unit_vector(lat, lon)
+    qx, qy, qz = query
+
+    # Max-heap of the best so far, stored negated so the worst is on top
+    best = []
+
+    # Each entry also carries a lower bound on the distance to anything in its range
+    stack = [(0, len(tree), 0, 0.0)]
+    while len(stack) > 0:
+        start, stop, depth, bound = stack.pop()
+        if start >= stop:
+            continue
+
+        # Skip ranges that can't hold a beach closer than the worst one kept so far
+        if len(best) == count and bound > -best[0][0] * (1 + PRUNE_TOLERANCE) + PRUNE_TOLERANCE:
+            continue
+
+        middle = (start + stop) // 2
+        row = tree[middle]
+
+        dx = xs[row] - qx
+        dy = ys[row] - qy
+        dz = zs[row] - qz
+        d = math.sqrt(dx * dx + dy * dy + dz * dz)
+        if after is None or ((d, row) > after and row != after[1]):
+            if len(best) < count:
+                heapq.heappush(best, (-d, -row))
+            elif (d, row) < (-best[0][0], -best[0][1]):
+                heapq.heapreplace(best, (-d, -row))
+
+        axis = depth % 3
+        diff = query[axis] - coords[axis][row]
+        if diff < 0:
+            near = (start, middle)
+            far = (middle + 1, stop)
+        else:
+            near = (middle + 1, stop)
+            far = (start, middle)
+
+        # Visit the near side first, so the far side is usually pruned by the time it comes up
+        stack.append((far[0], far[1], depth + 1, max(bound, abs(diff))))
+        stack.append((near[0], near[1], depth + 1, bound))
+
+    return [(-d, -row) for d, row in sorted(best, reverse=True)]
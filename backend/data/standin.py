@@ -0,0 +1,369 @@
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import upstream
+
+# Local stand-in for the NWS API and the CPC UV bulletin:
+#
+#   python standin.py [--port 8330] [--latency 200] [--jitter 50] [--error-rate 0.05] [--throttle-rate 0.02]
+#                     [--seed 1] [--recordings DIR] [--record | --recorded-only]
+#
+# Then point the data layer at it with BEACH_DAY_NWS_URL=http://localhost:8330 and
+# BEACH_DAY_CPC_URL=http://localhost:8330. Requests are answered from recorded responses where there is
+# one. With --record, anything not recorded yet is fetched from the real service and recorded, otherwise
+# the points, forecast, zones, alerts and bulletin endpoints get made-up responses of the same shape,
+# unless --recorded-only is given, in which case anything not recorded is a 404.
+# Every response waits --latency milliseconds give or take --jitter, and fails with a 500 or 503 at
+# --error-rate and with a 429 at --throttle-rate.
+
+# Construct the correct absolute path
+base_dir = os.path.dirname(__file__)  # Get the directory of the current script
+recordings_dir = os.path.join(base_dir, "standin_recordings")
+
+DEFAULT_PORT = 8330
+
+# Paths on the CPC site, every other path is on the NWS API
+CPC_PREFIX = "/products/"
+
+# Made-up forecast gridpoints are this many degrees across, about the size of a real NWS grid cell
+GRID_SIZE = 0.025
+
+# Made-up land zones are this many degrees across
+ZONE_SIZE = 0.5
+
+# Made-up forecasts have this many twelve hour periods
+FORECAST_PERIODS = 14
+
+
+class Faults:
+    """
+    The latency and failures to add to every response. Shared between the server's threads
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, seed=None):
+        """
+        :param latency: seconds to wait before each response
+        :param jitter: the most seconds the wait can be moved either way
+        :param error_rate: chance that a response is a 500 or 503
+        :param throttle_rate: chance that a response is a 429
+        :param seed: seed for the random choices, so a run can be repeated
+        """
+
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def roll(self):
+        """
+        Decide what happens to one response
+
+        :returns: (seconds to wait, status to fail with or None)
+        """
+
+        with self.lock:
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            chance = self.random.random()
+
+        if chance < self.throttle_rate:
+            return delay, 429
+        if chance < self.throttle_rate + self.error_rate:
+            return delay, 503 if chance < self.throttle_rate + self.error_rate / 2 else 500
+        return delay, None
+
+
+def recording_path(directory, host, path):
+    """
+    :param directory: the recordings directory
+    :param host: the real host the request is for
+    :param path: path and query of the request
+    :returns: where the response to the request is recorded
+    """
+
+    digest = hashlib.sha256(f"{host}{path}".encode("utf-8")).hexdigest()[:24]
+    return os.path.join(directory, host, f"{digest}.json")
+
+
+def load_recording(directory, host, path):
+    """
+    :param directory: the recordings directory
+    :param host: the real host the request is for
+    :param path: path and query of the request
+    :returns: the recorded (status, content type, body), or None if there isn't one
+    """
+
+    recording_file = recording_path(directory, host, path)
+    if not os.path.exists(recording_file):
+        return None
+
+    with open(recording_file, 'r') as f:
+        recording = json.loads(f.read())
+    return recording["status"], recording["content_type"], recording["body"].encode("utf-8")
+
+
+def record(directory, host, path):
+    """
+    Fetch a response from the real service and record it
+
+    :param directory: the recordings directory
+    :param host: the real host to fetch from
+    :param path: path and query of the request
+    :returns: the (status, content type, body) that was recorded
+    """
+
+    import requests
+
+    res = requests.get(f"https://{host}{path}", headers={"User-Agent": "beach-day standin", "Accept": "application/geo+json"})
+    recording = {
+        "url": f"https://{host}{path}",
+        "status": res.status_code,
+        "content_type": res.headers.get("Content-Type", "application/json"),
+        "body": res.text
+    }
+
+    recording_file = recording_path(directory, host, path)
+    os.makedirs(os.path.dirname(recording_file), exist_ok=True)
+    temp_path = f"{recording_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(recording, f, indent=4)
+    os.replace(temp_path, recording_file)
+
+    return recording["status"], recording["content_type"], recording["body"].encode("utf-8")
+
+
+def synthetic_bulletin(uvmap):
+    """
+    Write a UV index bulletin in the same layout as the CPC's bulletin.txt, two cities to a line
+
+    :param uvmap: dictionary of "CITY ST" to UV index
+    :returns: the text of the bulletin
+    """
+
+    lines = [
+        "         UV INDEX FORECAST",
+        "",
+        "CITY               STATE  UVI        CITY               STATE  UVI"
+    ]
+    cells = []
+    for name, uv_index in uvmap.items():
+        city, state = name.rsplit(" ", 1)
+        cells.append(f"{city:<18}  {state:<5}  {uv_index:>3}")
+    for i in range(0, len(cells), 2):
+        lines.append("        ".join(cells[i:i + 2]))
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_point(lat, lon):
+    """
+    :param lat: latitude of the point
+    :param lon: longitude of the point
+    :returns: points response, in the gridpoint cell the point falls in
+    """
+
+    grid_x = int((lon + 180.0) / GRID_SIZE)
+    grid_y = int((lat + 90.0) / GRID_SIZE)
+    forecast = f"https://{upstream.NWS_HOST}/gridpoints/STI/{grid_x},{grid_y}/forecast"
+    return {
+        "properties": {
+            "gridId": "STI",
+            "gridX": grid_x,
+            "gridY": grid_y,
+            "forecast": forecast,
+            "forecastHourly": f"{forecast}/hourly",
+            "forecastGridData": f"https://{upstream.NWS_HOST}/gridpoints/STI/{grid_x},{grid_y}"
+        }
+    }
+
+
+def synthetic_forecast(grid_x, grid_y):
+    """
+    :param grid_x: x coordinate of the gridpoint
+    :param grid_y: y coordinate of the gridpoint
+    :returns: forecast response, starting with the current twelve hours
+    """
+
+    # The same gridpoint gets the same weather, colder further north
+    rng = random.Random(grid_x * 100003 + grid_y)
+    base_temperature = 95 - (grid_y * GRID_SIZE - 90.0 - 20.0) * 1.2
+
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    periods = []
+    for number in range(FORECAST_PERIODS):
+        start = now + timedelta(hours=12 * number)
+        is_daytime = 6 <= (start.hour - 5) % 24 < 18
+        periods.append({
+            "number": number + 1,
+            "startTime": start.isoformat(),
+            "endTime": (start + timedelta(hours=12)).isoformat(),
+            "isDaytime": is_daytime,
+            "temperature": round(base_temperature + rng.uniform(-8, 8) - (0 if is_daytime else 15)),
+            "temperatureUnit": "F",
+            "probabilityOfPrecipitation": {"unitCode": "wmoUnit:percent", "value": rng.choice([None, 10, 20, 40, 70])},
+            "relativeHumidity": {"unitCode": "wmoUnit:percent", "value": rng.randint(30, 95)},
+            "windSpeed": f"{rng.randint(0, 20)} mph",
+            "windDirection": rng.choice(["N", "NE", "E", "SE", "S", "SW", "W", "NW"]),
+            "shortForecast": rng.choice(["Sunny", "Mostly Sunny", "Partly Cloudy", "Chance Showers", "Cloudy"])
+        })
+
+    return {"properties": {"periods": periods}}
+
+
+def synthetic_zone(lat, lon):
+    """
+    :param lat: latitude of the point
+    :param lon: longitude of the point
+    :returns: zones response holding the one land zone the point falls in
+    """
+
+    zone = int((lat + 90.0) / ZONE_SIZE) * 1000 + int((lon + 180.0) / ZONE_SIZE)
+    return {"features": [{"properties": {"id": f"STZ{zone:06d}", "type": "land"}}]}
+
+
+def synthetic_response(path):
+    """
+    Make up a response for one of the endpoints the data layer uses
+
+    :param path: path and query of the request
+    :returns: (status, content type, body), or None if it isn't an endpoint that can be made up
+    """
+
+    parts = urlsplit(path)
+    segments = [segment for segment in parts.path.split("/") if segment != ""]
+    query = parse_qs(parts.query)
+
+    try:
+        if parts.path == "/products/stratosphere/uv_index/bulletin.txt":
+            import uv_cities
+
+            # Today's UV index for each city, the same all day
+            rng = random.Random(datetime.now(timezone.utc).date().toordinal())
+            bulletin = synthetic_bulletin({name: rng.randint(1, 11) for name in uv_cities.CITY_NAMES})
+            return 200, "text/plain", bulletin.encode("utf-8")
+
+        if len(segments) == 2 and segments[0] == "points":
+            lat, lon = (float(value) for value in segments[1].split(","))
+            body = synthetic_point(lat, lon)
+        elif len(segments) == 4 and segments[0] == "gridpoints" and segments[3] == "forecast":
+            grid_x, grid_y = (int(value) for value in segments[2].split(","))
+            body = synthetic_forecast(grid_x, grid_y)
+        elif segments == ["zones"] and "point" in query:
+            lat, lon = (float(value) for value in query["point"][0].split(","))
+            body = synthetic_zone(lat, lon)
+        elif segments == ["alerts", "active"]:
+            body = {"type": "FeatureCollection", "features": []}
+        else:
+            return None
+    except ValueError:
+        return problem(400, "Invalid Parameter", f"Could not parse {path}")
+
+    return 200, "application/geo+json", json.dumps(body).encode("utf-8")
+
+
+def problem(status, title, detail):
+    """
+    :param status: HTTP status
+    :param title: short description of the problem
+    :param detail: longer description of the problem
+    :returns: (status, content type, body) of an error response in the NWS's format
+    """
+
+    body = {"type": "https://api.weather.gov/problems/standin", "title": title, "status": status, "detail": detail}
+    return status, "application/problem+json", json.dumps(body).encode("utf-8")
+
+
+def make_handler(faults, directory, recording, verbose, synthetic=True):
+    """
+    :param faults: the Faults to apply
+    :param directory: the recordings directory
+    :param recording: if True, record anything that hasn't been recorded yet from the real services
+    :param verbose: if True, log every request to standard error
+    :param synthetic: if True, make up responses for endpoints that haven't been recorded
+    :returns: request handler class for the stand-in
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep connections open between requests, like the real services. The headers and body are written
+        # separately, so don't hold the body back waiting for the headers to be acknowledged
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            host = upstream.CPC_HOST if self.path.startswith(CPC_PREFIX) else upstream.NWS_HOST
+
+            delay, failure = faults.roll()
+            time.sleep(delay)
+
+            if failure == 429:
+                response = problem(429, "Too Many Requests", "The stand-in is throttling this request")
+            elif failure is not None:
+                response = problem(failure, "Unexpected Problem", "The stand-in failed this request on purpose")
+            else:
+                response = load_recording(directory, host, self.path)
+                if response is None and recording:
+                    response = record(directory, host, self.path)
+                if response is None and synthetic:
+                    response = synthetic_response(self.path)
+                if response is None:
+                    response = problem(404, "Not Found", f"Nothing is recorded for {self.path}")
+
+            status, content_type, body = response
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def argument(arguments, name, default):
+    """
+    :param arguments: command line arguments
+    :param name: the option, such as "--port"
+    :param default: value to use if the option isn't given
+    :returns: the value given after the option, or default
+    """
+
+    if name in arguments:
+        return arguments[arguments.index(name) + 1]
+    return default
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+
+    port = int(argument(arguments, "--port", DEFAULT_PORT))
+    seed = argument(arguments, "--seed", None)
+    faults = Faults(
+        latency=float(argument(arguments, "--latency", 0)) / 1000.0,
+        jitter=float(argument(arguments, "--jitter", 0)) / 1000.0,
+        error_rate=float(argument(arguments, "--error-rate", 0)),
+        throttle_rate=float(argument(arguments, "--throttle-rate", 0)),
+        seed=None if seed is None else int(seed)
+    )
+    directory = argument(arguments, "--recordings", recordings_dir)
+
+    handler = make_handler(faults, directory, "--record" in arguments, "--verbose" in arguments, not "--recorded-only" in arguments)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    print(f"Stand-in listening on http://127.0.0.1:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,136 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Startup profile: python get_weather.py --profile-startup [--min-ms 1.0] < request.json
+#
+# Runs get_weather.py for one request under python -X importtime, and reports how long the whole run took
+# and how much of it each import accounted for, as a tree in the order the modules were imported. Imports
+# up to and including site are the interpreter's own startup
+
+# Imports that took less than this many milliseconds, counting what they imported, are left out of the report
+MIN_MS = 1.0
+
+
+class ImportEntry:
+    """
+    One module from the -X importtime output, and the modules it imported
+    """
+
+    __slots__ = ("name", "self_us", "cumulative_us", "children")
+
+    def __init__(self, name, self_us, cumulative_us, children):
+        """
+        :param name: the module's name
+        :param self_us: microseconds spent in the module itself
+        :param cumulative_us: microseconds spent in the module and everything it imported
+        :param children: list of ImportEntry for the modules it imported, in order
+        """
+
+        self.name = name
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.children = children
+
+
+def parse_importtime(output):
+    """
+    Parse the output of -X importtime. Each module is printed after the modules it imports, indented two
+    more spaces for each level of nesting
+
+    :param output: everything the run wrote to standard error
+    :returns: list of ImportEntry for the modules imported at the top level, in order
+    """
+
+    # Modules printed so far that haven't been claimed by the module that imported them, by depth
+    waiting = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        try:
+            self_us = int(fields[0])
+            cumulative_us = int(fields[1])
+        except ValueError:
+            # The header line
+            continue
+
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        name = name.strip()
+
+        entry = ImportEntry(name, self_us, cumulative_us, waiting.pop(depth + 1, []))
+        waiting.setdefault(depth, []).append(entry)
+
+    return waiting.get(0, [])
+
+
+def report_lines(entries, min_ms=MIN_MS, depth=0):
+    """
+    :param entries: list of ImportEntry to describe
+    :param min_ms: leave out imports that took less than this many milliseconds
+    :param depth: how far to indent them
+    :returns: list of lines describing each import and, under it, the imports inside it
+    """
+
+    lines = []
+    for entry in entries:
+        if entry.cumulative_us < min_ms * 1000:
+            continue
+        lines.append(f"{entry.cumulative_us / 1000:>10.1f} {entry.self_us / 1000:>8.1f}  {'  ' * depth}{entry.name}")
+        lines.extend(report_lines(entry.children, min_ms, depth + 1))
+    return lines
+
+
+def profile_startup(request_line, min_ms=MIN_MS):
+    """
+    Run get_weather.py for one request under -X importtime and describe where its startup time went
+
+    :param request_line: the request, as one line of JSON
+    :param min_ms: leave out imports that took less than this many milliseconds
+    :returns: list of lines of the report
+    """
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "get_weather.py")
+
+    begin = time.perf_counter()
+    run = subprocess.run([sys.executable, "-X", "importtime", script], input=request_line.encode("utf-8"),
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    wall = time.perf_counter() - begin
+
+    stderr = run.stderr.decode("utf-8", "replace")
+    entries = parse_importtime(stderr)
+
+    try:
+        request_type = json.loads(request_line).get("request_type", "")
+    except (ValueError, AttributeError):
+        request_type = ""
+
+    interpreter_us = 0
+    for position, entry in enumerate(entries):
+        if entry.name == "site":
+            interpreter_us = sum(earlier.cumulative_us for earlier in entries[:position + 1])
+            break
+
+    lines = [
+        f"Startup profile for request type '{request_type}'",
+        f"  whole run             {wall * 1000:>8.1f} ms",
+        f"  all imports           {sum(entry.cumulative_us for entry in entries) / 1000:>8.1f} ms",
+        f"  interpreter imports   {interpreter_us / 1000:>8.1f} ms",
+        "",
+        f"{'total ms':>10} {'self ms':>8}  module"
+    ]
+    lines.extend(report_lines(entries, min_ms))
+
+    # Anything else the run printed to standard error, such as a traceback
+    other = [line for line in stderr.splitlines() if not line.startswith("import time:")]
+    if len(other) > 0:
+        lines.append("")
+        lines.extend(other)
+
+    return lines
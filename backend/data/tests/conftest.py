@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The data layer is a folder of flat modules that import each other by name, the same as when get_weather.py
+# is run from backend/data
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
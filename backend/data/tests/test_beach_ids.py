@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+import beaches
+
+
+@pytest.mark.parametrize("beach_id", [123, 1.5, None, True, ["WA789392"], {"beach_id": "WA789392"}])
+def test_ids_that_are_not_strings_are_not_found(beach_id):
+    assert beaches.get_store().row_of(beach_id) == -1
+    assert beaches.get_record(beach_id) is None
+
+
+@pytest.mark.parametrize("beach_id", [123, ["WA789392"]])
+def test_ids_that_are_not_strings_are_invalid(beach_id, capsys):
+    with pytest.raises(SystemExit):
+        beaches.get_beach_info_by_id(beach_id)
+    assert json.loads(capsys.readouterr().out)["error_type"] == "invalid_beach_id"
+
+
+def test_string_ids_are_found():
+    store = beaches.get_store()
+    assert store.beach_id(store.row_of("WA789392")) == "WA789392"
+    assert store.row_of("not a beach") == -1
+
+
+def test_unknown_ids_are_not_cached(monkeypatch):
+    monkeypatch.setattr(beaches, "records", {})
+
+    for n in range(1000):
+        assert beaches.get_record(f"XX{n:06d}") is None
+    record = beaches.get_record("WA789392")
+
+    assert list(beaches.records) == ["WA789392"]
+    assert beaches.get_record("WA789392") is record
@@ -0,0 +1,169 @@
+import math
+import os
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import beach_gridpoints
+import beach_store
+import beach_tables
+import events
+import standin
+import upstream
+
+# NWS responses for a few beaches, in the stand-in's recording format. They were written by hand, so the
+# tests that use them check how the builders work, not that the values are right. The shipped tables are
+# checked against the recordings they were generated from, see the test_shipped_*_table_matches_recordings tests
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "standin_recordings")
+
+GRIDPOINTS = {
+    "WA789392": ["SEW", 135, 121],
+    "FL001972": ["TBW", 120, 12],
+    "HI003791": ["HFO", 165, 81]
+}
+
+ZONES = {
+    "WA789392": "WAZ507",
+    "FL001972": "FLZ160",
+    "HI003791": "HIZ006"
+}
+
+
+@contextmanager
+def replaying(directory, monkeypatch):
+    """
+    Send NWS requests to a stand-in that only serves the recordings in a directory, so a request that isn't
+    recorded fails instead of being made up
+    """
+
+    handler = standin.make_handler(standin.Faults(), directory, False, False, synthetic=False)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(upstream, "NWS_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(upstream, "RETRIES", 0)
+    try:
+        yield
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def standin_nws(monkeypatch):
+    with replaying(FIXTURE_DIR, monkeypatch):
+        yield
+
+
+def beaches_with_centroids():
+    """
+    :returns: set of the ids of every beach the table builders look up
+    """
+
+    store = beach_store.load_store(beach_store.store_path, beach_store.json_path)
+    lats = store.column("centroid_lat")
+    lons = store.column("centroid_lon")
+    return {store.beach_id(row) for row in range(len(store)) if not (math.isnan(lats[row]) or math.isnan(lons[row]))}
+
+
+def replays_shipped_table(path):
+    """
+    :returns: pytest mark that skips a test unless the table at path and the recordings it was built from exist
+    """
+
+    return pytest.mark.skipif(not (os.path.exists(path) and os.path.isdir(standin.recordings_dir)),
+                              reason=f"{os.path.basename(path)} and its recordings haven't been generated, see docs/data_interface.md")
+
+
+def compile_with_tables(tmp_path, monkeypatch):
+    """
+    Compile a store that picks up whichever tables have been built in tmp_path
+
+    :returns: the opened BeachStore
+    """
+
+    monkeypatch.setattr(beach_store, "gridpoints_path", str(tmp_path / "beach_gridpoints.json"))
+    monkeypatch.setattr(beach_store, "zones_path", str(tmp_path / "beach_zones.json"))
+
+    store_path = str(tmp_path / "beach_store.bin")
+    beach_store.compile_from_json(store_path, beach_store.json_path)
+    return beach_store.BeachStore(store_path)
+
+
+def test_gridpoint_table_builds_offline(standin_nws, tmp_path, monkeypatch):
+    client = upstream.Client()
+    table_path = str(tmp_path / "beach_gridpoints.json")
+    beach_tables.build_table(table_path, lambda lat, lon: beach_gridpoints.lookup_gridpoint(client, lat, lon),
+                             list(GRIDPOINTS.keys()))
+
+    assert beach_tables.load_table(table_path) == GRIDPOINTS
+
+    store = compile_with_tables(tmp_path, monkeypatch)
+    for beach_id, gridpoint in GRIDPOINTS.items():
+        assert store.gridpoint(store.row_of(beach_id)) == tuple(gridpoint)
+    assert store.gridpoint(store.row_of("AK103349")) is None
+
+
+def test_zone_table_builds_offline(standin_nws, tmp_path, monkeypatch):
+    table_path = str(tmp_path / "beach_zones.json")
+    beach_tables.build_table(table_path, events.get_zone_id, list(ZONES.keys()))
+
+    assert beach_tables.load_table(table_path) == ZONES
+
+    store = compile_with_tables(tmp_path, monkeypatch)
+    for beach_id, zone in ZONES.items():
+        assert store.zone(store.row_of(beach_id)) == zone
+    assert store.zone(store.row_of("AK103349")) is None
+
+
+def test_build_data_looks_up_the_tables(standin_nws, tmp_path, monkeypatch):
+    import build_data
+
+    monkeypatch.setattr(build_data, "shards_dir", str(tmp_path / "states"))
+    monkeypatch.setattr(build_data, "manifest_path", str(tmp_path / "build_manifest.json"))
+    for name in ("json_path", "store_path", "gridpoints_path", "zones_path"):
+        monkeypatch.setattr(beach_store, name, str(tmp_path / os.path.basename(getattr(beach_store, name))))
+
+    built = build_data.build(tables=True, beach_ids=list(GRIDPOINTS.keys()))
+
+    assert "beach_store" in built and "by_state/WA" in built
+    assert beach_tables.load_table(beach_store.gridpoints_path) == GRIDPOINTS
+    assert beach_tables.load_table(beach_store.zones_path) == ZONES
+
+    store = beach_store.BeachStore(beach_store.store_path)
+    for beach_id in GRIDPOINTS:
+        assert store.gridpoint(store.row_of(beach_id)) == tuple(GRIDPOINTS[beach_id])
+        assert store.zone(store.row_of(beach_id)) == ZONES[beach_id]
+
+    # The tables are already complete, so nothing is looked up or built again
+    assert build_data.build(tables=True, beach_ids=list(GRIDPOINTS.keys())) == []
+
+
+@replays_shipped_table(beach_store.gridpoints_path)
+def test_shipped_gridpoint_table_matches_recordings(tmp_path, monkeypatch):
+    shipped = beach_tables.load_table(beach_store.gridpoints_path)
+    assert set(shipped.keys()) == beaches_with_centroids()
+
+    # Build the table again from the recordings alone, and it has to come out the same
+    replayed_path = str(tmp_path / "beach_gridpoints.json")
+    with replaying(standin.recordings_dir, monkeypatch):
+        client = upstream.Client()
+        beach_tables.build_table(replayed_path, lambda lat, lon: beach_gridpoints.lookup_gridpoint(client, lat, lon))
+
+    assert beach_tables.load_table(replayed_path) == shipped
+
+
+@replays_shipped_table(beach_store.zones_path)
+def test_shipped_zone_table_matches_recordings(tmp_path, monkeypatch):
+    shipped = beach_tables.load_table(beach_store.zones_path)
+    assert set(shipped.keys()) == beaches_with_centroids()
+
+    replayed_path = str(tmp_path / "beach_zones.json")
+    with replaying(standin.recordings_dir, monkeypatch):
+        beach_tables.build_table(replayed_path, events.get_zone_id)
+
+    assert beach_tables.load_table(replayed_path) == shipped
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+import beaches
+import events
+import get_weather
+import upstream
+
+# An alert for the Olympic coast, in effect all of July 2026
+ALERT = {
+    "properties": {
+        "headline": "Beach Hazards Statement issued by NWS Seattle",
+        "onset": "2026-07-01T00:00:00+00:00",
+        "ends": "2026-08-01T00:00:00+00:00",
+        "geocode": {"UGC": ["WAZ514"]}
+    }
+}
+
+
+class FakeNWS:
+    """
+    Answers every alerts request with ALERT and remembers the URLs it was asked for
+    """
+
+    def __init__(self):
+        self.urls = []
+
+    def __call__(self, url, **kwargs):
+        self.urls.append(url)
+        return self
+
+    def json(self):
+        return {"features": [ALERT]}
+
+    def zone_requests(self):
+        return [url for url in self.urls if "zone=" in url]
+
+    def national_requests(self):
+        return [url for url in self.urls if "zone=" not in url]
+
+
+@pytest.fixture
+def nws(monkeypatch):
+    fake = FakeNWS()
+    monkeypatch.setattr(upstream, "get", fake)
+    monkeypatch.setattr(beaches, "get_zone", lambda beach_id: "WAZ514")
+    monkeypatch.setattr(events, "alert_snapshot", {"fetched": None, "index": None})
+    return fake
+
+
+def request(beach_id, when):
+    return {
+        "request_type": "check_event",
+        "time": str(when),
+        "beach_id": beach_id,
+        "event_name": "Tide pools",
+        "email_address": ""
+    }
+
+
+# 2026-07-04T18:00:00Z
+JULY_4 = 1783188000
+
+
+def test_single_shot_fetches_only_the_beach_zone(nws):
+    result = get_weather.handle_request(request("WA789392", JULY_4))
+
+    assert result["action"] == "notify"
+    assert "Beach Hazards Statement" in result["message"]
+    assert nws.national_requests() == []
+    assert len(nws.zone_requests()) == 1
+    assert "zone=WAZ514" in nws.zone_requests()[0]
+
+
+def test_worker_mode_shares_the_national_snapshot(nws, monkeypatch):
+    monkeypatch.setattr(get_weather, "worker_mode", True)
+
+    first = get_weather.handle_request(request("WA789392", JULY_4))
+    second = get_weather.handle_request(request("WA789392", JULY_4 + 86400))
+
+    assert first["action"] == second["action"] == "notify"
+    assert nws.zone_requests() == []
+    assert len(nws.national_requests()) == 1
+
+
+def test_zone_fetch_and_snapshot_agree(nws):
+    for when in (JULY_4, 1780000000, 1790000000):
+        time = get_weather.datetime.fromtimestamp(when, tz=get_weather.dt.timezone.utc)
+        alone = events.check_event(time, "WA789392", "Tide pools", "")
+        shared = events.check_event(time, "WA789392", "Tide pools", "", shared_snapshot=True)
+        assert json.dumps(alone, sort_keys=True) == json.dumps(shared, sort_keys=True)
@@ -0,0 +1,68 @@
+import pytest
+from Levenshtein import distance as edit_distance
+
+import beach_search
+import build_data
+
+# Each case is a state and something a user might type for a county in it
+QUERIES = [
+    ("CA", "Santa Cruz"),
+    ("CA", "santa cruz"),
+    ("FL", "Miami-Dade"),
+    ("FL", "Monroe County"),
+    ("HI", "Honolulu"),
+    ("MI", ""),
+    ("AK", "Kenai Peninsula Borough"),
+    ("PR", "Mayagüez"),
+    ("WA", "King"),
+    ("GU", "Guam")
+]
+
+
+@pytest.fixture(scope="module")
+def shards():
+    # The per-state records the search used to sort, read straight from the CSV
+    return build_data.split_by_state(build_data.read_csv())
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    beach_search.clear_search_cache()
+
+
+def per_beach_sort(shards, state, county):
+    """
+    The ranking before counties were grouped: a stable sort of the state's beaches by edit distance
+    """
+
+    return [beach_id for beach_id, record in sorted(shards[state].items(), key=lambda item: edit_distance(county, item[1]["BEACH_COUNTY"]))]
+
+
+@pytest.mark.parametrize("state, county", QUERIES)
+def test_ranking_matches_the_per_beach_sort(shards, state, county):
+    expected = per_beach_sort(shards, state, county)
+
+    # A page holds at most MAX_SEARCH_RESULTS, and the rest are reached with the cursor
+    page, cursor = beach_search.rank_beach_by_county_state(county, state, 0, len(expected) + 1)
+    assert page == expected[:beach_search.MAX_SEARCH_RESULTS]
+    assert (cursor == "") == (len(expected) <= beach_search.MAX_SEARCH_RESULTS)
+
+
+@pytest.mark.parametrize("state, county", QUERIES[:4])
+@pytest.mark.parametrize("start, stop", [(0, 10), (7, 31), (25, 26), (-10, -1), (5, -5)])
+def test_pages_match_the_per_beach_sort(shards, state, county, start, stop):
+    page, cursor = beach_search.rank_beach_by_county_state(county, state, start, stop)
+    assert page == per_beach_sort(shards, state, county)[start:stop][:beach_search.MAX_SEARCH_RESULTS]
+
+
+@pytest.mark.parametrize("state, county", QUERIES[:4])
+def test_cursor_walk_matches_the_per_beach_sort(shards, state, county):
+    expected = per_beach_sort(shards, state, county)
+
+    walked = []
+    cursor = None
+    while cursor != "":
+        page, cursor = beach_search.rank_beach_by_county_state(county, state, 0, 37, cursor)
+        walked.extend(page)
+
+    assert walked == expected
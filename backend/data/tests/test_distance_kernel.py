@@ -0,0 +1,52 @@
+import math
+
+import beaches
+import distance_kernel
+import spatial_index
+
+# Spread over the country, including both sides of the antimeridian and points far from any beach
+POINTS = [(48.225, -122.527), (25.77, -80.19), (21.3, -157.8), (61.2, -149.9), (13.44, 144.79),
+          (-14.27, -170.7), (18.2, -66.5), (39.0, -98.0), (0.0, 0.0), (52.0, 179.9)]
+
+
+def great_circle(lat1, lon1, lat2, lon2):
+    """
+    :returns: the haversine distance between two points in miles
+    """
+
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * spatial_index.EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def test_kernel_ranks_by_great_circle_distance():
+    store = beaches.get_store()
+    centroids = store.centroids()
+    lats = store.column("centroid_lat")
+    lons = store.column("centroid_lon")
+
+    for lat, lon in POINTS:
+        ranked = distance_kernel.nearest(centroids, lat, lon, len(store))
+        assert len(ranked) == len(centroids.rows)
+
+        # Every beach with a centroid, once each, in order of the distance a full haversine scan gives
+        assert sorted(row for score, row in ranked) == list(centroids.rows)
+        miles = [great_circle(lat, lon, lats[row], lons[row]) for score, row in ranked]
+        for before, after in zip(miles, miles[1:]):
+            assert before <= after + 1e-6
+
+
+def test_kernel_and_spatial_index_agree():
+    store = beaches.get_store()
+    centroids = store.centroids()
+
+    for lat, lon in POINTS:
+        for count in (1, 10, 50):
+            assert distance_kernel.nearest(centroids, lat, lon, count) == store.nearest(lat, lon, count)
+
+
+def test_kernel_count_past_the_end():
+    centroids = beaches.get_store().centroids()
+    assert distance_kernel.nearest(centroids, 40.0, -74.0, 0) == []
+    assert len(distance_kernel.nearest(centroids, 40.0, -74.0, 10 ** 6)) == len(centroids.rows)
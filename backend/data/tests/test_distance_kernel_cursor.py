@@ -0,0 +1,38 @@
+import pytest
+
+import beaches
+import distance_kernel
+
+
+def walk(centroids, lat, lon, size, pages):
+    """
+    :returns: every (score, row) pair from `pages` pages of `size` results, each continued from the last
+    """
+
+    ranked = []
+    after = None
+    for _ in range(pages):
+        page = distance_kernel.nearest(centroids, lat, lon, size, after=after)
+        ranked.extend(page)
+        if len(page) < size:
+            break
+        after = page[-1]
+    return ranked
+
+
+@pytest.mark.parametrize("lat, lon", [(48.225, -122.527), (25.77, -80.19), (21.3, -157.8)])
+@pytest.mark.parametrize("size", [1, 7, 100])
+def test_cursor_walk_matches_full_ranking(lat, lon, size):
+    centroids = beaches.get_store().centroids()
+    pages = 300 // size
+
+    full = distance_kernel.nearest(centroids, lat, lon, size * pages)
+    assert walk(centroids, lat, lon, size, pages) == full
+
+
+def test_deep_cursor_page_is_full():
+    centroids = beaches.get_store().centroids()
+    full = distance_kernel.nearest(centroids, 40.0, -74.0, 1100)
+
+    page = distance_kernel.nearest(centroids, 40.0, -74.0, 100, after=full[999])
+    assert page == full[1000:1100]
@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+
+import pytest
+import requests
+
+import beaches
+import events
+import upstream
+
+WHEN = datetime(2026, 7, 4, 18, 0, tzinfo=timezone.utc)
+
+
+class Snapshot:
+    """
+    Alert snapshot with one alert in one zone
+    """
+
+    def headlines(self, zone_id, time):
+        return ["Rip Current Statement"] if zone_id == "WAZ001" else []
+
+
+def zones_response(body, status=200):
+    result = requests.Response()
+    result.status_code = status
+    result._content = body.encode("utf-8")
+    return result
+
+
+@pytest.fixture
+def live_zones(monkeypatch):
+    """
+    Every beach looks up its zone live. Returns the map of latitude prefix to what the zones endpoint answers
+    """
+
+    answers = {}
+
+    def get(url, **kwargs):
+        for prefix, answer in answers.items():
+            if f"point={prefix}" in url:
+                if isinstance(answer, Exception):
+                    raise answer
+                return answer
+        return zones_response('{"features": []}')
+
+    monkeypatch.setattr(beaches, "get_zone", lambda beach_id: None)
+    monkeypatch.setattr(events, "get_alert_snapshot", lambda: Snapshot())
+    monkeypatch.setattr(events, "close_smtp_session", lambda: None)
+    monkeypatch.setattr(upstream, "get", get)
+    return answers
+
+
+def latitude(beach_id):
+    return str(beaches.get_beach_info_by_id(beach_id)["latitude"])[:6]
+
+
+def test_zone_lookup_failure_only_affects_its_beach(live_zones):
+    live_zones[latitude("WA789392")] = zones_response('{"features": [{"properties": {"id": "WAZ001"}}]}')
+    live_zones[latitude("FL001972")] = requests.ConnectionError("connection refused")
+    live_zones[latitude("HI003791")] = zones_response("<html>502 Bad Gateway</html>", 502)
+
+    results = events.check_events_batch([
+        (WHEN, "FL001972", "Picnic", ""),
+        (WHEN, "WA789392", "Swim", ""),
+        (WHEN, "HI003791", "Surf", ""),
+        (WHEN, "not a beach", "Walk", "")
+    ])
+
+    assert results[0] == {"action": "none"}
+    assert results[1]["action"] == "notify"
+    assert "Rip Current Statement" in results[1]["message"]
+    assert results[2] == {"action": "none"}
+    assert results[3]["error_type"] == "invalid_beach_id"
+
+
+@pytest.mark.parametrize("body", ['{}', '{"features": []}', '{"features": [{}]}', '{"features": [{"properties": {}}]}', '[]'])
+def test_zone_response_without_a_zone(live_zones, body):
+    live_zones["40.0"] = zones_response(body)
+    assert events.get_zone_id(40.0, -74.0) is None
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+
+import basic_weather
+import disk_cache
+
+# 2026-07-04T12:00:00Z
+NOON = 1783166400.0
+
+
+class Clock:
+    """
+    Wall clock the test moves by hand
+    """
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeNOAA:
+    """
+    Stand-in for the NOAA client. Each forecast's first period ends at the top of the next hour, and every
+    call is counted
+    """
+
+    DEFAULT_END_POINT = "api.weather.gov"
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.points_calls = []
+        self.forecast_calls = []
+        self.fail = False
+
+    def points(self, point):
+        self.points_calls.append(point)
+        if self.fail:
+            raise ConnectionError("points unavailable")
+        lat, lon = (float(value) for value in point.split(","))
+        return {"properties": {"gridId": "MFL", "gridX": int(lat * 10), "gridY": int(-lon * 10)}}
+
+    def make_get_request(self, uri, end_point=None):
+        self.forecast_calls.append(uri)
+        if self.fail:
+            raise ConnectionError("forecast unavailable")
+        end = time.strftime("%Y-%m-%dT%H:00:00+00:00", time.gmtime(self.clock() + 3600))
+        return {"properties": {"periods": [{"name": "This Afternoon", "endTime": end, "temperature": 88}]}}
+
+
+@pytest.fixture
+def noaa(monkeypatch, tmp_path):
+    clock = Clock(NOON)
+    monkeypatch.setattr(time, "time", clock)
+    monkeypatch.setattr(disk_cache, "cache_path", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(disk_cache, "connections", threading.local())
+    monkeypatch.setattr(disk_cache, "PURGE_CHANCE", 0)
+
+    client = FakeNOAA(clock)
+    monkeypatch.setattr(basic_weather, "N", client)
+    return client
+
+
+def test_nearby_locations_share_a_gridpoint(noaa):
+    first = basic_weather.get_gridpoint(25.7906, -80.1300)
+    second = basic_weather.get_gridpoint(25.7911, -80.1349)
+
+    assert first == second == ("MFL", 257, 801)
+    assert len(noaa.points_calls) == 1
+
+    # Rounds to a different point
+    basic_weather.get_gridpoint(25.7956, -80.1300)
+    assert len(noaa.points_calls) == 2
+
+
+def test_cached_forecast_is_the_fetched_forecast(noaa):
+    fetched = basic_weather.get_gridpoint_forecast("MFL", 110, 50)
+    cached = basic_weather.get_gridpoint_forecast("MFL", 110, 50)
+
+    assert cached == fetched
+    assert noaa.forecast_calls == ["/gridpoints/MFL/110,50/forecast"]
+
+
+def test_forecast_expires_with_its_first_period(noaa):
+    noaa.clock.now = NOON + 1800
+    basic_weather.get_gridpoint_forecast("MFL", 110, 50)
+
+    # The first period ends at 13:00, before FORECAST_CACHE_TTL is up
+    noaa.clock.now = NOON + 3599
+    basic_weather.get_gridpoint_forecast("MFL", 110, 50)
+    assert len(noaa.forecast_calls) == 1
+
+    noaa.clock.now = NOON + 3601
+    basic_weather.get_gridpoint_forecast("MFL", 110, 50)
+    assert len(noaa.forecast_calls) == 2
+
+
+def test_forecast_expires_after_the_ttl(noaa, monkeypatch):
+    monkeypatch.setattr(basic_weather, "FORECAST_CACHE_TTL", 60)
+
+    basic_weather.get_gridpoint_forecast("MFL", 110, 50)
+    noaa.clock.now += 61
+    basic_weather.get_gridpoint_forecast("MFL", 110, 50)
+
+    assert len(noaa.forecast_calls) == 2
+
+
+@pytest.mark.parametrize("forecast", [{}, {"properties": {"periods": []}}, {"properties": {"periods": [{"endTime": "soon"}]}}])
+def test_forecast_without_a_period_end_is_not_cached(noaa, monkeypatch, forecast):
+    monkeypatch.setattr(noaa, "make_get_request", lambda uri, end_point=None: noaa.forecast_calls.append(uri) or forecast)
+
+    assert basic_weather.get_gridpoint_forecast("MFL", 110, 50) == forecast
+    assert basic_weather.get_gridpoint_forecast("MFL", 110, 50) == forecast
+    assert len(noaa.forecast_calls) == 2
+
+
+def test_failed_lookups_are_not_cached(noaa):
+    noaa.fail = True
+    with pytest.raises(ConnectionError):
+        basic_weather.get_points_forecast(25.79, -80.13)
+
+    noaa.fail = False
+    assert basic_weather.get_points_forecast(25.79, -80.13)["properties"]["periods"][0]["temperature"] == 88
+    assert len(noaa.points_calls) == 2
+
+
+def test_unusable_cache_behaves_like_a_miss(noaa, monkeypatch, tmp_path):
+    monkeypatch.setattr(disk_cache, "cache_path", str(tmp_path / "missing" / "cache.sqlite3"))
+
+    for _ in range(2):
+        assert basic_weather.get_points_forecast(25.79, -80.13)["properties"]["periods"][0]["temperature"] == 88
+    assert len(noaa.points_calls) == 2
+    assert len(noaa.forecast_calls) == 2
+
+
+def test_locations_that_are_not_numbers_are_not_cached(noaa):
+    with pytest.raises(ValueError):
+        basic_weather.get_gridpoint("north", "-80.13")
+    assert disk_cache.get("gridpoint", "north,-80.13") is None
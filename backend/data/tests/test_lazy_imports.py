@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import startup_profile
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The heavy libraries, and the requests that are allowed to load them
+HEAVY = ("requests", "noaa_sdk", "numpy", "Levenshtein")
+
+
+def modules_loaded(request):
+    """
+    Run one request through get_weather.py under -X importtime
+
+    :returns: set of every module the run imported
+    """
+
+    finished = subprocess.run([sys.executable, "-X", "importtime", "get_weather.py"], input=json.dumps(request) + "\n",
+                              cwd=DATA_DIR, capture_output=True, text=True, timeout=60)
+    assert finished.returncode == 0, finished.stderr
+
+    loaded = set()
+
+    def walk(entries):
+        for entry in entries:
+            loaded.add(entry.name)
+            walk(entry.children)
+
+    walk(startup_profile.parse_importtime(finished.stderr))
+    return loaded
+
+
+@pytest.mark.parametrize("module", ["get_weather", "beaches", "beach_search", "basic_weather"])
+def test_importing_a_component_loads_nothing_heavy(module):
+    code = f"import sys, {module}; print(sorted(name for name in {HEAVY!r} if name in sys.modules))"
+    finished = subprocess.run([sys.executable, "-c", code], cwd=DATA_DIR, capture_output=True, text=True, timeout=60)
+
+    # basic_weather reaches NOAA, but only loads the client when it first makes a call
+    assert finished.returncode == 0, finished.stderr
+    assert finished.stdout.strip() == "[]"
+
+
+@pytest.mark.parametrize("request_body, allowed", [
+    ({"request_type": "get_beach_info_by_id", "beach_id": "WA789392"}, set()),
+    ({"request_type": "search_beach_by_lat_lon_no_weather", "latitude": "47.6", "longitude": "-122.4", "start": "0", "stop": "5"}, set()),
+    ({"request_type": "search_beach_by_county_state_no_weather", "county": "King", "state": "WA", "start": "0", "stop": "5"}, {"Levenshtein"}),
+    ({"request_type": "search_beach_by_lat_lon_no_weather", "latitude": "47.6", "longitude": "-122.4", "start": "0", "stop": "200"}, {"numpy"})
+])
+def test_requests_only_load_what_they_need(request_body, allowed):
+    loaded = modules_loaded(request_body)
+    assert {name for name in HEAVY if name in loaded} == allowed
+
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:        80 |        200 | io
+import time:      1500 |       1500 | site
+import time:        40 |         40 |     urllib3.util
+import time:       900 |        940 |   urllib3
+import time:        60 |         60 |   charset_normalizer
+import time:      3000 |       4000 | requests
+Traceback (most recent call last):
+"""
+
+
+def test_importtime_output_is_parsed_into_a_tree():
+    entries = startup_profile.parse_importtime(IMPORTTIME)
+
+    assert [entry.name for entry in entries] == ["io", "site", "requests"]
+    assert [child.name for child in entries[0].children] == ["_io"]
+    requests_entry = entries[2]
+    assert (requests_entry.self_us, requests_entry.cumulative_us) == (3000, 4000)
+    assert [child.name for child in requests_entry.children] == ["urllib3", "charset_normalizer"]
+    assert [child.name for child in requests_entry.children[0].children] == ["urllib3.util"]
+
+
+def test_report_leaves_out_small_imports():
+    lines = startup_profile.report_lines(startup_profile.parse_importtime(IMPORTTIME), min_ms=0.5)
+
+    assert [line.split()[-1] for line in lines] == ["site", "requests", "urllib3"]
+    assert lines[2].startswith("       0.9      0.9    ")
+
+
+def test_profile_startup_reports_the_run():
+    lines = startup_profile.profile_startup(json.dumps({"request_type": "get_beach_info_by_id", "beach_id": "WA789392"}), min_ms=0)
+
+    assert lines[0] == "Startup profile for request type 'get_beach_info_by_id'"
+    assert lines[1].startswith("  whole run") and lines[2].startswith("  all imports")
+    assert "beaches" in [line.split()[-1] for line in lines[6:] if line.strip()]
@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+
+import msgpack
+import pytest
+
+import response_encoding
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Responses shaped like the ones get_weather.py writes
+SAMPLES = [
+    {"code": "ERROR", "error_type": "invalid_beach_id", "message": "The requested beach ID could not be found"},
+    {"order": ["WA789392", "HI003791"], "cursor": "", "code": "search_beach_by_lat_lon"},
+    {"beach_name": "Kailua Beach Park", "latitude": 21.3972, "longitude": -157.7274, "beach_length": None, "code": "get_beach_info_by_id"},
+    {"results": [{"action": "none"}, {"action": "notify", "title": "Event 'Café ☀' impacted", "message": "Rip\nCurrent"}], "code": "check_events_batch"},
+    {"nested": {"empty": {}, "list": [], "deep": [[1, 2.5, -3e-12], [True, False, None]]}, "big": 2 ** 53}
+]
+
+
+def decode(encoded, encoding):
+    if encoding == "msgpack":
+        return msgpack.unpackb(encoded)
+    return json.loads(encoded)
+
+
+@pytest.mark.parametrize("encoding", ["compact", "msgpack"])
+@pytest.mark.parametrize("sample", SAMPLES)
+def test_encodings_decode_to_the_pretty_response(sample, encoding):
+    pretty = json.loads(response_encoding.encode(sample, "pretty"))
+    assert decode(response_encoding.encode(sample, encoding), encoding) == pretty
+
+
+@pytest.mark.parametrize("sample", SAMPLES)
+def test_compact_is_one_line(sample):
+    encoded = response_encoding.encode(sample, "compact")
+    assert encoded.endswith(b"\n") and encoded.count(b"\n") == 1
+
+
+def test_compact_without_orjson_matches_json(monkeypatch):
+    monkeypatch.setitem(response_encoding.encoders, "orjson", None)
+    for sample in SAMPLES:
+        assert response_encoding.encode_compact(sample) == json.dumps(sample, separators=(",", ":")).encode("utf-8")
+
+
+def test_unknown_and_missing_encodings(monkeypatch):
+    assert response_encoding.check_encoding("yaml")["error_type"] == "malformed_request: unknown encoding"
+
+    monkeypatch.setitem(response_encoding.encoders, "msgpack", None)
+    assert response_encoding.check_encoding("msgpack")["error_type"] == "DATABASE_msgpack_not_installed"
+
+
+def get_weather(request, *arguments):
+    """
+    :param request: what to send to get_weather.py on standard input
+    :returns: the bytes it writes to standard output
+    """
+
+    finished = subprocess.run([sys.executable, "get_weather.py", *arguments], input=request.encode("utf-8"), cwd=DATA_DIR,
+                              env={**os.environ, "BEACH_DAY_ENCODING": "pretty"}, capture_output=True, timeout=60)
+    assert finished.returncode == 0, finished.stderr
+    return finished.stdout
+
+
+@pytest.mark.parametrize("encoding", ["compact", "msgpack"])
+def test_single_shot_encodings_match_pretty(encoding):
+    request = {"request_type": "get_beach_info_by_id", "beach_id": "WA789392"}
+
+    pretty = json.loads(get_weather(json.dumps(request) + "\n"))
+    encoded = get_weather(json.dumps({**request, "encoding": encoding}) + "\n")
+
+    assert decode(encoded, encoding) == pretty
+
+
+def test_single_shot_errors_use_the_requested_encoding():
+    encoded = get_weather(json.dumps({"request_type": "get_beach_info_by_id", "beach_id": "nope", "encoding": "msgpack"}) + "\n")
+    assert msgpack.unpackb(encoded)["error_type"] == "invalid_beach_id"
+
+
+def test_worker_rejects_msgpack():
+    requests = [
+        {"id": 1, "request_type": "get_beach_info_by_id", "beach_id": "WA789392", "encoding": "msgpack"},
+        {"id": 2, "request_type": "get_beach_info_by_id", "beach_id": "WA789392", "encoding": "pretty"}
+    ]
+    lines = get_weather("".join(json.dumps(r) + "\n" for r in requests), "--worker").decode("utf-8").splitlines()
+
+    assert len(lines) == 2
+    assert json.loads(lines[0])["error_type"] == "malformed_request: unknown encoding"
+
+    # Pretty is written compact in worker mode, so the response stays on one line
+    assert json.loads(lines[1])["code"] == "get_beach_info_by_id"
@@ -0,0 +1,71 @@
+import beach_search
+import beaches
+
+
+def tied_groups(count):
+    """
+    :param count: how many groups to find
+    :returns: list of (lat, lon, rows) for beaches that share a centroid, in file order
+    """
+
+    store = beaches.get_store()
+    lats = store.column("centroid_lat")
+    lons = store.column("centroid_lon")
+
+    groups = {}
+    for row in range(len(store)):
+        if lats[row] == lats[row]:
+            groups.setdefault((lats[row], lons[row]), []).append(row)
+
+    return [(lat, lon, rows) for (lat, lon), rows in groups.items() if len(rows) > 1][:count]
+
+
+def page_one_at_a_time(lat, lon, count):
+    """
+    :returns: the beach ids of the first `count` results, fetched one page of one result at a time
+    """
+
+    order = []
+    cursor = None
+    for i in range(count):
+        page, cursor = beach_search.rank_beach_by_lat_lon(lat, lon, 0, 1, cursor)
+        order.extend(page)
+    return order
+
+
+def test_cursor_pages_keep_tied_beaches(monkeypatch):
+    # Without the cache, every page continues straight from its cursor
+    monkeypatch.setattr(beach_search, "MAX_SEARCH_CACHE", 0)
+
+    store = beaches.get_store()
+    searches = [(48.225, -122.527, [store.row_of("WA789392")])]
+    for lat, lon, rows in tied_groups(32):
+        # Searching from a little way off, so the tied beaches are scored the same but not zero
+        for offset in (0.003, 0.01, 0.02):
+            searches.append((lat + offset, lon + offset, rows))
+
+    for lat, lon, rows in searches:
+        full, cursor = beach_search.rank_beach_by_lat_lon(lat, lon, 0, 50)
+        ids = [store.beach_id(row) for row in rows]
+        if not all(beach_id in full for beach_id in ids):
+            continue
+
+        count = max(full.index(beach_id) for beach_id in ids) + 2
+        assert page_one_at_a_time(lat, lon, count) == full[:count]
+
+
+def test_cursor_carries_over_to_deep_pages(monkeypatch):
+    monkeypatch.setattr(beach_search, "MAX_SEARCH_CACHE", 0)
+
+    for lat, lon, rows in [(48.225, -122.527, [])] + tied_groups(4):
+        full, cursor = beach_search.rank_beach_by_lat_lon(lat, lon, 0, 80)
+
+        # The first page comes from the spatial index, and the second is deep enough for the distance kernel
+        first, cursor = beach_search.rank_beach_by_lat_lon(lat, lon, 0, 5, None)
+        second, cursor = beach_search.rank_beach_by_lat_lon(lat, lon, 0, beach_search.MAX_INDEXED_RESULTS + 10, cursor)
+        assert first + second == full[:len(first) + len(second)]
+
+        # And the other way around
+        first, cursor = beach_search.rank_beach_by_lat_lon(lat, lon, 0, beach_search.MAX_INDEXED_RESULTS + 10, None)
+        second, cursor = beach_search.rank_beach_by_lat_lon(lat, lon, 0, 5, cursor)
+        assert first + second == full[:len(first) + len(second)]
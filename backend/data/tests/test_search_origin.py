@@ -0,0 +1,103 @@
+import base64
+import json
+
+import pytest
+
+import beach_search
+import beaches
+import distance_kernel
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    beach_search.clear_search_cache()
+    yield
+    beach_search.clear_search_cache()
+
+
+def exact_ranking(lat, lon, count):
+    store = beaches.get_store()
+    return [store.beach_id(row) for score, row in distance_kernel.nearest(store.centroids(), lat, lon, count)]
+
+
+def read_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+
+
+def nudged_points():
+    """
+    Points a few tens of meters off the first beaches in the store, where rounding the point to 3 decimal
+    places is enough to reorder the nearest beaches
+    """
+
+    store = beaches.get_store()
+    lats = store.column("centroid_lat")
+    lons = store.column("centroid_lon")
+    for row in range(0, 4000, 40):
+        if lats[row] == lats[row]:
+            for nudge in (0.00041, -0.00046):
+                yield (float(lats[row]) + nudge, float(lons[row]) - nudge)
+
+
+def test_ranks_from_the_exact_point():
+    reordered = 0
+    for lat, lon in nudged_points():
+        beach_search.clear_search_cache()
+        page, cursor = beach_search.rank_beach_by_lat_lon(lat, lon, 0, 10)
+
+        assert page == exact_ranking(lat, lon, 10)
+        if page != exact_ranking(round(lat, 3), round(lon, 3), 10):
+            reordered += 1
+
+    # Otherwise the points above don't show anything
+    assert reordered > 0
+
+
+def test_cursor_records_the_point():
+    page, cursor = beach_search.rank_beach_by_lat_lon(36.95712, -122.01843, 0, 5)
+    kind, score, beach_id, origin = read_cursor(cursor)
+
+    assert (kind, beach_id) == ("lat_lon", page[-1])
+    assert origin == [36.95712, -122.01843]
+
+
+def test_nearby_point_continues_the_cursor():
+    page, cursor = beach_search.rank_beach_by_lat_lon(36.95712, -122.01843, 0, 5)
+    beach_search.clear_search_cache()
+
+    # Rounds to the same point, so the cursor is accepted and the ranking it came from is continued
+    more, _ = beach_search.rank_beach_by_lat_lon(36.95738, -122.01809, 0, 5, cursor)
+
+    assert page + more == exact_ranking(36.95712, -122.01843, 10)
+
+
+@pytest.mark.parametrize("lat, lon", [(36.9581, -122.0184), (21.2766, -157.8268), (-14.2756, -170.7020)])
+def test_cursor_from_another_point_is_rejected(capsys, lat, lon):
+    page, cursor = beach_search.rank_beach_by_lat_lon(36.95712, -122.01843, 0, 5)
+
+    with pytest.raises(SystemExit):
+        beach_search.rank_beach_by_lat_lon(lat, lon, 0, 5, cursor)
+    assert json.loads(capsys.readouterr().out)["error_type"] == "malformed_request: cursor is not valid for this search"
+
+
+def test_cursor_from_another_county_is_rejected(capsys):
+    page, cursor = beach_search.rank_beach_by_county_state("Santa Cruz", "CA", 0, 5)
+    beach_search.rank_beach_by_county_state("Santa Cruz", "CA", 0, 5, cursor)
+
+    with pytest.raises(SystemExit):
+        beach_search.rank_beach_by_county_state("Monterey", "CA", 0, 5, cursor)
+    assert json.loads(capsys.readouterr().out)["error_type"] == "malformed_request: cursor is not valid for this search"
+
+
+@pytest.mark.parametrize("payload", [
+    ["lat_lon", 0.001, "CA202251"],
+    ["lat_lon", 0.001, "CA202251", [36.95712]],
+    ["lat_lon", 0.001, "CA202251", ["36.95712", "-122.01843"]],
+    ["lat_lon", 0.001, "CA202251", {"lat": 36.95712, "lon": -122.01843}]
+])
+def test_cursor_without_a_usable_point_is_rejected(capsys, payload):
+    cursor = base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+    with pytest.raises(SystemExit):
+        beach_search.rank_beach_by_lat_lon(36.95712, -122.01843, 0, 5, cursor)
+    assert json.loads(capsys.readouterr().out)["error_type"] == "malformed_request: cursor is not valid for this search"
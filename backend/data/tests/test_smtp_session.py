@@ -0,0 +1,111 @@
+import smtplib
+
+import pytest
+
+import events
+
+
+class FakeSMTP:
+    """
+    Stand-in for smtplib.SMTP_SSL that records what happens to each session
+    """
+
+    sessions = []
+    login_failures = 0
+    send_failures = 0
+
+    def __init__(self, host, port, timeout=None):
+        self.host = host
+        self.timeout = timeout
+        self.logged_in = False
+        self.closed = False
+        self.sent = []
+        FakeSMTP.sessions.append(self)
+
+    def login(self, user, password):
+        if FakeSMTP.login_failures > 0:
+            FakeSMTP.login_failures -= 1
+            raise smtplib.SMTPAuthenticationError(454, b"4.7.0 Too many login attempts")
+        self.logged_in = True
+
+    def sendmail(self, from_address, to_address, message):
+        if not self.logged_in:
+            raise smtplib.SMTPSenderRefused(530, b"5.7.0 Authentication Required", from_address)
+        if FakeSMTP.send_failures > 0:
+            FakeSMTP.send_failures -= 1
+            raise smtplib.SMTPDataError(451, b"4.3.0 Temporary failure")
+        self.sent.append(to_address)
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch):
+    FakeSMTP.sessions = []
+    FakeSMTP.login_failures = 0
+    FakeSMTP.send_failures = 0
+    monkeypatch.setattr(smtplib, "SMTP_SSL", FakeSMTP)
+    monkeypatch.setattr(events, "SMTP_HOST", "")
+    monkeypatch.setattr(events, "email_credentials", ("noreply@example.com", "app password"))
+    monkeypatch.setattr(events, "smtp_session", None)
+    return FakeSMTP
+
+
+def test_failed_login_is_not_kept(fake_smtp):
+    fake_smtp.login_failures = 1
+
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        events.get_smtp_session()
+    assert events.smtp_session is None
+    assert fake_smtp.sessions[0].closed
+
+    assert events.get_smtp_session().logged_in
+
+
+def test_rejected_login_is_not_retried(fake_smtp):
+    fake_smtp.login_failures = 1
+
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        events.send_email("a@example.com", "Subject", "<p>Body</p>")
+    assert len(fake_smtp.sessions) == 1
+
+    # The next message gets a fresh login
+    events.send_email("b@example.com", "Subject", "<p>Body</p>")
+    assert len(fake_smtp.sessions) == 2
+    assert fake_smtp.sessions[1].sent == ["b@example.com"]
+
+
+def test_rejected_login_still_notifies_in_app(fake_smtp):
+    fake_smtp.login_failures = 5
+
+    result = events.notify(["Rip Current Statement"], "Swim", "a@example.com")
+
+    assert result["action"] == "notify"
+    assert len(fake_smtp.sessions) == 1
+
+
+@pytest.mark.parametrize("host, constructor", [("", "SMTP_SSL"), ("localhost", "SMTP")])
+def test_sessions_time_out(fake_smtp, monkeypatch, host, constructor):
+    monkeypatch.setattr(smtplib, constructor, FakeSMTP)
+    monkeypatch.setattr(events, "SMTP_HOST", host)
+    monkeypatch.setattr(events, "SMTP_TIMEOUT", 2.5)
+
+    session = events.get_smtp_session()
+
+    assert session.timeout == 2.5
+    assert session.host == (host or "smtp.gmail.com")
+
+
+def test_send_reconnects_after_smtp_error(fake_smtp):
+    events.send_email("a@example.com", "Subject", "<p>Body</p>")
+    fake_smtp.send_failures = 1
+    events.send_email("b@example.com", "Subject", "<p>Body</p>")
+
+    assert len(fake_smtp.sessions) == 2
+    assert fake_smtp.sessions[0].closed
+    assert fake_smtp.sessions[1].sent == ["b@example.com"]
+    assert events.smtp_session is fake_smtp.sessions[1]
@@ -0,0 +1,81 @@
+import math
+import random
+
+import pytest
+
+import beaches
+import spatial_index
+
+
+def scan(xs, ys, zs, lat, lon, count, after=None):
+    """
+    Score every point, the way the spatial index is meant to rank them
+    """
+
+    qx, qy, qz = spatial_index.unit_vector(lat, lon)
+    scored = []
+    for row in range(len(xs)):
+        if xs[row] != xs[row]:
+            continue
+        d = math.sqrt((xs[row] - qx) ** 2 + (ys[row] - qy) ** 2 + (zs[row] - qz) ** 2)
+        if after is None or (d, row) > after:
+            scored.append((d, row))
+    return sorted(scored)[:count]
+
+
+def columns(points):
+    """
+    :param points: list of (lat, lon), or None for a point without a centroid
+    :returns: x, y and z columns
+    """
+
+    vectors = [spatial_index.unit_vector(*point) if point is not None else (math.nan,) * 3 for point in points]
+    return tuple(list(axis) for axis in zip(*vectors))
+
+
+SMALL_SETS = {
+    "one point": [(47.6, -122.3)],
+    "duplicates": [(21.3, -157.8)] * 5 + [(21.31, -157.8)],
+    "missing centroids": [None, (40.0, -74.0), None, (40.1, -74.1), None],
+    "antimeridian": [(52.0, 179.99), (52.0, -179.99), (52.0, 179.0), (51.9, -179.5)],
+    "poles": [(89.999, 0.0), (89.999, 90.0), (89.999, 180.0), (-89.999, 45.0), (0.0, 0.0)]
+}
+
+
+@pytest.mark.parametrize("name", sorted(SMALL_SETS))
+def test_matches_a_full_scan_on_small_sets(name):
+    xs, ys, zs = columns(SMALL_SETS[name])
+    tree = spatial_index.build_kd_tree(xs, ys, zs)
+
+    for lat, lon in [(47.6, -122.3), (52.0, 180.0), (90.0, 0.0), (-33.9, 151.2), (0.0, -179.9)]:
+        for count in (1, 2, len(xs) + 1):
+            assert spatial_index.nearest(tree, xs, ys, zs, lat, lon, count) == scan(xs, ys, zs, lat, lon, count)
+
+
+def test_matches_a_full_scan_on_random_points():
+    generator = random.Random(2024)
+    points = [(generator.uniform(-90, 90), generator.uniform(-180, 180)) for _ in range(700)]
+
+    # Some points share a centroid, like beaches measured from the same spot
+    points += points[:40]
+    xs, ys, zs = columns(points)
+    tree = spatial_index.build_kd_tree(xs, ys, zs)
+
+    for _ in range(60):
+        lat, lon = generator.uniform(-90, 90), generator.uniform(-180, 180)
+        full = scan(xs, ys, zs, lat, lon, 30)
+        assert spatial_index.nearest(tree, xs, ys, zs, lat, lon, 30) == full
+
+        # Continuing after any result gives the rest of the same ranking
+        assert spatial_index.nearest(tree, xs, ys, zs, lat, lon, 10, after=full[12]) == full[13:23]
+
+
+def test_store_index_matches_a_full_scan():
+    store = beaches.get_store()
+    xs = store.column("unit_x")
+    ys = store.column("unit_y")
+    zs = store.column("unit_z")
+
+    # Near the coasts, in the middle of the country, and far from any beach
+    for lat, lon in [(41.49, -71.31), (25.76, -80.19), (61.22, -149.9), (39.1, -94.6), (-45.0, 60.0), (13.44, 144.79)]:
+        assert store.nearest(lat, lon, 25) == scan(xs, ys, zs, lat, lon, 25)
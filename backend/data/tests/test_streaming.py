@@ -0,0 +1,113 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import standin
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BATCH_IDS = ["WA789392", "FL001972", "HI003791", "WA789392", "CA202251"]
+
+
+@pytest.fixture(scope="module")
+def environment(tmp_path_factory):
+    """
+    Environment for get_weather.py with the NWS and the UV bulletin answered by a made-up stand-in, and its
+    own disk cache, so repeated requests see the same weather
+    """
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), standin.make_handler(standin.Faults(), str(tmp_path_factory.mktemp("recordings")), False, False))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    url = f"http://127.0.0.1:{server.server_port}"
+    yield {
+        **os.environ,
+        "BEACH_DAY_NWS_URL": url,
+        "BEACH_DAY_CPC_URL": url,
+        "BEACH_DAY_CACHE_PATH": str(tmp_path_factory.mktemp("cache") / "cache.sqlite3"),
+        "BEACH_DAY_ENCODING": "pretty"
+    }
+
+    server.shutdown()
+    server.server_close()
+
+
+def run(environment, request, *arguments):
+    """
+    :returns: everything get_weather.py writes to standard output for one request
+    """
+
+    finished = subprocess.run([sys.executable, "get_weather.py", *arguments], input=json.dumps(request) + "\n", cwd=DATA_DIR,
+                              env=environment, capture_output=True, text=True, timeout=60)
+    assert finished.returncode == 0, finished.stderr
+    return finished.stdout
+
+
+def stream(environment, request):
+    """
+    :returns: (result lines, trailer) of a streamed request
+    """
+
+    lines = [json.loads(line) for line in run(environment, {**request, "stream": True}).splitlines()]
+    assert all(not "code" in line for line in lines[:-1])
+    return lines[:-1], lines[-1]
+
+
+@pytest.mark.parametrize("request_type, parameters", [
+    ("search_beach_by_lat_lon_no_weather", {"latitude": "47.6", "longitude": "-122.4"}),
+    ("search_beach_by_county_state_no_weather", {"county": "Honolulu", "state": "HI"}),
+    ("search_beach_by_lat_lon", {"latitude": "25.76", "longitude": "-80.13"})
+])
+def test_streamed_search_matches_the_whole_response(environment, request_type, parameters):
+    request = {"request_type": request_type, "start": "0", "stop": "6", **parameters}
+
+    whole = json.loads(run(environment, request))
+    results, trailer = stream(environment, request)
+
+    assert trailer == {"order": whole["order"], "cursor": whole["cursor"], "code": whole["code"]}
+    assert sorted(line["beach_id"] for line in results) == sorted(whole["order"])
+    for line in results:
+        assert line["result"] == whole["result"][line["beach_id"]]
+
+
+def test_streamed_batch_matches_the_whole_response(environment):
+    request = {"request_type": "get_beach_info_weather_by_id_batch", "beach_ids": ", ".join(BATCH_IDS)}
+
+    whole = json.loads(run(environment, request))
+    results, trailer = stream(environment, request)
+
+    # Repeated ids are only streamed once, and the trailer keeps request order
+    assert trailer == {"order": list(dict.fromkeys(BATCH_IDS)), "code": "get_beach_info_weather_by_id_batch"}
+    assert len(results) == 4
+    for line in results:
+        assert line["result"] == whole[line["beach_id"]]
+
+
+def test_stream_that_fails_first_is_just_the_error(environment):
+    output = run(environment, {"request_type": "search_beach_by_county_state_no_weather", "county": "Honolulu", "state": "XX",
+                               "start": "0", "stop": "5", "stream": True})
+
+    lines = output.splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["error_type"] == "invalid_state_in_search"
+
+
+def test_worker_stream_lines_carry_the_id(environment):
+    requests = [
+        {"id": "first", "request_type": "search_beach_by_lat_lon_no_weather", "latitude": "21.3", "longitude": "-157.8",
+         "start": "0", "stop": "3", "stream": True},
+        {"id": "second", "request_type": "search_cache_stats"}
+    ]
+    finished = subprocess.run([sys.executable, "get_weather.py", "--worker"], input="".join(json.dumps(r) + "\n" for r in requests),
+                              cwd=DATA_DIR, env=environment, capture_output=True, text=True, timeout=60)
+    lines = [json.loads(line) for line in finished.stdout.splitlines()]
+
+    assert [line["id"] for line in lines] == ["first"] * 4 + ["second"]
+    assert [line.get("code") for line in lines] == [None, None, None, "search_beach_by_lat_lon", "search_cache_stats"]
+    assert [line["beach_id"] for line in lines[:3]] == lines[3]["order"]
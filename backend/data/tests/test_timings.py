@@ -0,0 +1,122 @@
+import builtins
+import json
+import sys
+import time
+
+import pytest
+
+import get_weather
+import response_encoding
+import timings
+
+
+@pytest.fixture(autouse=True)
+def timings_off():
+    # Nothing left over from another test, and nothing left behind for the next one
+    timings.finish()
+    yield
+    timings.finish()
+
+
+def names(spans):
+    return [span["name"] for span in spans]
+
+
+def test_nothing_is_recorded_when_timings_are_off():
+    with timings.span("rank"):
+        timings.lap("validate")
+        timings.upstream_call("api.weather.gov/points", 0.2)
+
+    assert timings.current() is None
+    assert timings.finish() is None
+    assert builtins.__import__ is timings.real_import
+
+
+def test_spans_nest_in_the_order_they_ran():
+    timings.start()
+    with timings.span("handle search"):
+        time.sleep(0.002)
+        timings.lap("validate")
+        with timings.span("rank"):
+            with timings.span("load store"):
+                pass
+        with timings.span("beach info"):
+            pass
+    with timings.span("serialize"):
+        pass
+    report = timings.finish()
+
+    assert names(report["spans"]) == ["handle search", "serialize"]
+    handle = report["spans"][0]
+    assert names(handle["children"]) == ["validate", "rank", "beach info"]
+    assert names(handle["children"][1]["children"]) == ["load store"]
+
+    # validate covers the time since the handle span started
+    assert handle["children"][0]["at_ms"] == handle["at_ms"]
+    assert handle["children"][0]["ms"] >= 2
+
+    starts = [span["at_ms"] for span in handle["children"]]
+    assert starts == sorted(starts)
+    assert report["total_ms"] >= handle["ms"]
+
+
+def test_upstream_calls_are_tallied_by_kind():
+    timings.start()
+    with timings.span("weather"):
+        for seconds in (0.010, 0.030, 0.020):
+            timings.upstream_call("api.weather.gov/gridpoints", seconds)
+        timings.upstream_call("www.cpc.ncep.noaa.gov/products", 0.005)
+    report = timings.finish()
+
+    assert report["upstream"] == {
+        "api.weather.gov/gridpoints": {"count": 3, "total_ms": 60.0, "max_ms": 30.0},
+        "www.cpc.ncep.noaa.gov/products": {"count": 1, "total_ms": 5.0, "max_ms": 5.0}
+    }
+    assert names(report["spans"][0]["children"]) == ["upstream api.weather.gov/gridpoints"] * 3 + ["upstream www.cpc.ncep.noaa.gov/products"]
+
+
+def test_first_imports_are_timed_and_the_hook_is_removed(tmp_path, monkeypatch):
+    (tmp_path / "timed_module_inner.py").write_text("VALUE = 1\n")
+    (tmp_path / "timed_module_outer.py").write_text("import timed_module_inner\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    timings.start()
+    assert builtins.__import__ is timings.timed_import
+    with timings.span("handle"):
+        import timed_module_outer
+        import timed_module_outer
+        import json
+    report = timings.finish()
+
+    assert builtins.__import__ is timings.real_import
+    monkeypatch.delitem(sys.modules, "timed_module_outer")
+    monkeypatch.delitem(sys.modules, "timed_module_inner")
+
+    # The inner module counts as part of the one that imported it, and modules already loaded aren't timed
+    children = report["spans"][0]["children"]
+    assert names(children) == ["import timed_module_outer"]
+    assert not "children" in children[0]
+
+
+def test_requested_timings_are_added_to_the_response():
+    request = {"request_type": "get_beach_info_by_id", "beach_id": "HI003791", "timings": True}
+    encoded = get_weather.respond(get_weather.handle_request_captured, request, None,
+                                  lambda result: response_encoding.encode(result, "compact"), startup=0.0125)
+    response = json.loads(encoded)
+
+    assert response["code"] == "get_beach_info_by_id"
+    assert names(response["timings"]["spans"]) == ["handle get_beach_info_by_id", "serialize"]
+    assert response["timings"]["startup_ms"] == 12.5
+    assert response["timings"]["upstream"] == {}
+
+
+def test_logged_timings_go_to_standard_error(monkeypatch, capsys):
+    monkeypatch.setattr(timings, "LOG_TIMINGS", True)
+    request = {"request_type": "get_beach_info_by_id", "beach_id": "HI003791"}
+    encoded = get_weather.respond(get_weather.handle_request_captured, request, None,
+                                  lambda result: response_encoding.encode(result, "compact"))
+
+    assert not "timings" in json.loads(encoded)
+    logged = json.loads(capsys.readouterr().err.strip().splitlines()[-1])
+    assert logged["request_type"] == "get_beach_info_by_id"
+    assert names(logged["spans"]) == ["handle get_beach_info_by_id", "serialize"]
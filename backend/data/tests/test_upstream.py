@@ -0,0 +1,169 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+import standin
+import upstream
+
+
+class ScriptedSession:
+    """
+    Stand-in for the shared requests session that answers from a script. Each step is a status code or
+    an exception to raise
+    """
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        step = self.steps.pop(0)
+        if isinstance(step, Exception):
+            raise step
+
+        status, headers = step if isinstance(step, tuple) else (step, {})
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = b"{}"
+        return response
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """
+    Installs a ScriptedSession built from the steps it is called with, and records the backoff sleeps
+    """
+
+    sleeps = []
+    monkeypatch.setattr(upstream.time, "sleep", sleeps.append)
+    monkeypatch.setattr(upstream, "RETRIES", 3)
+
+    def install(*steps):
+        scripted = ScriptedSession(*steps)
+        scripted.sleeps = sleeps
+        monkeypatch.setattr(upstream, "get_session", lambda: scripted)
+        return scripted
+
+    return install
+
+
+def test_base_urls_follow_the_configuration(monkeypatch):
+    monkeypatch.setattr(upstream, "NWS_URL", "http://localhost:8330")
+    monkeypatch.setattr(upstream, "CPC_URL", "http://127.0.0.1:9000")
+
+    assert upstream.base_url("api.weather.gov") == "http://localhost:8330"
+    assert upstream.base_url("www.cpc.ncep.noaa.gov") == "http://127.0.0.1:9000"
+    assert upstream.base_url("nominatim.openstreetmap.org") == "https://nominatim.openstreetmap.org"
+    assert upstream.nws_url("/alerts/active?zone=FLZ160") == "http://localhost:8330/alerts/active?zone=FLZ160"
+
+
+@pytest.mark.parametrize("steps, attempts", [
+    ((503, 200), 2),
+    ((500, 502, 504, 200), 4),
+    ((requests.ConnectionError("reset"), requests.Timeout("slow"), 200), 3)
+])
+def test_failures_are_retried_until_one_succeeds(session, steps, attempts):
+    scripted = session(*steps)
+
+    assert upstream.get("https://api.weather.gov/points/1,2").status_code == 200
+    assert len(scripted.urls) == attempts
+    assert len(scripted.sleeps) == attempts - 1
+
+
+def test_backoff_doubles_up_to_the_limit(session, monkeypatch):
+    monkeypatch.setattr(upstream, "BACKOFF", 1.0)
+    monkeypatch.setattr(upstream, "BACKOFF_MAX", 3.0)
+    monkeypatch.setattr(upstream.random, "uniform", lambda low, high: high)
+    scripted = session(503, 503, 503, 200)
+
+    upstream.get("https://api.weather.gov/points/1,2")
+    assert scripted.sleeps == [1.0, 2.0, 3.0]
+
+
+def test_retry_after_is_honoured(session):
+    scripted = session((429, {"Retry-After": "2"}), (429, {"Retry-After": "120"}), 200)
+
+    upstream.get("https://api.weather.gov/alerts/active")
+    assert scripted.sleeps == [2.0, upstream.BACKOFF_MAX]
+
+
+@pytest.mark.parametrize("status", [200, 301, 400, 404])
+def test_other_statuses_are_not_retried(session, status):
+    scripted = session(status, 200)
+
+    assert upstream.get("https://api.weather.gov/zones").status_code == status
+    assert len(scripted.urls) == 1
+
+
+def test_last_error_is_kept_when_every_attempt_fails(session):
+    session(503, 503, 503, 503)
+    assert upstream.get("https://api.weather.gov/zones").status_code == 503
+
+    session(*(requests.ConnectionError(f"attempt {n}") for n in range(1, 5)))
+    with pytest.raises(requests.ConnectionError, match="attempt 4"):
+        upstream.get("https://api.weather.gov/zones")
+
+
+def test_sdk_requests_fail_loudly(session):
+    session(404)
+    with pytest.raises(Exception, match="status 404"):
+        upstream.sdk_get("api.weather.gov", "/points/1,2", {})
+
+
+@pytest.fixture
+def serve(monkeypatch, tmp_path):
+    """
+    Runs stand-ins with the given Faults, pointing the NWS base URL at the last one started
+    """
+
+    servers = []
+
+    def start(faults, synthetic=True):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), standin.make_handler(faults, str(tmp_path), False, False, synthetic))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setattr(upstream, "NWS_URL", f"http://127.0.0.1:{server.server_port}")
+        monkeypatch.setattr(upstream, "session", None)
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_client_follows_links_to_the_standin(serve):
+    serve(standin.Faults())
+    client = upstream.Client()
+
+    point = client.points("25.79,-80.13")
+    assert point["properties"]["gridId"] == "STI"
+
+    # The forecast link names the real host, and is sent to the stand-in too
+    forecast = client.points_forecast(25.79, -80.13, type="forecast")
+    assert len(forecast["properties"]["periods"]) == standin.FORECAST_PERIODS
+
+
+def test_standin_faults_reach_the_caller(serve, monkeypatch):
+    monkeypatch.setattr(upstream, "RETRIES", 0)
+
+    serve(standin.Faults(throttle_rate=1.0))
+    response = upstream.get(upstream.nws_url("/points/25.79,-80.13"))
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+    serve(standin.Faults(error_rate=1.0, seed=3))
+    assert upstream.get(upstream.nws_url("/points/25.79,-80.13")).status_code in (500, 503)
+
+
+def test_recorded_only_standin_makes_nothing_up(serve):
+    serve(standin.Faults(), synthetic=False)
+    response = upstream.get(upstream.nws_url("/points/25.79,-80.13"))
+
+    assert response.status_code == 404
+    assert response.json()["title"] == "Not Found"
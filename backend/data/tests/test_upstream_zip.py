@@ -0,0 +1,93 @@
+import json
+
+import requests
+
+import basic_weather
+import upstream
+
+FORECAST = {
+    "properties": {
+        "periods": [{
+            "startTime": "2026-06-01T12:00:00-04:00",
+            "endTime": "2026-06-01T13:00:00-04:00",
+            "isDaytime": True,
+            "temperature": 78,
+            "temperatureUnit": "F",
+            "probabilityOfPrecipitation": {"value": 10},
+            "relativeHumidity": {"value": 60},
+            "windSpeed": "5 mph",
+            "windDirection": "SW",
+            "shortForecast": "Sunny"
+        }]
+    }
+}
+
+
+def response(status, body):
+    """
+    :returns: a requests.Response with the status and JSON body
+    """
+
+    result = requests.Response()
+    result.status_code = status
+    result._content = json.dumps(body).encode("utf-8")
+    return result
+
+
+class FakeSession:
+    """
+    Stand-in for the shared session that answers the geocoder and NWS requests of a zip code lookup
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        if "/search?" in url:
+            return response(200, [{"lat": "26.7153", "lon": "-80.0534"}])
+        if "/points/" in url:
+            return response(200, {"properties": {"forecastHourly": "https://api.weather.gov/gridpoints/MFL/112,70/forecast/hourly"}})
+        if "/gridpoints/" in url:
+            return response(200, FORECAST)
+        return response(404, {})
+
+
+def test_zip_code_lookup_goes_through_shared_session(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(upstream, "session", session)
+    monkeypatch.setattr(basic_weather, "N", None)
+
+    def bare_get(*args, **kwargs):
+        raise AssertionError("requests.get was called directly")
+
+    monkeypatch.setattr(requests, "get", bare_get)
+
+    weather = basic_weather.get_basic_weather_zip("33401", "us")
+
+    assert weather["temperature"] == 78
+    assert weather["forecastSummary"] == "Sunny"
+
+    urls = [url for url, kwargs in session.calls]
+    assert urls[0].startswith("https://nominatim.openstreetmap.org/search?postalcode=33401")
+    assert urls[1] == upstream.nws_url("/points/26.7153,-80.0534")
+    for url, kwargs in session.calls:
+        assert kwargs["timeout"] == (upstream.CONNECT_TIMEOUT, upstream.READ_TIMEOUT)
+
+
+def test_zip_code_lookup_failure_raises_without_sdk_retries(monkeypatch, capsys):
+    session = FakeSession()
+    session.get = lambda url, **kwargs: session.calls.append(url) or response(404, {})
+    monkeypatch.setattr(upstream, "session", session)
+    monkeypatch.setattr(basic_weather, "N", None)
+
+    try:
+        basic_weather.get_basic_weather_zip("00000", "us")
+    except Exception as e:
+        assert "status 404" in str(e)
+    else:
+        raise AssertionError("the lookup should have failed")
+
+    # A 404 isn't retried, and nothing is printed into the response stream
+    assert len(session.calls) == 1
+    assert capsys.readouterr().out == ""
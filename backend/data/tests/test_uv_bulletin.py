@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+import requests
+
+import basic_weather
+import disk_cache
+import upstream
+
+BULLETIN = """UV INDEX FORECAST
+   CITY         STATE  UVI      CITY         STATE  UVI
+ALBUQUERQUE      NM     9       LAS VEGAS     NV    10
+"""
+
+
+def response(status, text):
+    """
+    :returns: a requests.Response with the status and body
+    """
+
+    result = requests.Response()
+    result.status_code = status
+    result._content = text.encode("utf-8")
+    return result
+
+
+@pytest.fixture
+def fresh_bulletin(monkeypatch, tmp_path):
+    # An empty disk cache, and nothing fetched yet in this process
+    monkeypatch.setattr(disk_cache, "cache_path", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(disk_cache, "connections", threading.local())
+    monkeypatch.setattr(basic_weather, "uv_bulletin", {"day": None, "uvmap": None, "retry": None})
+
+
+def test_failed_bulletin_is_not_cached(monkeypatch, fresh_bulletin):
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        return response(503, "Service Unavailable")
+
+    monkeypatch.setattr(upstream, "get", get)
+
+    assert basic_weather.get_uv_bulletin() == {}
+    assert basic_weather.uv_bulletin["retry"] is not None
+    assert disk_cache.get("uv_bulletin", basic_weather.uv_bulletin["day"]) is None
+
+    # Within the retry window the failure is remembered
+    assert basic_weather.get_uv_bulletin() == {}
+    assert len(calls) == 1
+
+    # After it, the bulletin is tried again
+    monkeypatch.setattr(upstream, "get", lambda url, **kwargs: response(200, BULLETIN))
+    basic_weather.uv_bulletin["retry"] = 0
+    assert basic_weather.get_uv_bulletin() == {"ALBUQUERQUE NM": 9, "LAS VEGAS NV": 10}
+    assert basic_weather.uv_bulletin["retry"] is None
+    assert disk_cache.get("uv_bulletin", basic_weather.uv_bulletin["day"]) == {"ALBUQUERQUE NM": 9, "LAS VEGAS NV": 10}
+
+
+def test_unreachable_bulletin_is_not_cached(monkeypatch, fresh_bulletin):
+    def get(url, **kwargs):
+        raise requests.ConnectionError(url)
+
+    monkeypatch.setattr(upstream, "get", get)
+
+    assert basic_weather.get_uv_bulletin() == {}
+    assert disk_cache.get("uv_bulletin", basic_weather.uv_bulletin["day"]) is None
+
+
+def test_empty_bulletin_is_not_cached(monkeypatch, fresh_bulletin):
+    monkeypatch.setattr(upstream, "get", lambda url, **kwargs: response(200, "<html>Down for maintenance</html>"))
+
+    assert basic_weather.get_uv_bulletin() == {}
+    assert disk_cache.get("uv_bulletin", basic_weather.uv_bulletin["day"]) is None
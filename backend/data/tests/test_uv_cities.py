@@ -0,0 +1,68 @@
+import math
+import random
+
+import pytest
+
+import basic_weather
+import beaches
+import uv_cities
+
+
+def haversine_closest(lat, lon):
+    """
+    Closest bulletin city, one city at a time in plain Python. Ties go to the city listed first
+    """
+
+    best = None
+    for name, (city_lat, city_lon) in uv_cities.UV_CITIES.items():
+        phi1, phi2 = math.radians(lat), math.radians(city_lat)
+        a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(city_lon - lon) / 2) ** 2
+        if best is None or a < best[0]:
+            best = (a, name)
+    return best[1]
+
+
+def test_every_beach_stores_its_closest_city():
+    store = beaches.get_store()
+    lats = store.column("centroid_lat")
+    lons = store.column("centroid_lon")
+
+    for row in range(len(store)):
+        if lats[row] != lats[row]:
+            assert store.uv_city(row) == ""
+        else:
+            assert store.uv_city(row) == uv_cities.closest_uv_city(lats[row], lons[row])
+
+
+def test_closest_city_matches_a_scalar_search():
+    generator = random.Random(7)
+
+    # Across the US and its territories, including the far side of the antimeridian
+    points = [(generator.uniform(13, 71), generator.uniform(-180, -64)) for _ in range(400)]
+    points += [(51.88, 179.6), (13.44, 144.79), (-14.27, -170.7)]
+
+    for lat, lon in points:
+        assert uv_cities.closest_uv_city(lat, lon) == haversine_closest(lat, lon)
+
+
+@pytest.mark.parametrize("name", uv_cities.CITY_NAMES)
+def test_each_city_is_closest_to_itself(name):
+    assert uv_cities.closest_uv_city(*uv_cities.UV_CITIES[name]) == name
+
+
+@pytest.mark.parametrize("lat, lon", [(math.nan, -80.0), (25.0, math.nan), ("nan", "nan")])
+def test_missing_points_have_no_city(lat, lon):
+    assert uv_cities.closest_uv_city(lat, lon) == ""
+
+
+def test_beach_weather_uses_the_stored_city(monkeypatch):
+    monkeypatch.setattr(basic_weather, "get_uv_bulletin", lambda: {"SEATTLE WA": 6, "PORTLAND OR": 7})
+
+    def search(lat, lon):
+        raise AssertionError("the stored city should be used")
+
+    monkeypatch.setattr(basic_weather, "get_closest_uv_city", search)
+
+    city = beaches.get_uv_city("WA789392")
+    assert city == "SEATTLE WA"
+    assert basic_weather.get_uv_index(48.22, -122.68, city) == 6
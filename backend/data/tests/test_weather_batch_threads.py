@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import basic_weather
+import timings
+
+# Location 1 hangs until released, everything else answers straight away
+LOCATIONS = [
+    (47.9, -124.6, "SEATTLE", ("SEW", 1, 1)),
+    (21.3, -157.8, "HONOLULU", ("HFO", 2, 2)),
+    (25.8, -80.1, "MIAMI", ("MFL", 3, 3))
+]
+
+
+@pytest.fixture
+def hung_lookup(monkeypatch):
+    release = threading.Event()
+    returned = threading.Event()
+
+    def lookup(lat, lon, uv_city, gridpoint):
+        timings.upstream_call("test/points", 0.001)
+        if uv_city == "HONOLULU":
+            release.wait(10)
+            with timings.span("late work"):
+                timings.upstream_call("test/late", 0.001)
+            returned.set()
+        return {"city": uv_city}
+
+    monkeypatch.setattr(basic_weather, "get_basic_weather_latlon", lookup)
+    monkeypatch.setattr(basic_weather, "WEATHER_TIMEOUT", 0.3)
+    yield release, returned
+    release.set()
+
+
+def test_hung_lookup_gets_empty_weather_without_waiting(hung_lookup):
+    began = time.monotonic()
+    results = dict(basic_weather.iter_basic_weather_latlon_batch(LOCATIONS))
+
+    assert time.monotonic() - began < 2
+    assert results[0] == {"city": "SEATTLE"}
+    assert results[1] == basic_weather.empty_weather()
+    assert results[2] == {"city": "MIAMI"}
+
+
+def test_late_lookup_records_into_its_own_request(hung_lookup):
+    release, returned = hung_lookup
+
+    timings.start()
+    with timings.span("handle batch"):
+        list(basic_weather.iter_basic_weather_latlon_batch(LOCATIONS))
+    first = timings.finish()
+
+    # The next request starts while the hung lookup is still running, then it finishes
+    timings.start()
+    release.set()
+    assert returned.wait(5)
+    second = timings.finish()
+
+    assert second["spans"] == []
+    assert second["upstream"] == {}
+    assert first["upstream"]["test/points"]["count"] == 3
+
+    handle = first["spans"][0]
+    assert handle["name"] == "handle batch"
+    assert sorted(child["name"] for child in handle["children"]) == ["weather 21.3,-157.8", "weather 25.8,-80.1", "weather 47.9,-124.6"]
+
+
+def test_hung_lookup_does_not_hold_up_exit(tmp_path):
+    script = tmp_path / "hang.py"
+    script.write_text(
+        "import threading, basic_weather\n"
+        "basic_weather.WEATHER_TIMEOUT = 0.2\n"
+        "basic_weather.get_basic_weather_latlon = lambda *location: threading.Event().wait()\n"
+        "print(list(basic_weather.iter_basic_weather_latlon_batch([(1.0, 2.0, 'X', None)])))\n"
+    )
+
+    data_dir = os.path.dirname(os.path.abspath(basic_weather.__file__))
+    finished = subprocess.run([sys.executable, str(script)], cwd=data_dir, env={**os.environ, "PYTHONPATH": data_dir},
+                              capture_output=True, text=True, timeout=10)
+
+    assert finished.returncode == 0, finished.stderr
+    assert finished.stdout.startswith("[(0, ")
@@ -0,0 +1,282 @@
+import builtins
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Opt-in timing breakdown for a request, documented in docs/data_interface.md. Components mark what they
+# are doing with span(), and upstream calls are tallied with upstream_call(). Both do nothing unless the
+# request being handled asked for timings
+
+# Log each request's timings to standard error as one line of JSON
+LOG_TIMINGS = os.environ.get("BEACH_DAY_TIMINGS_LOG", "") not in ("", "0")
+
+# The recorder for the request being handled, or None if timings are off
+active = None
+
+# Threads doing work handed off by a request keep recording into that request's recorder, even if they
+# outlive it and the process has moved on to the next request, see handed_off
+threads = threading.local()
+
+# The real import function. Imports are only timed while a request is being timed
+real_import = builtins.__import__
+
+
+class Span:
+    """
+    One timed step, and the steps that happened inside it
+    """
+
+    __slots__ = ("name", "start", "end", "children")
+
+    def __init__(self, name, start):
+        """
+        :param name: what the step was
+        :param start: time.perf_counter() when it started
+        """
+
+        self.name = name
+        self.start = start
+        self.end = None
+        self.children = []
+
+    def to_dict(self, origin):
+        """
+        :param origin: time.perf_counter() that offsets are measured from
+        :returns: JSON-compatible map with the name, start offset and length of the step in milliseconds,
+            and its children
+        """
+
+        end = self.end if self.end is not None else time.perf_counter()
+        result = {
+            "name": self.name,
+            "at_ms": round((self.start - origin) * 1000, 3),
+            "ms": round((end - self.start) * 1000, 3)
+        }
+        if len(self.children) > 0:
+            result["children"] = [child.to_dict(origin) for child in self.children]
+        return result
+
+
+class Recorder:
+    """
+    The spans and upstream calls for one request. Spans started in other threads go under the span that was
+    current when the work was handed to the thread, or under the request itself
+    """
+
+    def __init__(self):
+        self.root = Span("request", time.perf_counter())
+        self.upstream = {}
+        self.lock = threading.Lock()
+        self.threads = threading.local()
+
+    def stack(self):
+        """
+        :returns: this thread's list of open spans, innermost last
+        """
+
+        stack = getattr(self.threads, "stack", None)
+        if stack is None:
+            stack = []
+            self.threads.stack = stack
+        return stack
+
+    def current(self):
+        """
+        :returns: the innermost open span in this thread, or the request itself
+        """
+
+        stack = self.stack()
+        return stack[-1] if len(stack) > 0 else self.root
+
+    def add(self, parent, span):
+        """
+        :param parent: the span to add to
+        :param span: the span to add
+        """
+
+        with self.lock:
+            parent.children.append(span)
+
+
+def start():
+    """
+    Start timing a request. Modules imported while it is handled are timed as well
+    """
+
+    global active
+
+    active = Recorder()
+    builtins.__import__ = timed_import
+
+
+def finish():
+    """
+    Stop timing the request
+
+    :returns: JSON-compatible map with the total time, the span tree, and the count, total and longest time
+        of each kind of upstream call. Times are in milliseconds
+    """
+
+    global active
+
+    recorder = active
+    active = None
+    builtins.__import__ = real_import
+
+    if recorder is None:
+        return None
+
+    recorder.root.end = time.perf_counter()
+    tree = recorder.root.to_dict(recorder.root.start)
+
+    upstream = {}
+    with recorder.lock:
+        for kind, (count, total, longest) in sorted(recorder.upstream.items()):
+            upstream[kind] = {"count": count, "total_ms": round(total * 1000, 3), "max_ms": round(longest * 1000, 3)}
+
+    return {
+        "total_ms": tree["ms"],
+        "spans": tree.get("children", []),
+        "upstream": upstream
+    }
+
+
+def recording():
+    """
+    :returns: the recorder for the request this thread is working for, or None if timings are off
+    """
+
+    return getattr(threads, "recorder", active)
+
+
+def current():
+    """
+    Get what work handed to another thread should be recorded under, see handed_off
+
+    :returns: (recorder, innermost open span in this thread), or None if timings are off
+    """
+
+    recorder = recording()
+    if recorder is None:
+        return None
+    return (recorder, recorder.current())
+
+
+@contextmanager
+def handed_off(context):
+    """
+    Record the code inside the with block, run in another thread, as part of the request that handed it off.
+    Spans started inside go under the span that was current when it was handed off
+
+    :param context: what current() returned in the thread that handed the work off
+    """
+
+    previous = getattr(threads, "recorder", None)
+    had_previous = hasattr(threads, "recorder")
+
+    if context is None:
+        threads.recorder = None
+        stack = None
+    else:
+        recorder, parent = context
+        threads.recorder = recorder
+        stack = recorder.stack()
+        stack.append(parent)
+
+    try:
+        yield
+    finally:
+        if stack is not None:
+            stack.pop()
+        if had_previous:
+            threads.recorder = previous
+        else:
+            del threads.recorder
+
+
+@contextmanager
+def span(name, parent=None):
+    """
+    Time the code inside the with block as one step of the request
+
+    :param name: what the step is
+    :param parent: span to put it under, from current(). Defaults to the innermost open span in this thread
+    """
+
+    recorder = recording()
+    if recorder is None:
+        yield
+        return
+
+    if parent is None:
+        parent = recorder.current()
+    step = Span(name, time.perf_counter())
+    recorder.add(parent, step)
+
+    stack = recorder.stack()
+    stack.append(step)
+    try:
+        yield
+    finally:
+        step.end = time.perf_counter()
+        stack.pop()
+
+
+def lap(name):
+    """
+    Record everything since the innermost open span started, or since the last step inside it ended, as a
+    step of its own. Used for work that is spread through a function, such as checking the request
+
+    :param name: what the step was
+    """
+
+    recorder = recording()
+    if recorder is None:
+        return
+
+    parent = recorder.current()
+    with recorder.lock:
+        start = parent.start
+        if len(parent.children) > 0 and parent.children[-1].end is not None:
+            start = parent.children[-1].end
+        step = Span(name, start)
+        step.end = time.perf_counter()
+        parent.children.append(step)
+
+
+def upstream_call(kind, seconds):
+    """
+    Tally one call to an upstream service
+
+    :param kind: which endpoint was called, such as "api.weather.gov/points"
+    :param seconds: how long the call took
+    """
+
+    recorder = recording()
+    if recorder is None:
+        return
+
+    parent = recorder.current()
+    step = Span(f"upstream {kind}", time.perf_counter() - seconds)
+    step.end = step.start + seconds
+
+    with recorder.lock:
+        parent.children.append(step)
+        count, total, longest = recorder.upstream.get(kind, (0, 0.0, 0.0))
+        recorder.upstream[kind] = (count + 1, total + seconds, max(longest, seconds))
+
+
+def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """
+    Replacement for __import__ that times modules the first time they are imported. Modules that they import
+    in turn are counted as part of them
+    """
+
+    recorder = recording()
+    if level != 0 or name in sys.modules or recorder is None or recorder.current().name.startswith("import "):
+        return real_import(name, globals, locals, fromlist, level)
+
+    with span(f"import {name}"):
+        return real_import(name, globals, locals, fromlist, level)
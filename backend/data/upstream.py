@@ -0,0 +1,214 @@
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from noaa_sdk import NOAA
+from noaa_sdk.noaa import OSM
+from requests.adapters import HTTPAdapter
+
+import timings
+
+# Where each upstream service is reached. Point these at a stand-in, such as standin.py, to run without
+# the real services
+NWS_URL = os.environ.get("BEACH_DAY_NWS_URL", "https://api.weather.gov").rstrip("/")
+CPC_URL = os.environ.get("BEACH_DAY_CPC_URL", "https://www.cpc.ncep.noaa.gov").rstrip("/")
+
+# The hosts that the base URLs above stand in for
+NWS_HOST = NOAA.DEFAULT_END_POINT
+CPC_HOST = "www.cpc.ncep.noaa.gov"
+
+# Seconds to wait for a connection, and then for each read from it
+CONNECT_TIMEOUT = float(os.environ.get("BEACH_DAY_UPSTREAM_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.environ.get("BEACH_DAY_UPSTREAM_READ_TIMEOUT", "10"))
+
+# Requests that fail with a 429 or a 5xx, or can't connect or time out, are tried again up to this many times
+RETRIES = int(os.environ.get("BEACH_DAY_UPSTREAM_RETRIES", "3"))
+
+# Seconds to wait before the first retry. Each retry waits twice as long as the last, up to BACKOFF_MAX,
+# less a random part of it so parallel requests don't all retry at once. A Retry-After header is used instead
+# when there is one, up to BACKOFF_MAX
+BACKOFF = float(os.environ.get("BEACH_DAY_UPSTREAM_BACKOFF", "0.5"))
+BACKOFF_MAX = float(os.environ.get("BEACH_DAY_UPSTREAM_BACKOFF_MAX", "4"))
+
+# Open connections kept for each host. Weather lookups run in parallel, so this should be at least
+# BEACH_DAY_WEATHER_MAX_IN_FLIGHT
+POOL_SIZE = int(os.environ.get("BEACH_DAY_UPSTREAM_POOL_SIZE", "8"))
+
+# Statuses that are worth trying again
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# One session for every upstream request, so connections to each host are kept open and reused instead of
+# paying for DNS, TCP and TLS every time. Created on first use, see get_session
+session = None
+session_lock = threading.Lock()
+
+
+def base_url(host):
+    """
+    Find where requests for an upstream host should go
+
+    :param host: the real host name, such as "api.weather.gov"
+    :returns: the configured base URL for that host, without a trailing slash
+    """
+
+    if host == NWS_HOST:
+        return NWS_URL
+    if host == CPC_HOST:
+        return CPC_URL
+    return f"https://{host}"
+
+
+def nws_url(path):
+    """
+    :param path: path and query on the NWS API, starting with a slash
+    :returns: the full URL to request
+    """
+
+    return NWS_URL + path
+
+
+def cpc_url(path):
+    """
+    :param path: path on the CPC site, starting with a slash
+    :returns: the full URL to request
+    """
+
+    return CPC_URL + path
+
+
+def call_kind(url):
+    """
+    Describe which endpoint a URL is for, to group upstream calls in timings
+
+    :param url: the URL that was requested
+    :returns: the host followed by the first part of the path, such as "api.weather.gov/points"
+    """
+
+    parts = urlsplit(url)
+    first = parts.path.strip("/").split("/")[0]
+    return f"{parts.netloc}/{first}"
+
+
+def get_session():
+    """
+    Get the session shared by every upstream request, creating it on first use. Its connection pools are safe
+    to share between the threads that fetch weather in parallel
+
+    :returns: the requests.Session
+    """
+
+    global session
+    if session is None:
+        with session_lock:
+            if session is None:
+                new_session = requests.Session()
+
+                # Retries are handled in get, so each attempt can be timed
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+                new_session.mount("https://", adapter)
+                new_session.mount("http://", adapter)
+                session = new_session
+    return session
+
+
+def retry_delay(attempt, response):
+    """
+    :param attempt: how many times the request has been tried
+    :param response: the last response, or None if the request didn't get one
+    :returns: seconds to wait before trying again
+    """
+
+    if response is not None:
+        try:
+            return min(BACKOFF_MAX, max(0.0, float(response.headers.get("Retry-After", ""))))
+        except ValueError:
+            # Missing, or given as a date
+            pass
+
+    delay = min(BACKOFF_MAX, BACKOFF * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def get(url, **kwargs):
+    """
+    Make a GET request to an upstream service through the shared session, with a connect and read timeout.
+    Responses with a 429 or 5xx status, failed connections and timeouts are retried up to RETRIES times with
+    exponential backoff. Each attempt is timed if timings are on
+
+    :param url: the full URL to request
+    :param kwargs: passed on to requests.Session.get
+    :returns: the last requests.Response, which may still be an error if every attempt failed
+    :raises requests.RequestException: if the last attempt didn't get a response
+    """
+
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    kind = call_kind(url)
+
+    attempt = 0
+    while True:
+        attempt += 1
+        response = None
+        error = None
+
+        start = time.perf_counter()
+        try:
+            response = get_session().get(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        finally:
+            timings.upstream_call(kind, time.perf_counter() - start)
+
+        if error is None and not response.status_code in RETRY_STATUSES:
+            return response
+        if attempt > RETRIES:
+            if error is not None:
+                raise error
+            return response
+
+        time.sleep(retry_delay(attempt, response))
+
+
+def sdk_get(end_point, uri, header):
+    """
+    Make a request for the NOAA client or its geocoder through get, in place of the SDK's own requests and
+    retries. The SDK gave up with an exception when a request kept failing, so this does the same
+
+    :param end_point: the real host name the SDK is asking
+    :param uri: path and query on that host
+    :param header: request headers
+    :returns: the requests.Response
+    :raises Exception: if the last attempt didn't get a 200 response
+    """
+
+    response = get(f"{base_url(end_point)}/{uri.lstrip('/')}", headers=header)
+    if response.status_code != 200:
+        raise Exception(f"Request to {end_point} failed with status {response.status_code}: {response.text[:200]}")
+    return response
+
+
+class Geocoder(OSM):
+    """
+    OpenStreetMap geocoder that the NOAA client uses to find zip codes, with its requests sent through get
+    """
+
+    def _get(self, end_point, uri, header):
+        return sdk_get(end_point, uri, header)
+
+
+class Client(NOAA):
+    """
+    NOAA client that sends its requests to the configured base URLs instead of always to the real hosts.
+    Responses from the NWS link to other NWS URLs, and those are redirected the same way. Requests, including
+    the geocoder's for zip codes, go through get, so they share its connections, timeouts and retries instead
+    of the SDK's own retries
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._osm = Geocoder()
+
+    def _get(self, end_point, uri, header):
+        return sdk_get(end_point, uri, header)
@@ -0,0 +1,112 @@
+import numpy as np
+
+from spatial_index import EARTH_RADIUS
+
+# Cities on the CPC UV index bulletin, by the name the bulletin uses, with their latitude and longitude
+UV_CITIES = {
+    "ALBUQUERQUE NM": (35.093779, -106.645375),
+    "LITTLE ROCK AR": (34.731196, -92.358115),
+    "ANCHORAGE AK": (61.201635, -149.855982),
+    "LOS ANGELES CA": (34.175477, -118.480221),
+    "ATLANTIC CITY NJ": (39.383432, -74.467481),
+    "LOUISVILLE KY": (38.176383, -85.681930),
+    "ATLANTA GA": (33.748492, -84.446447),
+    "MEMPHIS TN": (35.119206, -89.958910),
+    "BALTIMORE MD": (39.307919, -76.605990),
+    "MIAMI FL": (25.784873, -80.221712),
+    "BILLINGS MT": (45.766990, -108.561719),
+    "MILWAUKEE WI": (43.050674, -87.946621),
+    "BISMARCK ND": (46.821625, -100.777803),
+    "MINNEAPOLIS MN": (44.961500, -93.263933),
+    "BOISE ID": (43.607974, -116.230958),
+    "MOBILE AL": (30.670142, -88.140929),
+    "BOSTON MA": (42.318214, -71.084370),
+    "NEW ORLEANS LA": (30.045320, -89.914739),
+    "BUFFALO NY": (42.903220, -78.862017),
+    "NEW YORK NY": (40.69108, -73.895797),
+    "BURLINGTON VT": (44.488524, -73.21630),
+    "NORFOLK VA": (36.869636, -76.214791),
+    "CHARLESTON WV": (38.35474, -81.62188),
+    "OKLAHOMA CITY OK": (35.455118, -97.533206),
+    "CHARLESTON SC": (32.79207, -80.02049),
+    "OMAHA NE": (41.25647, -96.055015),
+    "CHEYENNE WY": (41.12875, -104.794204),
+    "PHILADELPHIA PA": (40.00337, -75.14129),
+    "CHICAGO IL": (41.85063, -87.657758),
+    "PHOENIX AZ": (33.542101, -112.072650),
+    "CLEVELAND OH": (41.48085, -81.683585),
+    "PITTSBURGH PA": (40.44107, -79.97734),
+    "CONCORD NH": (43.23019, -71.553355),
+    "PORTLAND ME": (43.67674, -70.29406),
+    "DALLAS TX": (32.78672, -96.790003),
+    "PORTLAND OR": (45.527900, -122.61450),
+    "DENVER CO": (39.73803, -104.965895),
+    "PROVIDENCE RI": (41.820911, -71.418851),
+    "DES MOINES IA": (41.57119, -93.615420),
+    "RALEIGH NC": (35.83632, -78.656937),
+    "DETROIT MI": (42.37558, -83.08541),
+    "SALT LAKE CITY UT": (40.77559, -111.918841),
+    "DOVER DE": (39.163030, -75.531701),
+    "SAN FRANCISCO CA": (37.754556, -122.436961),
+    "HARTFORD CT": (41.764823, -72.682681),
+    "SAN JUAN PR": (18.39493, -66.053650),
+    "HONOLULU HI": (21.315436, -157.81777),
+    "SEATTLE WA": (47.58616, -122.317932),
+    "HOUSTON TX": (29.78182, -95.38429),
+    "SIOUX FALLS SD": (43.538270, -96.718315),
+    "INDIANAPOLIS IN": (39.760920, -86.138986),
+    "ST. LOUIS MO": (38.62574, -90.2445),
+    "JACKSON MS": (32.31934, -90.218509),
+    "TAMPA FL": (27.978445, -82.45967),
+    "JACKSONVILLE FL": (30.353784, -81.634107),
+    "WASHINGTON DC": (38.905395, -77.010399),
+    "LAS VEGAS NV": (36.19356, -115.26293),
+    "WICHITA KS": (37.68678, -97.33421)
+}
+
+# The same cities as arrays, in the order of CITY_NAMES, for scoring them all at once
+CITY_NAMES = list(UV_CITIES.keys())
+CITY_LAT = np.radians(np.array([UV_CITIES[name][0] for name in CITY_NAMES]))
+CITY_LON = np.radians(np.array([UV_CITIES[name][1] for name in CITY_NAMES]))
+CITY_COS_LAT = np.cos(CITY_LAT)
+
+# Stored in place of a city index for points that don't have a location
+NO_CITY = 255
+
+
+def closest_uv_city_indexes(lats, lons):
+    """
+    Find the closest bulletin city to many points at once by great-circle distance. Ties go to the city
+    listed first
+
+    :param lats: latitudes in degrees, NaN if missing
+    :param lons: longitudes in degrees, NaN if missing
+    :returns: array of indexes into CITY_NAMES, NO_CITY where the point is missing
+    """
+
+    phi = np.radians(np.asarray(lats, dtype=np.float64))[:, np.newaxis]
+    lam = np.radians(np.asarray(lons, dtype=np.float64))[:, np.newaxis]
+
+    # One row per point, one column per city. Only the order matters, so the arcsin is skipped
+    a = np.sin((CITY_LAT - phi) / 2.0) ** 2 + np.cos(phi) * CITY_COS_LAT * np.sin((CITY_LON - lam) / 2.0) ** 2
+
+    indexes = np.zeros(len(a), dtype=np.uint8)
+    valid = ~np.isnan(a).any(axis=1)
+    indexes[valid] = np.argmin(a[valid], axis=1)
+    indexes[~valid] = NO_CITY
+    return indexes
+
+
+def closest_uv_city(lat, lon):
+    """
+    Find the bulletin city closest to a point by great-circle distance
+
+    :param lat: latitude in degrees
+    :param lon: longitude in degrees
+    :returns: the city name as it appears on the bulletin, or an empty string if the point is missing
+    """
+
+    index = closest_uv_city_indexes([float(lat)], [float(lon)])[0]
+    if index == NO_CITY:
+        return ""
+    return CITY_NAMES[index]
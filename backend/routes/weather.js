@@ -7,15 +7,40 @@ const router = express.Router();
 
 // Modules We Made
 const wrapper = require("../data/");
+const errRes = require("../routes/error-responses");
 
 /**
  * Creates a route for getting weather data.
  */
-router.post('/weather', (req, res) => {
+router.post('/weather', async (req, res) => {
 	console.log("Weather route accessed");
 
-	const reply = JSON.parse(wrapper.runScript("get weather", JSON.stringify(req.body)));
-	return res.status(200).json(reply);
+	// Streamed requests get one line of JSON per result as it arrives, then
+	// the trailer with the order and code
+	if (req.body.stream) {
+		try {
+			const reply = await wrapper.runWorker("get weather", req.body, (result) => {
+				if (!res.headersSent)
+					res.status(200).type('application/x-ndjson');
+				res.write(JSON.stringify(result) + "\n");
+			});
+			if (!res.headersSent)
+				res.status(200).type('application/x-ndjson');
+			return res.end(JSON.stringify(reply) + "\n");
+		} catch (err) {
+			if (res.headersSent)
+				return res.end();
+			errRes.errorResLookup(res, err);
+		}
+		return;
+	}
+
+	try {
+		const reply = await wrapper.runWorker("get weather", req.body);
+		return res.status(200).json(reply);
+	} catch (err) {
+		errRes.errorResLookup(res, err);
+	}
 });
 
 module.exports = router;